@@ -1,14 +1,18 @@
-import boto3
+import re
 import json
 import os
 from dotenv import load_dotenv
-from pathlib import Path
-from typing import Dict, Any, Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime
-from utils.github_utils import GitHubCodeFetcher
-import requests
+from concurrent.futures import ThreadPoolExecutor
 from .bedrock_client import BedrockClient
+from .cascade import ModelCascade
+from .prompts import get_prompt_registry, PromptTemplateError
 from utils.text_utils import clean_json_string
+from utils.hotspots import filter_hotspots, hotspot_threshold
+from utils.file_ranker import rank_files
+from utils.structure_encoder import encode_structure, resolve_paths
+from utils.fingerprint import get_fingerprint_index
 from utils.emailer import Emailer
 
 # Load environment variables
@@ -21,14 +25,34 @@ max_tokens = int(os.getenv("BEDROCK_MAX_TOKENS", "1000"))
 temperature = float(os.getenv("BEDROCK_TEMPERATURE", "0.1"))
 suggestions_dir = os.getenv("SUGGESTIONS_DIR", "data/suggestions")
 notification_email = os.getenv("NOTIFICATION_EMAIL")
-
-# Initialize Bedrock client with explicit credentials
-client = boto3.client(
-    "bedrock-runtime",
-    region_name=region,
-    aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-    aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY')
-)
+fetch_concurrency = int(os.getenv("GITHUB_FETCH_CONCURRENCY", "8"))
+fetch_timeout = float(os.getenv("GITHUB_FETCH_TIMEOUT", "30"))
+# "rest" downloads each file separately, "graphql" batches them into a few queries
+fetch_mode = os.getenv("GITHUB_FETCH_MODE", "rest")
+# "single" packs all files into as few prompts as fit, "parallel" analyzes small groups of files concurrently
+analysis_mode = os.getenv("ANALYSIS_MODE", "single")
+analysis_concurrency = int(os.getenv("ANALYSIS_CONCURRENCY", "4"))
+analysis_group_size = int(os.getenv("ANALYSIS_GROUP_SIZE", "1"))
+# "best" keeps only the top-ranked suggestion, "all" keeps every suggestion in rank order
+analysis_merge = os.getenv("ANALYSIS_MERGE", "best")
+# Input+output tokens allowed per analysis request; 0 turns off packing and splitting
+prompt_token_budget = int(os.getenv("PROMPT_TOKEN_BUDGET", "100000"))
+# "local" ranks files on complexity, imports, churn and size; "llm" asks the model to pick them
+file_selection = os.getenv("FILE_SELECTION", "local")
+# Files whose contents are downloaded for local ranking when there is no archive/mirror source
+rank_max_fetch = int(os.getenv("FILE_RANK_MAX_FETCH", "40"))
+# Stream model responses and act on each suggestion as soon as it is complete
+stream_responses = os.getenv("BEDROCK_STREAMING", "0") == "1"
+# Let a small model triage chunks first and only send promising ones to BEDROCK_MODEL_ID
+analysis_cascade = os.getenv("ANALYSIS_CASCADE", "0") == "1"
+# Reuse suggestions made earlier for identical code (by normalized AST hash) instead of calling the model
+cross_repo_dedup = os.getenv("CROSS_REPO_DEDUP", "1") == "1"
+
+IMPACT_RANK = {"high": 3, "medium": 2, "low": 1}
+
+# Bedrock client configured from the environment (credentials come from AWS_ACCESS_KEY_ID/AWS_SECRET_ACCESS_KEY).
+# The underlying boto3 client is shared and only created on the first model call.
+bedrock = BedrockClient(model_id=model_id, region=region, max_tokens=max_tokens, temperature=temperature)
 
 class CodeAnalyzer:
     def __init__(self):
@@ -36,27 +60,11 @@ class CodeAnalyzer:
         
     def analyze_code(self, code: str) -> Optional[Dict]:
         """Analyze code using AWS Bedrock"""
-        prompt = f"""Analyze this code and suggest optimizations. Focus on:
-1. Performance improvements
-2. Code quality
-3. Best practices
-4. Potential bugs
-
-Code to analyze:
-{code}
-
-Provide the analysis in this JSON format:
-{{
-    "issue": "Description of the issue found",
-    "benefit": {{
-        "explanation": "How this optimization helps",
-        "impact": "High/Medium/Low"
-    }},
-    "suggestion": "Specific code suggestion"
-}}"""
+        template = get_prompt_registry().get("code_review")
+        prompt = template.render(code=code)
 
         try:
-            response = self.bedrock.generate_text(prompt)
+            response = self.bedrock.generate_text(prompt, template_id=template.id, cache_prefix=template.prefix)
             return response
         except Exception as e:
             print(f"Error analyzing code: {str(e)}")
@@ -70,22 +78,17 @@ Provide the analysis in this JSON format:
             for file in files
         ])
 
-        # Read the prompt template
+        # Format the prompt with the files section
         try:
-            with open('prompts/code_analysis.txt', 'r') as f:
-                prompt_template = f.read()
-        except FileNotFoundError:
-            print("Error: prompts/code_analysis.txt not found")
-            return None
-        except Exception as e:
-            print(f"Error reading prompt template: {str(e)}")
+            template = get_prompt_registry().get("code_analysis")
+            prompt = template.render(files_section=files_section)
+        except PromptTemplateError as e:
+            print(f"Error: {str(e)}")
             return None
 
-        # Format the prompt with the files section
-        prompt = prompt_template.format(files_section=files_section)
-
         try:
-            response = self.bedrock.generate_text(prompt)
+            response = self.bedrock.generate_text(prompt, template_id=template.id, cache_prefix=template.prefix,
+                                                  n_files=len(files))
             if response:
                 try:
                     # If response is already a dict, use it directly
@@ -106,112 +109,11 @@ Provide the analysis in this JSON format:
 
 def analyze_python_code(code: str) -> str:
     """Analyze Python code and return improvement suggestions"""
-    prompt = f"""You are an expert AI code reviewer helping developers clean and improve codebases.
-
-You will receive a single Python file. Analyze it carefully and identify **ONE specific, high-impact suggestion** that improves the code in one of these ways:
-- ✅ Performance (e.g., faster loops, better data structures, optimized SQL queries)
-- ✅ Readability or simplicity
-- ✅ Removal of dead or unused code
-- ✅ Using a cleaner or more Pythonic alternative
-- ✅ Using internal tools or libraries if relevant
-- ✅ SQL query optimization (e.g., adding indexes, rewriting queries, using better joins)
-- ✅ Import optimization (moving heavy/single-use imports into specific functions)
-
-Only suggest changes that are **safe, local**, and **do not change the behavior** of the code.
-
-🎯 **Your goal is to generate one actionable suggestion worth creating a pull request for.**
-
-IMPORTANT: When providing code snippets, you MUST:
-1. Preserve ALL original indentation and formatting
-2. Include the exact same number of spaces/tabs as the original code
-3. Keep the same line breaks and alignment
-4. Only change the specific lines that need improvement
-5. Keep all surrounding context intact
-
-Return your response **strictly in this JSON format** (and nothing else):
-
-{{
-  "issue": "What is the problem or opportunity for improvement?",
-  "repo_name": "Name of the repository",
-  "file_path": "Path relative to repository root",
-  "file_name": "Name of the file being modified",
-  "start_line": "Line number where the change starts (1-based)",
-  "end_line": "Line number where the change ends (1-based)",
-  "old_code": "The original snippet with exact indentation and formatting",
-  "new_code": "The improved version with identical indentation and formatting",
-  "benefit": "A short explanation of why this change is useful. Include % improvement if it's a speed boost.",
-  "commit_message": "A short GitHub-style commit message (no more than 10 words)",
-  "branch_name": "A descriptive branch name in kebab-case format (e.g., optimize-list-operations, fix-memory-leak)"
-}}
-
-Example with preserved formatting:
-
-{{
-  "issue": "Inefficient nested loops to find duplicates",
-  "repo_name": "codebrew",
-  "file_path": "src/utils/duplicate_finder.py",
-  "file_name": "duplicate_finder.py",
-  "start_line": 10,
-  "end_line": 15,
-  "old_code": "    for i in range(len(arr)):\\n        for j in range(i+1, len(arr)):\\n            if arr[i] == arr[j]:\\n                duplicates.append(arr[i])",
-  "new_code": "    seen = set()\\n    for item in arr:\\n        if item in seen:\\n            duplicates.append(item)\\n        seen.add(item)",
-  "benefit": "Reduces time complexity from O(n^2) to O(n); ~80% faster on large inputs.",
-  "commit_message": "Optimize duplicate search with set lookup",
-  "branch_name": "optimize-duplicate-search"
-}}
-
-Example with SQL (preserving formatting):
-
-{{
-  "issue": "Inefficient SQL query with multiple subqueries",
-  "repo_name": "codebrew",
-  "file_path": "src/db/queries.py",
-  "file_name": "queries.py",
-  "start_line": 25,
-  "end_line": 30,
-  "old_code": "    query = '''\\n        SELECT * FROM users\\n        WHERE id IN (\\n            SELECT user_id FROM orders\\n            WHERE total > 100\\n        )\\n        AND id IN (\\n            SELECT user_id FROM payments\\n            WHERE status = 'completed'\\n        )\\n    '''",
-  "new_code": "    query = '''\\n        SELECT DISTINCT u.*\\n        FROM users u\\n        JOIN orders o ON u.id = o.user_id\\n        JOIN payments p ON u.id = p.user_id\\n        WHERE o.total > 100\\n        AND p.status = 'completed'\\n    '''",
-  "benefit": "Reduces query execution time by ~60% by eliminating subqueries and using proper joins.",
-  "commit_message": "Optimize user query with proper joins",
-  "branch_name": "optimize-user-query-joins"
-}}
-
-Example with Import Optimization (preserving formatting):
-
-{{
-  "issue": "Heavy pandas import used only in one function",
-  "repo_name": "codebrew",
-  "file_path": "src/data/processor.py",
-  "file_name": "processor.py",
-  "start_line": 1,
-  "end_line": 5,
-  "old_code": "import pandas as pd\\nimport numpy as np\\n\\ndef process_data(data):\\n    df = pd.DataFrame(data)\\n    return df.mean()",
-  "new_code": "def process_data(data):\\n    import pandas as pd\\n    df = pd.DataFrame(data)\\n    return df.mean()",
-  "benefit": "Reduces module import time by ~200ms and memory usage by ~50MB when pandas is not needed.",
-  "commit_message": "Move pandas import into function scope",
-  "branch_name": "optimize-pandas-import"
-}}
-
-Here is the Python code to analyze:
-
-{code}"""
+    template = get_prompt_registry().get("single_file_analysis")
+    prompt = template.render(code=code)
 
     try:
-        response = client.invoke_model(
-            modelId=model_id,
-            body=json.dumps({
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": max_tokens,
-                "temperature": temperature,
-                "messages": [{
-                    "role": "user",
-                    "content": prompt
-                }]
-            })
-        )
-        
-        response_body = json.loads(response['body'].read())
-        suggestion = response_body['content'][0]['text']
+        suggestion = bedrock.invoke(prompt, template_id=template.id, cache_prefix=template.prefix, n_files=1)
         
         try:
             # Clean and parse the JSON response
@@ -248,9 +150,13 @@ def save_suggestion(file_analyzed: str, suggestion: str) -> str:
     # Create data directory if it doesn't exist
     os.makedirs(suggestions_dir, exist_ok=True)
     
-    # Generate filename with timestamp
+    # Generate filename with timestamp, numbered if several are saved in the same second
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"{suggestions_dir}/suggestion_{timestamp}.json"
+    counter = 1
+    while os.path.exists(filename):
+        filename = f"{suggestions_dir}/suggestion_{timestamp}_{counter}.json"
+        counter += 1
     
     # Save to file
     with open(filename, "w") as f:
@@ -448,59 +354,57 @@ Path: {rel_path}
         print(f"⚠️ Error reading file {file_path}: {str(e)}")
         return {}
 
+def prefilter_structure(repo_info: Dict) -> List[Dict]:
+    """
+    Drop files without hotspots from the structure when their contents are available locally
+    
+    With an archive or mirror source reading every file is cheap, so the model
+    only gets to choose among files the static scan found something in. Other
+    listing modes keep the full structure and are filtered after fetching.
+    """
+    source = repo_info.get("source")
+    if source is None or hotspot_threshold() <= 0:
+        return repo_info["structure"]
+    files = []
+    for entry in repo_info["structure"]:
+        try:
+            content = source.read(entry["name"])
+        except Exception as e:
+            print(f"Error reading {entry['name']}: {str(e)}")
+            continue
+        if content is not None:
+            files.append(dict(entry, content=content))
+    return [
+        {key: value for key, value in file.items() if key not in ("content", "hotspots")}
+        for file in filter_hotspots(files)
+    ]
+
 def analyze_repository_structure(repo_info: Dict) -> List[Dict]:
     """Analyze repository structure to determine which files to analyze"""
-    prompt = f"""You are an expert code reviewer. Analyze this repository structure and determine the top {repo_info['n_files']} most important files to review for optimization opportunities.
-
-Repository: {repo_info['repository']['name']}
-Owner: {repo_info['repository']['owner']}
-
-Files in repository:
-{json.dumps(repo_info['structure'], indent=2)}
-
-IMPORTANT: Do NOT select any test files (files in test directories or files with 'test' in their name).
-
-Consider these factors when selecting files:
-1. Core functionality files
-2. Files with complex logic
-3. Files that might have performance bottlenecks
-4. Files that are frequently modified
-5. Files that are critical to the application
-6. Files that are part of the main application code (not tests)
-
-Return your response in this JSON format:
-{{
-    "selected_files": [
-        {{
-            "name": "path/to/file.py",
-            "url": "file_url",
-            "reason": "Why this file is important to analyze"
-        }}
-    ]
-}}"""
+    structure = prefilter_structure(repo_info)
+    if not structure:
+        print("No files with hotspots found in repository")
+        return []
+    encoded, stats = encode_structure(structure)
+    print(f"🗜️ Structure prompt: {stats['json_tokens']} -> {stats['tokens']} tokens "
+          f"({stats['shown']}/{stats['files']} files listed)")
+    template = get_prompt_registry().get("file_selection")
+    prompt = template.render(
+        n_files=repo_info['n_files'],
+        repo_name=repo_info['repository']['name'],
+        owner=repo_info['repository']['owner'],
+        structure=encoded
+    )
 
     try:
-        response = client.invoke_model(
-            modelId=model_id,
-            body=json.dumps({
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": max_tokens,
-                "temperature": temperature,
-                "messages": [{
-                    "role": "user",
-                    "content": prompt
-                }]
-            })
-        )
-        
-        response_body = json.loads(response['body'].read())
-        suggestion = response_body['content'][0]['text']
+        suggestion = bedrock.invoke(prompt, template_id=template.id, cache_prefix=template.prefix)
         
         try:
             # Clean and parse the JSON response
             cleaned_suggestion = clean_json_string(suggestion)
             json_suggestion = json.loads(cleaned_suggestion)
-            return json_suggestion["selected_files"]
+            # Resolve download URLs and blob SHAs locally by path
+            return resolve_paths(json_suggestion["selected_files"], repo_info["structure"])
         except json.JSONDecodeError as e:
             print(f"Error parsing repository analysis JSON: {str(e)}")
             print("Raw suggestion:", suggestion)
@@ -510,8 +414,34 @@ Return your response in this JSON format:
         print(f"Error analyzing repository structure: {str(e)}")
         return []
 
-def analyze_github_file(file_url: str) -> Optional[Dict]:
-    """Analyze a file from GitHub"""
+def rank_repository_files(repo_info: Dict, churn: Optional[Dict[str, int]] = None) -> List[Dict]:
+    """Select the files to analyze locally, without a model call"""
+    structure = prefilter_structure(repo_info)
+    source = repo_info.get("source")
+    headers = github_headers()
+
+    def read_files(entries: List[Dict]) -> Dict[str, str]:
+        fetched = fetch_github_files(entries, headers, source=source, repository=repo_info["repository"])
+        return {file["name"]: file["content"] for file in fetched}
+
+    # Filter on hotspots before keeping the top n_files, or the filter after fetching could drop them all
+    return rank_files(structure, repo_info["n_files"], read_files, churn=churn,
+                      max_read=None if source else rank_max_fetch, min_hotspot_score=max(0, hotspot_threshold()))
+
+def select_files(repo_info: Dict, selector=None) -> List[Dict]:
+    """Pick the files to analyze with the configured FILE_SELECTION mode"""
+    if file_selection == "llm":
+        return analyze_repository_structure(repo_info)
+    churn = selector.get_churn(repo_info["repository"]) if selector else None
+    return rank_repository_files(repo_info, churn)
+
+def analyze_github_file(file_url: str, sha: Optional[str] = None) -> Optional[Dict]:
+    """Analyze a file from GitHub, reusing the cached blob when its SHA is known"""
+    # GitHub fetching pulls in requests; import it only when a file is actually fetched
+    import requests
+    from utils.blob_cache import fetch_file_content
+    from utils.github_scheduler import PRIORITY_INTERACTIVE
+
     try:
         # Get GitHub token from environment
         token = os.getenv("GITHUB_TOKEN")
@@ -524,12 +454,11 @@ def analyze_github_file(file_url: str) -> Optional[Dict]:
             "Authorization": f"token {token}",
             "Accept": "application/vnd.github.v3.raw"
         }
-        response = requests.get(file_url, headers=headers)
-        response.raise_for_status()
+        code = fetch_file_content(file_url, headers, sha=sha, priority=PRIORITY_INTERACTIVE)
         
         # Analyze the code
         analyzer = CodeAnalyzer()
-        analysis = analyzer.analyze_code(response.text)
+        analysis = analyzer.analyze_code(code)
         
         if analysis:
             # Save the suggestion
@@ -544,31 +473,107 @@ def analyze_github_file(file_url: str) -> Optional[Dict]:
         print(f"Error analyzing file: {str(e)}")
         return None
 
-def analyze_github_files(file_urls: List[Dict]) -> Optional[Dict]:
-    """Analyze multiple files from GitHub and return the highest-impact suggestion"""
+def fetch_github_files(file_urls: List[Dict], headers: Dict[str, str], source=None,
+                       repository: Optional[Dict] = None) -> List[Dict]:
+    """Fetch file contents concurrently, keeping the order of the selection
+
+    When a source backend (ArchiveStore or LocalMirror) is given, files are read
+    from it and only files missing from the source are downloaded. In graphql
+    fetch mode, files not already in the blob cache are fetched in batches first
+    and anything the batch could not return falls back to REST.
+    """
+    from utils.blob_cache import fetch_file_content, get_blob_cache
+    from utils.graphql_fetch import fetch_blobs_graphql
+
+    prefetched = {}
+    if fetch_mode == "graphql" and source is None and repository:
+        blob_cache = get_blob_cache()
+        pending = [
+            file_info['name'] for file_info in file_urls
+            if not (file_info.get('sha') and file_info['sha'] in blob_cache)
+        ]
+        if pending:
+            prefetched = fetch_blobs_graphql(
+                repository['owner'], repository['name'], repository['default_branch'],
+                pending, headers, timeout=fetch_timeout
+            )
+
+    def fetch_file(file_info: Dict) -> Optional[Dict]:
+        try:
+            content = prefetched.get(file_info['name'])
+            if content is None and source:
+                content = source.read(file_info['name'])
+            if content is None:
+                content = fetch_file_content(
+                    file_info['url'], headers, sha=file_info.get('sha'), timeout=fetch_timeout
+                )
+            return {
+                'name': file_info['name'],
+                'path': file_info['name'],
+                'content': content
+            }
+        except Exception as e:
+            print(f"Error fetching {file_info['name']}: {str(e)}")
+            return None
+
+    if not file_urls:
+        return []
+
+    with ThreadPoolExecutor(max_workers=max(1, min(fetch_concurrency, len(file_urls)))) as executor:
+        fetched = list(executor.map(fetch_file, file_urls))
+    return [file for file in fetched if file]
+
+def rank_suggestions(suggestions: List[Dict]) -> List[Dict]:
+    """Order suggestions by stated impact, then by the improvement percentage they claim"""
+    def score(suggestion: Dict):
+        benefit = suggestion.get("benefit") or {}
+        if isinstance(benefit, dict):
+            impact = str(benefit.get("impact", ""))
+            explanation = str(benefit.get("explanation", ""))
+        else:
+            impact = explanation = str(benefit)
+        rank = next((value for name, value in IMPACT_RANK.items() if name in impact.lower()), 0)
+        percentages = [float(p) for p in re.findall(r"(\d+(?:\.\d+)?)\s*%", explanation)]
+        # Prefer smaller changes when everything else is equal, they are easier to review
+        return (rank, max(percentages, default=0.0), -len(str(suggestion.get("old_code", ""))))
+
+    return sorted(suggestions, key=score, reverse=True)
+
+def print_analysis(analysis_result: Dict) -> None:
+    """Print a suggestion to the console"""
+    print(f"\n📝 Analysis for {analysis_result.get('file_name', analysis_result.get('file', 'unknown'))}:")
+    print(f"Issue: {analysis_result.get('issue', 'No issue found')}")
+    print(f"Benefit: {analysis_result.get('benefit', 'No benefit specified')}")
+    if 'old_code' in analysis_result:
+        print(f"\nOld code:")
+        print(analysis_result['old_code'])
+        print(f"\nNew code:")
+        print(analysis_result['new_code'])
+
+def github_headers() -> Dict[str, str]:
+    """Headers for GitHub API requests, authenticated when GITHUB_TOKEN is set"""
+    headers = {
+        'Accept': 'application/vnd.github.v3+json'
+    }
+    github_token = os.getenv('GITHUB_TOKEN')
+    if github_token:
+        headers['Authorization'] = f'token {github_token}'
+    return headers
+
+def analyze_github_files(file_urls: List[Dict], source=None, repository: Optional[Dict] = None):
+    """
+    Analyze multiple files from GitHub and save the resulting suggestions
+    
+    Returns the highest-impact suggestion, or with ANALYSIS_MODE=parallel and
+    ANALYSIS_MERGE=all the list of all suggestions in rank order.
+    """
     try:
-        github_token = os.getenv('GITHUB_TOKEN')
-        if not github_token:
+        if not os.getenv('GITHUB_TOKEN') and source is None:
             raise ValueError("GitHub token not found in environment variables")
-        
-        headers = {
-            'Authorization': f'token {github_token}',
-            'Accept': 'application/vnd.github.v3+json'
-        }
+        headers = github_headers()
         
         # Fetch file contents
-        files_to_analyze = []
-        for file_info in file_urls:
-            try:
-                response = requests.get(file_info['url'], headers=headers)
-                response.raise_for_status()
-                files_to_analyze.append({
-                    'name': file_info['name'],
-                    'path': file_info['name'],
-                    'content': response.text
-                })
-            except Exception as e:
-                print(f"Error fetching {file_info['name']}: {str(e)}")
+        files_to_analyze = fetch_github_files(file_urls, headers, source=source, repository=repository)
         
         if not files_to_analyze:
             print("No files were successfully fetched")
@@ -576,32 +581,73 @@ def analyze_github_files(file_urls: List[Dict]) -> Optional[Dict]:
         
         print(f"\n🔍 Successfully fetched {len(files_to_analyze)} files")
         
+        # Only files the static scan found something in are worth a model call
+        files_to_analyze = filter_hotspots(files_to_analyze)
+        if not files_to_analyze:
+            print("No files above the hotspot threshold, skipping analysis")
+            return None
+        
         # Analyze files using Bedrock
-        bedrock_client = BedrockClient()
-        analysis_result = bedrock_client.analyze_multiple_files(files_to_analyze)
+        bedrock_client = bedrock
+        keep_all = analysis_mode == "parallel" and analysis_merge == "all"
+        saved = set()
+        def on_suggestion(analysis_result: Dict) -> None:
+            # Show suggestions while the model is still writing; when all of them
+            # are kept there is no ranking to wait for, so save (and email) right away
+            print_analysis(analysis_result)
+            if keep_all:
+                save_suggestion(analysis_result.get('file', 'unknown'), json.dumps(analysis_result, indent=2))
+                saved.add(id(analysis_result))
         
-        if analysis_result:
-            # Save the analysis
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            suggestion_file = f"data/suggestions/suggestion_{timestamp}.json"
-            
-            # Print the analysis
-            print(f"\n📝 Analysis for {analysis_result.get('file_name', analysis_result.get('file', 'unknown'))}:")
-            print(f"Issue: {analysis_result.get('issue', 'No issue found')}")
-            print(f"Benefit: {analysis_result.get('benefit', 'No benefit specified')}")
-            if 'old_code' in analysis_result:
-                print(f"\nOld code:")
-                print(analysis_result['old_code'])
-                print(f"\nNew code:")
-                print(analysis_result['new_code'])
-            
+        # Code already analyzed in another repository or path gets its earlier suggestion back
+        fingerprints = get_fingerprint_index() if cross_repo_dedup else None
+        reused: List[Dict] = []
+        n_files = len(files_to_analyze)
+        if fingerprints:
+            reused, files_to_analyze = fingerprints.reuse(files_to_analyze, repository)
+            if stream_responses:
+                for analysis_result in reused:
+                    on_suggestion(analysis_result)
+        
+        # Single mode packs all files into as few prompts as the token budget allows, usually one
+        group_size = analysis_group_size if analysis_mode == "parallel" else None
+        new_suggestions: List[Dict] = []
+        if analysis_cascade and files_to_analyze:
+            new_suggestions = ModelCascade(bedrock_client, max_workers=analysis_concurrency).analyze(
+                files_to_analyze, group_size=group_size, token_budget=prompt_token_budget,
+                on_suggestion=on_suggestion if stream_responses else None
+            )
+        elif files_to_analyze:
+            new_suggestions = bedrock_client.analyze_files_concurrently(
+                files_to_analyze, group_size=group_size, max_workers=analysis_concurrency,
+                token_budget=prompt_token_budget, on_suggestion=on_suggestion if stream_responses else None
+            )
+        if reused:
+            # Files with a reused function are analyzed again and may get the same suggestion back
+            reused_spots = {(s.get("file_path"), s.get("start_line")) for s in reused}
+            new_suggestions = [s for s in new_suggestions
+                               if (s.get("file_path"), s.get("start_line")) not in reused_spots]
+        if fingerprints and new_suggestions:
+            fingerprints.record(new_suggestions, files_to_analyze, repository)
+        suggestions = rank_suggestions(reused + new_suggestions)
+        print(f"\n🏁 Got {len(suggestions)} suggestions from {n_files} files "
+              f"({len(reused)} reused, {len(files_to_analyze)} files sent to the model)")
+        if not keep_all:
+            suggestions = suggestions[:1]
+        
+        for analysis_result in suggestions:
+            if id(analysis_result) in saved:
+                continue
+            if not stream_responses:
+                print_analysis(analysis_result)
             # Save the full analysis
-            save_suggestion(suggestion_file, json.dumps(analysis_result, indent=2))
-            print(f"\n💾 Suggestion saved to: {suggestion_file}")
-            
-            return analysis_result
+            save_suggestion(analysis_result.get('file', 'unknown'), json.dumps(analysis_result, indent=2))
         
-        return None
+        if not suggestions:
+            return None
+        if analysis_mode == "parallel" and analysis_merge == "all":
+            return suggestions
+        return suggestions[0]
     except Exception as e:
         import traceback
         print("Error in analyze_github_files:")
@@ -0,0 +1,261 @@
+"""
+Offline batch inference for sweeps over every repository in data/repositories.txt
+
+    python -m ai.batch_inference prepare [--repos FILE] [--name NAME]
+    python -m ai.batch_inference run-local JOB_DIR
+    python -m ai.batch_inference collect JOB_DIR [--output FILE]
+
+`prepare` writes the analysis prompts of all repositories to JOB_DIR/input.jsonl
+in the Bedrock batch inference format ({"recordId", "modelInput"}) together with
+a manifest describing each record. Upload the input file and create the model
+invocation job with S3 input/output locations; when it finishes, download the
+output (input.jsonl.out) into the job directory and run `collect`, which saves
+each suggestion through the normal save/email/PR flow. `run-local` produces the
+same output file with synchronous calls, for testing without a batch job.
+"""
+import os
+import json
+import argparse
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .bedrock_client import BedrockClient
+from .prompt_packer import remap_lines
+from utils.blob_cache import atomic_write
+from utils.text_utils import clean_json_string
+
+INPUT_FILE = "input.jsonl"
+MANIFEST_FILE = "manifest.json"
+
+
+def batch_dir() -> Path:
+    """Directory holding batch jobs"""
+    return Path(os.getenv("BATCH_DIR", "data/batch"))
+
+
+def _load_manifest(job_dir: Path) -> Dict:
+    with open(job_dir / MANIFEST_FILE, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_manifest(job_dir: Path, manifest: Dict) -> None:
+    atomic_write(job_dir / MANIFEST_FILE, json.dumps(manifest, indent=2).encode("utf-8"))
+
+
+def prepare_job(job_name: Optional[str] = None, repo_file: str = "data/repositories.txt",
+                n_files: Optional[int] = None, client: Optional[BedrockClient] = None) -> Optional[Path]:
+    """
+    Select and fetch files for every listed repository and write their analysis prompts as a batch job
+
+    Args:
+        job_name (str, optional): Name of the job directory, defaults to a timestamp
+        repo_file (str): Repository list to sweep
+        n_files (int, optional): Files to analyze per repository, defaults to N_FILES
+        client (BedrockClient, optional): Client whose model settings are used for the requests
+
+    Returns:
+        Optional[Path]: Job directory, or None if no prompts were produced
+    """
+    from utils.repo_selector import RepoSelector
+    from utils.hotspots import filter_hotspots
+    from .analyzer import (analysis_group_size, analysis_mode, fetch_github_files, github_headers,
+                           prompt_token_budget, select_files)
+
+    client = client or BedrockClient()
+    n_files = n_files or int(os.getenv("N_FILES", "5"))
+    job_name = job_name or f"sweep_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    job_dir = batch_dir() / job_name
+    group_size = analysis_group_size if analysis_mode == "parallel" else None
+
+    selector = RepoSelector()
+    records: List[str] = []
+    manifest = {
+        "job_name": job_name,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "model_id": client.model_id,
+        "records": {},
+        "collected": []
+    }
+    for repo in selector.list_repositories(repo_file):
+        try:
+            repo_info = selector.analyze_repository(n_files, repo=repo)
+            if not repo_info:
+                continue
+            selected_files = select_files(repo_info, selector)
+            files = filter_hotspots(fetch_github_files(
+                selected_files, github_headers(), source=repo_info.get("source"), repository=repo
+            ))
+        except Exception as e:
+            print(f"Error preparing {repo['owner']}/{repo['name']}: {str(e)}")
+            continue
+
+        for group in client.plan_analysis_groups(files, group_size=group_size, token_budget=prompt_token_budget):
+            prompt = client.build_analysis_prompt(group)
+            if prompt is None:
+                continue
+            record_id = f"REC{len(records):08d}"
+            records.append(json.dumps({"recordId": record_id, "modelInput": client.build_request(prompt)}))
+            manifest["records"][record_id] = {
+                "repository": repo,
+                "head_sha": repo_info.get("head_sha"),
+                # The prompt text is dropped; original_content is kept to map line numbers back
+                # and to fingerprint the analyzed files when the job is collected
+                "pieces": [{k: v for k, v in piece.items() if k != "content"} for piece in group]
+            }
+
+    if not records:
+        print("No analysis prompts to batch")
+        return None
+    job_dir.mkdir(parents=True, exist_ok=True)
+    atomic_write(job_dir / INPUT_FILE, ("\n".join(records) + "\n").encode("utf-8"))
+    _save_manifest(job_dir, manifest)
+    print(f"📦 Wrote {len(records)} records for {len({r['repository']['url'] for r in manifest['records'].values()})} "
+          f"repositories to {job_dir / INPUT_FILE}")
+    return job_dir
+
+
+def run_job_locally(job_dir: Path, output_file: Optional[Path] = None,
+                    client: Optional[BedrockClient] = None) -> Path:
+    """Stand-in for the batch service: answer each record synchronously and write the output file"""
+    job_dir = Path(job_dir)
+    client = client or BedrockClient(model_id=_load_manifest(job_dir)["model_id"])
+    output_file = Path(output_file or job_dir / f"{INPUT_FILE}.out")
+    lines = []
+    with open(job_dir / INPUT_FILE, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            model_input = record["modelInput"]
+            try:
+                text = client.invoke(
+                    model_input["messages"][0]["content"],
+                    max_tokens=model_input["max_tokens"],
+                    temperature=model_input["temperature"]
+                )
+                record["modelOutput"] = {"type": "message", "role": "assistant",
+                                         "content": [{"type": "text", "text": text}]}
+            except Exception as e:
+                record["error"] = {"errorCode": 500, "errorMessage": str(e)}
+            lines.append(json.dumps(record))
+    atomic_write(output_file, ("\n".join(lines) + "\n").encode("utf-8"))
+    print(f"🧪 Wrote {len(lines)} results to {output_file}")
+    return output_file
+
+
+def collect_job(job_dir: Path, output_file: Optional[Path] = None) -> List[Dict]:
+    """
+    Read a finished job's output and save its suggestions
+
+    Results are matched to the manifest by recordId. Records already collected
+    are skipped, so collecting a partial output again later is safe.
+
+    Returns:
+        List[Dict]: The suggestions that were saved
+    """
+    from utils.scan_state import ScanState
+    from utils.fingerprint import get_fingerprint_index
+    from .analyzer import (analysis_merge, analysis_mode, cross_repo_dedup, print_analysis, rank_suggestions,
+                           save_suggestion)
+
+    job_dir = Path(job_dir)
+    manifest = _load_manifest(job_dir)
+    output_file = Path(output_file or job_dir / f"{INPUT_FILE}.out")
+    collected = set(manifest.get("collected", []))
+
+    by_repo: Dict[str, Dict] = {}
+    failed = 0
+    with open(output_file, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                result = json.loads(line)
+                record_id = result.get("recordId")
+                record = manifest["records"].get(record_id)
+                if record is None:
+                    print(f"Unknown record {record_id} in batch output")
+                    continue
+                if record_id in collected:
+                    continue
+                if result.get("error") or not result.get("modelOutput"):
+                    print(f"Record {record_id} failed: {result.get('error')}")
+                    failed += 1
+                    continue
+
+                text = (result["modelOutput"].get("content") or [{}])[0].get("text", "{}")
+                parsed = BedrockClient.parse_response(clean_json_string(text))
+                # The model sometimes answers with the list of analyses itself rather than {"analyses": [...]}
+                analyses = parsed.get("analyses") if isinstance(parsed, dict) else parsed
+                analyses = analyses if isinstance(analyses, list) else [analyses]
+                suggestions = [remap_lines(analysis, record["pieces"])
+                               for analysis in analyses if isinstance(analysis, dict)]
+            except Exception as e:
+                print(f"Error reading batch result: {str(e)}")
+                failed += 1
+                continue
+
+            repo = record["repository"]
+            entry = by_repo.setdefault(f"{repo['owner']}/{repo['name']}",
+                                       {"record": record, "suggestions": [], "files": {}})
+            entry["suggestions"].extend(suggestions)
+            for piece in record["pieces"]:
+                if piece.get("original_content") is not None:
+                    entry["files"][piece["path"]] = {"name": piece["name"], "path": piece["path"],
+                                                     "content": piece["original_content"]}
+            collected.add(record_id)
+
+    saved = []
+    scan_state = ScanState()
+    fingerprints = get_fingerprint_index() if cross_repo_dedup else None
+    for name, entry in by_repo.items():
+        if fingerprints:
+            fingerprints.record(entry["suggestions"], list(entry["files"].values()), entry["record"]["repository"])
+        suggestions = rank_suggestions(entry["suggestions"])
+        if not (analysis_mode == "parallel" and analysis_merge == "all"):
+            suggestions = suggestions[:1]
+        print(f"\n📦 {name}: {len(suggestions)} suggestion(s)")
+        for analysis_result in suggestions:
+            print_analysis(analysis_result)
+            save_suggestion(analysis_result.get('file', 'unknown'), json.dumps(analysis_result, indent=2))
+            saved.append(analysis_result)
+        if entry["record"].get("head_sha"):
+            scan_state.record(entry["record"]["repository"], entry["record"]["head_sha"])
+
+    manifest["collected"] = sorted(collected)
+    _save_manifest(job_dir, manifest)
+    missing = len(manifest["records"]) - len(collected)
+    print(f"\n✅ Collected {len(collected)}/{len(manifest['records'])} records "
+          f"({failed} failed, {missing} still pending)")
+    return saved
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline batch analysis of all listed repositories")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    prepare = commands.add_parser("prepare", help="Write the analysis prompts of a sweep to a batch job file")
+    prepare.add_argument("--repos", default="data/repositories.txt", help="Repository list to sweep")
+    prepare.add_argument("--name", help="Job name (default: timestamp)")
+    prepare.add_argument("--n-files", type=int, help="Files to analyze per repository")
+
+    run_local = commands.add_parser("run-local", help="Produce the job output with synchronous calls")
+    run_local.add_argument("job_dir")
+    run_local.add_argument("--output", help="Output file (default: JOB_DIR/input.jsonl.out)")
+
+    collect = commands.add_parser("collect", help="Save the suggestions of a finished job")
+    collect.add_argument("job_dir")
+    collect.add_argument("--output", help="Output file (default: JOB_DIR/input.jsonl.out)")
+
+    args = parser.parse_args()
+    if args.command == "prepare":
+        prepare_job(args.name, args.repos, args.n_files)
+    elif args.command == "run-local":
+        run_job_locally(Path(args.job_dir), args.output)
+    else:
+        collect_job(Path(args.job_dir), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,262 @@
-import boto3
 import json
-from typing import Dict, Any, Optional, List
-from pathlib import Path
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, Optional, List, Tuple
 import os
-from dotenv import load_dotenv
-from utils.text_utils import extract_json_from_text
+from utils.text_utils import IncrementalJSONParser
+from .response_cache import get_response_cache, response_cache_key
+from .bedrock_controller import get_bedrock_controller
+from .telemetry import get_telemetry
+from .prompts import get_prompt_registry, PromptTemplateError
+from .prompt_packer import estimate_tokens, format_piece, pack_files, remap_lines
+
+ANTHROPIC_VERSION = "bedrock-2023-05-31"
+# Below this many tokens for the code itself, files would be cut into a few lines each
+MIN_FILES_BUDGET = 1000
+
+_runtime_clients: Dict[Tuple, Any] = {}
+_runtime_clients_lock = threading.Lock()
+
+def get_runtime_client(region: str):
+    """
+    Return the process-wide bedrock-runtime client for a region, creating it on first use
+    
+    boto3 is imported here rather than at module level so that importing the ai
+    package (or starting the CLI/API) doesn't pay for it until a model is called.
+    The connection pool is sized for concurrent analyses (BEDROCK_MAX_POOL_CONNECTIONS).
+    botocore's own retries are off; BedrockController retries with adaptive concurrency instead.
+    """
+    config_key = (
+        region,
+        int(os.getenv("BEDROCK_MAX_POOL_CONNECTIONS", "25")),
+        int(os.getenv("BEDROCK_CONNECT_TIMEOUT", "10")),
+        int(os.getenv("BEDROCK_READ_TIMEOUT", "300"))
+    )
+    with _runtime_clients_lock:
+        if config_key not in _runtime_clients:
+            import boto3
+            from botocore.config import Config
+            _, max_pool_connections, connect_timeout, read_timeout = config_key
+            _runtime_clients[config_key] = boto3.client(
+                "bedrock-runtime",
+                region_name=region,
+                config=Config(
+                    max_pool_connections=max_pool_connections,
+                    connect_timeout=connect_timeout,
+                    read_timeout=read_timeout,
+                    tcp_keepalive=True,
+                    retries={"mode": "standard", "total_max_attempts": 1}
+                )
+            )
+        return _runtime_clients[config_key]
+
+def log_usage(usage: Dict[str, int]) -> None:
+    """Print the token usage of a call, splitting input into uncached, cache-read and cache-write tokens"""
+    if not usage:
+        return
+    print(f"📊 Tokens: {usage.get('input_tokens', 0)} input uncached, "
+          f"{usage.get('cache_read_input_tokens', 0)} read from cache, "
+          f"{usage.get('cache_creation_input_tokens', 0)} written to cache, "
+          f"{usage.get('output_tokens', 0)} output")
 
 class BedrockClient:
-    def __init__(self):
-        self.client = boto3.client("bedrock-runtime", region_name="us-east-1")
+    def __init__(self, model_id: str = "anthropic.claude-3-sonnet-20240229-v1:0", region: str = "us-east-1",
+                 max_tokens: int = 1000, temperature: float = 0.7, prompt_caching: Optional[bool] = None):
+        self.model_id = model_id
+        self.region = region
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        # Mark the static start of template prompts as cacheable (needs a model with prompt caching)
+        self.prompt_caching = (os.getenv("BEDROCK_PROMPT_CACHING", "0") == "1"
+                               if prompt_caching is None else prompt_caching)
+        self._client = None
+
+    @property
+    def client(self):
+        """Shared bedrock-runtime client, created lazily on the first call"""
+        if self._client is None:
+            self._client = get_runtime_client(self.region)
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    def build_request(self, prompt: str, max_tokens: Optional[int] = None,
+                      temperature: Optional[float] = None, cache_prefix: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Request body for a single-message prompt, as sent to invoke_model or written to a batch job
         
-    def generate_text(self, prompt: str) -> Optional[Dict]:
-        """Generate text using AWS Bedrock"""
-        try:
-            response = self.client.invoke_model(
-                modelId="anthropic.claude-3-sonnet-20240229-v1:0",
-                body=json.dumps({
-                    "anthropic_version": "bedrock-2023-05-31",
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    "max_tokens": 1000,
-                    "temperature": 0.7
-                })
-            )
+        With a cache_prefix that the prompt starts with, the message is sent as
+        two text blocks and the first one carries a cache_control marker, so the
+        model can reuse its processing of the fixed instructions across calls.
+        """
+        content: Any = prompt
+        if cache_prefix and prompt.startswith(cache_prefix) and len(prompt) > len(cache_prefix):
+            content = [
+                {"type": "text", "text": cache_prefix, "cache_control": {"type": "ephemeral"}},
+                {"type": "text", "text": prompt[len(cache_prefix):]}
+            ]
+        return {
+            "anthropic_version": ANTHROPIC_VERSION,
+            "max_tokens": max_tokens if max_tokens is not None else self.max_tokens,
+            "temperature": temperature if temperature is not None else self.temperature,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": content
+                }
+            ]
+        }
+
+    def invoke(self, prompt: str, max_tokens: Optional[int] = None, temperature: Optional[float] = None,
+               use_cache: bool = True, on_text: Optional[Callable[[str], None]] = None,
+               template_id: Optional[str] = None, cache_prefix: Optional[str] = None,
+               n_files: Optional[int] = None) -> str:
+        """
+        Send a single-message prompt to the model and return the response text
+        
+        Identical requests (same model, prompt and sampling parameters) are served
+        from the on-disk response cache unless use_cache is False or
+        BEDROCK_CACHE_BYPASS=1. Token usage, including prompt cache reads and
+        writes, is printed after each model call. Calls go through the model's
+        BedrockController, which retries throttling and transient errors and
+        adapts concurrency; a stream is only retried before any text was passed on.
+        Every call, including response cache hits and failures, is recorded in
+        the telemetry sink.
+        
+        Args:
+            prompt (str): Prompt text
+            max_tokens (int, optional): Overrides the client's max_tokens
+            temperature (float, optional): Overrides the client's temperature
+            use_cache (bool): Whether to read and write the response cache
+            on_text (Callable[[str], None], optional): Stream the response and call this
+                with each piece of text as it is generated (once with the whole text on a cache hit)
+            template_id (str, optional): Name and version of the prompt template, part of the cache key
+            cache_prefix (str, optional): Static start of the prompt to mark for prompt caching,
+                used when prompt caching is enabled
+            n_files (int, optional): Files in the prompt, recorded for tokens-per-file telemetry
             
-            response_body = json.loads(response.get('body').read())
-            content = response_body.get('content', [{}])[0].get('text', '{}')
+        Returns:
+            str: Text of the first content block of the response
+        """
+        request = self.build_request(prompt, max_tokens=max_tokens, temperature=temperature,
+                                     cache_prefix=cache_prefix if self.prompt_caching else None)
+        params = {key: value for key, value in request.items() if key != "messages"}
+        cache = get_response_cache()
+        use_cache = use_cache and not cache.bypass
+        if template_id:
+            params["template"] = template_id
+        cache_key = response_cache_key(self.model_id, prompt, **params)
+        telemetry = get_telemetry()
+        start = time.perf_counter()
+        if use_cache:
+            cached = cache.get_response(cache_key)
+            if cached is not None:
+                print("💾 Using cached Bedrock response")
+                telemetry.record(self.model_id, template_id, {}, time.perf_counter() - start, n_files,
+                                 response_cache=True)
+                if on_text:
+                    on_text(cached)
+                return cached
+
+        body = json.dumps(request)
+        controller = get_bedrock_controller(self.model_id)
+        try:
+            if on_text:
+                streamed = []
+                def forward(text: str) -> None:
+                    streamed.append(text)
+                    on_text(text)
+                content, usage = controller.call(lambda: self._invoke_stream(body, forward),
+                                                 can_retry=lambda: not streamed)
+            else:
+                content, usage = controller.call(lambda: self._invoke_once(body))
+        except Exception as e:
+            telemetry.record(self.model_id, template_id, {}, time.perf_counter() - start, n_files,
+                             status=type(e).__name__, streamed=on_text is not None)
+            raise
+        telemetry.record(self.model_id, template_id, usage, time.perf_counter() - start, n_files,
+                         streamed=on_text is not None)
+        log_usage(usage)
+        if use_cache:
+            cache.put_response(cache_key, content, {"model_id": self.model_id})
+        return content
+        
+    def _invoke_once(self, body: str) -> Tuple[str, Dict[str, int]]:
+        """Invoke the model and return the text of the first content block and the token usage"""
+        response = self.client.invoke_model(modelId=self.model_id, body=body)
+        response_body = json.loads(response.get('body').read())
+        content = response_body.get('content', [{}])[0].get('text', '{}')
+        return content, response_body.get('usage') or {}
+
+    def _invoke_stream(self, body: str, on_text: Callable[[str], None]) -> Tuple[str, Dict[str, int]]:
+        """
+        Invoke the model with a streamed response, passing text deltas to on_text as they arrive
+        
+        Returns the full text and the token usage reported by the message_start
+        and message_delta events.
+        """
+        response = self.client.invoke_model_with_response_stream(modelId=self.model_id, body=body)
+        parts = []
+        usage: Dict[str, int] = {}
+        for event in response.get('body'):
+            chunk = event.get('chunk')
+            if not chunk:
+                continue
+            payload = json.loads(chunk['bytes'])
+            delta = payload.get('delta') or {}
+            if payload.get('type') == 'content_block_delta' and delta.get('type') == 'text_delta':
+                parts.append(delta['text'])
+                on_text(delta['text'])
+            elif payload.get('type') == 'message_start':
+                usage.update((payload.get('message') or {}).get('usage') or {})
+            elif payload.get('type') == 'message_delta':
+                usage.update(payload.get('usage') or {})
+        return "".join(parts) or '{}', usage
+
+    @staticmethod
+    def parse_response(content: str) -> Dict:
+        """Parse a model response as JSON, keeping unparseable text as the issue"""
+        try:
+            # First try parsing directly
+            result = json.loads(content)
             
-            # Try to parse the content as JSON
-            try:
-                # First try parsing directly
-                result = json.loads(content)
-                
-                # If the result is a string, it might be a JSON string
-                if isinstance(result, str):
-                    try:
-                        # Try parsing the string as JSON
-                        result = json.loads(result)
-                    except json.JSONDecodeError:
-                        # If that fails, return the string as is
-                        return {"issue": result}
-                
-                return result
-            except json.JSONDecodeError:
-                # If parsing fails, return the content as is
-                return {"issue": content}
+            # If the result is a string, it might be a JSON string
+            if isinstance(result, str):
+                try:
+                    # Try parsing the string as JSON
+                    result = json.loads(result)
+                except json.JSONDecodeError:
+                    # If that fails, return the string as is
+                    return {"issue": result}
             
+            return result
+        except json.JSONDecodeError:
+            # If parsing fails, return the content as is
+            return {"issue": content}
+
+    def generate_text(self, prompt: str, use_cache: bool = True,
+                      on_suggestion: Optional[Callable[[Dict], None]] = None,
+                      template_id: Optional[str] = None, cache_prefix: Optional[str] = None,
+                      n_files: Optional[int] = None) -> Optional[Dict]:
+        """
+        Generate text using AWS Bedrock
+        
+        With on_suggestion the response is streamed, and every object with an
+        "issue" key is passed to it as soon as the model finishes writing it.
+        """
+        try:
+            on_text = None
+            if on_suggestion:
+                parser = IncrementalJSONParser(required_key="issue")
+                def on_text(text: str) -> None:
+                    for suggestion in parser.feed(text):
+                        on_suggestion(suggestion)
+            content = self.invoke(prompt, use_cache=use_cache, on_text=on_text, template_id=template_id,
+                                  cache_prefix=cache_prefix, n_files=n_files)
+            return self.parse_response(content)
         except Exception as e:
             print(f"Error generating text with Bedrock: {str(e)}")
             return None
@@ -64,79 +271,24 @@ class BedrockClient:
         Returns:
             Dict[str, Any]: Analysis results
         """
-        prompt = f"""You are an AI code reviewer. Analyze the following Python code and suggest one important improvement. 
-        Focus on:
-        1. Code quality and readability
-        2. Performance optimization
-        3. Security considerations
-        4. Best practices
-        
-        Return your analysis in this JSON format:
-        {{
-            "issue": "Description of the issue found",
-            "benefit": {{
-                "explanation": "How this optimization helps",
-                "impact": "High/Medium/Low"
-            }},
-            "suggestion": "Specific code suggestion"
-        }}
-        
-        Here's the code to analyze:
-        
-        {code}"""
+        template = get_prompt_registry().get("quick_review")
+        prompt = template.render(code=code)
         
-        return self.generate_text(prompt)
+        return self.generate_text(prompt, template_id=template.id, cache_prefix=template.prefix)
 
     def analyze_structured_data(self, data: Dict[str, Any]) -> Optional[Dict]:
         """Analyze structured data using AWS Bedrock"""
         try:
             # Convert the structured data to a clear prompt
-            prompt = f"""You are an expert code reviewer. Analyze this repository and its files to suggest optimizations.
-
-Repository Information:
-{json.dumps(data['repository'], indent=2)}
-
-Files to Analyze:
-{json.dumps(data['files'], indent=2)}
-
-Analysis Requirements:
-{json.dumps(data['analysis_requirements'], indent=2)}
-
-Please analyze each file and provide suggestions in this exact format:
-{{
-    "analyses": [
-        {{
-            "file": "string (file path)",
-            "issue": "string (description of the issue)",
-            "benefit": {{
-                "explanation": "string (how this optimization helps)",
-                "impact": "string (High/Medium/Low)"
-            }},
-            "suggestion": "string (specific code suggestion)"
-        }},
-        // ... more analyses for other files
-    ]
-}}
-
-Focus on the relationships between files and how they can be optimized together. Provide at least one analysis per file."""
-
-            response = self.client.invoke_model(
-                modelId="anthropic.claude-3-sonnet-20240229-v1:0",
-                body=json.dumps({
-                    "anthropic_version": "bedrock-2023-05-31",
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    "max_tokens": 4000,  # Increased for multiple file analysis
-                    "temperature": 0.7
-                })
+            template = get_prompt_registry().get("structured_analysis")
+            prompt = template.render(
+                repository=json.dumps(data['repository'], indent=2),
+                files=json.dumps(data['files'], indent=2),
+                analysis_requirements=json.dumps(data['analysis_requirements'], indent=2)
             )
-            
-            response_body = json.loads(response.get('body').read())
-            content = response_body.get('content', [{}])[0].get('text', '{}')
+
+            # Increased max_tokens for multiple file analysis
+            content = self.invoke(prompt, max_tokens=4000, template_id=template.id, cache_prefix=template.prefix)
             
             # If content is already a dict, return it
             if isinstance(content, dict):
@@ -184,31 +336,46 @@ Focus on the relationships between files and how they can be optimized together.
             print(traceback.format_exc())
             return None
 
-    def analyze_multiple_files(self, files: List[Dict]) -> Optional[Dict]:
-        """Analyze multiple files and return the single highest-impact suggestion"""
+    def build_analysis_prompt(self, files: List[Dict]) -> Optional[str]:
+        """Fill the multi-file analysis template with the given files (or pieces of files)"""
         # Prepare the files section of the prompt
-        files_section = "\n\n".join([
-            f"File: {file['name']}\nPath: {file['path']}\n\n{file['content']}"
-            for file in files
-        ])
-
-        # Read the prompt template
+        files_section = "\n\n".join(format_piece(file) for file in files)
         try:
-            with open('prompts/code_analysis.txt', 'r') as f:
-                prompt_template = f.read()
-        except FileNotFoundError:
-            print("Error: prompts/code_analysis.txt not found")
-            return None
-        except Exception as e:
-            print(f"Error reading prompt template: {str(e)}")
+            return get_prompt_registry().render("code_analysis", files_section=files_section)
+        except PromptTemplateError as e:
+            print(f"Error: {str(e)}")
             return None
 
-        # Format the prompt with the files section
-        prompt = prompt_template.format(files_section=files_section)
+    def plan_analysis_groups(self, files: List[Dict], group_size: Optional[int] = 1,
+                             token_budget: Optional[int] = None) -> List[List[Dict]]:
+        """Split files into the groups sent as one analysis prompt each"""
+        if token_budget:
+            try:
+                template = get_prompt_registry().get("code_analysis").text
+            except PromptTemplateError:
+                template = ""
+            files_budget = token_budget - estimate_tokens(template) - self.max_tokens
+            if files_budget >= MIN_FILES_BUDGET:
+                return pack_files(files, files_budget, max_files_per_prompt=group_size)
+            print(f"⚠️ Token budget {token_budget} leaves only {files_budget} tokens for code after the template "
+                  f"and {self.max_tokens} response tokens (minimum {MIN_FILES_BUDGET}); sending whole files instead")
+        group_size = max(1, group_size or len(files))
+        return [files[i:i + group_size] for i in range(0, len(files), group_size)]
+
+    def analyze_multiple_files(self, files: List[Dict],
+                               on_suggestion: Optional[Callable[[Dict], None]] = None) -> Optional[Dict]:
+        """Analyze multiple files and return the single highest-impact suggestion"""
+        prompt = self.build_analysis_prompt(files)
+        if prompt is None:
+            return None
         print("\nPrompt being sent to model:", prompt)
 
         try:
-            response = self.generate_text(prompt)
+            template = get_prompt_registry().get("code_analysis")
+            response = self.generate_text(
+                prompt, on_suggestion=on_suggestion, template_id=template.id, cache_prefix=template.prefix,
+                n_files=len({file["path"] for file in files})
+            )
             if response:
                 print("\n🔍 Raw response from model:")
                 print(response)
@@ -220,6 +387,45 @@ Focus on the relationships between files and how they can be optimized together.
             print(f"Error analyzing files: {str(e)}")
             return None
 
+    def analyze_group(self, group: List[Dict],
+                      on_suggestion: Optional[Callable[[Dict], None]] = None) -> List[Dict]:
+        """Analyze one group of files or pieces, with line numbers mapped back to the full files"""
+        streamed = []
+        def emit(suggestion: Dict) -> None:
+            suggestion = remap_lines(suggestion, group)
+            streamed.append(suggestion)
+            on_suggestion(suggestion)
+
+        result = self.analyze_multiple_files(group, on_suggestion=emit if on_suggestion else None)
+        if streamed:
+            return streamed
+        results = result if isinstance(result, list) else [result]
+        return [remap_lines(r, group) for r in results if isinstance(r, dict)]
+
+    def analyze_files_concurrently(self, files: List[Dict], group_size: Optional[int] = 1,
+                                   max_workers: int = 4, token_budget: Optional[int] = None,
+                                   on_suggestion: Optional[Callable[[Dict], None]] = None) -> List[Dict]:
+        """
+        Analyze files in small groups as concurrent model calls
+        
+        Each group gets its own best suggestion, so one oversized or malformed
+        file only loses the suggestion of its own group. With a token budget,
+        files are packed into as few prompts as fit (at most `group_size` pieces
+        each) and files too big for one prompt are split at function/class
+        boundaries; suggestion line numbers are mapped back to the full file.
+        With on_suggestion, responses are streamed and each suggestion is passed
+        to it as soon as it is complete; the same objects are returned.
+        """
+        groups = self.plan_analysis_groups(files, group_size=group_size, token_budget=token_budget)
+        print(f"\n🚀 Analyzing {len(files)} files in {len(groups)} requests "
+              f"({min(max_workers, len(groups))} at a time)")
+
+        suggestions = []
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            for results in executor.map(lambda group: self.analyze_group(group, on_suggestion), groups):
+                suggestions.extend(results)
+        return suggestions
+
 if __name__ == "__main__":
     # Example usage
     client = BedrockClient()
@@ -0,0 +1,230 @@
+import os
+import time
+import random
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+# Error codes of the Bedrock runtime API worth another attempt
+THROTTLING_CODES = {"ThrottlingException", "TooManyRequestsException", "ServiceQuotaExceededException"}
+TRANSIENT_CODES = {"ServiceUnavailableException", "ModelNotReadyException", "InternalServerException",
+                   "ModelTimeoutException", "ModelStreamErrorException"}
+# botocore exceptions raised for network trouble, matched by name so botocore isn't imported here
+TRANSIENT_EXCEPTIONS = {"ReadTimeoutError", "ConnectTimeoutError", "EndpointConnectionError",
+                        "ConnectionClosedError", "ResponseStreamingError", "ProtocolError"}
+
+
+class CircuitOpenError(RuntimeError):
+    """Bedrock calls for a model are suspended after too many failures"""
+
+
+def classify_error(error: Exception) -> str:
+    """
+    Classify an exception from a Bedrock call
+
+    Returns:
+        str: "throttle" (quota exceeded, back off and lower concurrency),
+            "transient" (service or network trouble, retry) or "fatal" (don't retry)
+    """
+    response = getattr(error, "response", None)
+    code = response.get("Error", {}).get("Code", "") if isinstance(response, dict) else ""
+    if code in THROTTLING_CODES:
+        return "throttle"
+    if code in TRANSIENT_CODES:
+        return "transient"
+    if not code and type(error).__name__ in TRANSIENT_EXCEPTIONS:
+        return "transient"
+    return "fatal"
+
+
+class AdaptiveLimiter:
+    """
+    AIMD limit on concurrent calls
+
+    The limit grows by about one per round of calls while they complete within
+    the latency target and the limit is actually in use, and is halved on
+    throttling (at most once per `decrease_interval` seconds, so one burst of
+    throttles counts once).
+    """
+
+    def __init__(self, initial: float, minimum: float, maximum: float, latency_target: float,
+                 decrease_interval: float = 2.0, name: str = ""):
+        self.minimum = max(1.0, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = min(max(float(initial), self.minimum), self.maximum)
+        self.latency_target = latency_target
+        self.decrease_interval = decrease_interval
+        self.name = name
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self) -> None:
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self, latency: float) -> None:
+        """Record a successful call, made while holding a slot"""
+        with self._condition:
+            if latency <= self.latency_target and self.in_flight >= int(self.limit) and self.limit < self.maximum:
+                previous = int(self.limit)
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+                if int(self.limit) != previous:
+                    print(f"🚦 Bedrock concurrency for {self.name} raised to {int(self.limit)}")
+                    self._condition.notify_all()
+
+    def on_throttle(self) -> None:
+        with self._condition:
+            now = time.monotonic()
+            if now - self._last_decrease < self.decrease_interval:
+                return
+            self._last_decrease = now
+            self.limit = max(self.minimum, self.limit / 2)
+            print(f"🚦 Bedrock concurrency for {self.name} lowered to {int(self.limit)} (throttled)")
+
+
+class CircuitBreaker:
+    """
+    Stops calls while the recent error rate is too high
+
+    Outcomes of the last `window` calls are kept; once at least `min_calls` are
+    known and the failure share reaches `threshold`, the breaker opens and calls
+    fail fast for `cooldown` seconds. Then a single probe call is let through:
+    success closes the breaker, failure opens it again for twice as long (up to
+    ten times the base cooldown).
+    """
+
+    def __init__(self, window: int, threshold: float, cooldown: float, min_calls: int = 5, name: str = ""):
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.cooldown = cooldown
+        self.min_calls = min_calls
+        self.name = name
+        self.state = "closed"
+        self._outcomes: Deque[bool] = deque(maxlen=max(1, window))
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a call may go through now"""
+        with self._lock:
+            if self.state == "open":
+                remaining = self._opened_at + self.cooldown - time.monotonic()
+                if remaining > 0:
+                    raise CircuitOpenError(f"Bedrock circuit for {self.name} is open, retry in {remaining:.0f}s")
+                self.state = "half_open"
+            if self.state == "half_open":
+                if self._probing:
+                    raise CircuitOpenError(f"Bedrock circuit for {self.name} is half-open, waiting for a probe call")
+                self._probing = True
+
+    def record(self, ok: Optional[bool]) -> None:
+        """Record the outcome of a call: True, False, or None for errors that say nothing about the service"""
+        with self._lock:
+            if self.state == "half_open":
+                self._probing = False
+                if ok:
+                    print(f"✅ Bedrock circuit for {self.name} closed")
+                    self.state, self.cooldown = "closed", self.base_cooldown
+                    self._outcomes.clear()
+                elif ok is False:
+                    self.cooldown = min(self.cooldown * 2, self.base_cooldown * 10)
+                    self._open("probe call failed")
+                return
+            if ok is None:
+                return
+            self._outcomes.append(ok)
+            failures = self._outcomes.count(False)
+            if (self.state == "closed" and len(self._outcomes) >= self.min_calls
+                    and failures / len(self._outcomes) >= self.threshold):
+                self._open(f"{failures}/{len(self._outcomes)} recent calls failed")
+
+    def _open(self, reason: str) -> None:
+        self.state = "open"
+        self._opened_at = time.monotonic()
+        print(f"⛔ Bedrock circuit for {self.name} opened for {self.cooldown:.0f}s ({reason})")
+
+
+class BedrockController:
+    """Retries, adaptive concurrency and circuit breaking around the calls to one model"""
+
+    def __init__(self, model_id: str):
+        self.model_id = model_id
+        self.max_attempts = max(1, int(os.getenv("BEDROCK_MAX_ATTEMPTS", "5")))
+        self.backoff_base = float(os.getenv("BEDROCK_BACKOFF_BASE", "1"))
+        self.backoff_max = float(os.getenv("BEDROCK_BACKOFF_MAX", "30"))
+        self.limiter = AdaptiveLimiter(
+            initial=float(os.getenv("BEDROCK_INITIAL_CONCURRENCY", "4")),
+            minimum=float(os.getenv("BEDROCK_MIN_CONCURRENCY", "1")),
+            maximum=float(os.getenv("BEDROCK_MAX_CONCURRENCY", "16")),
+            latency_target=float(os.getenv("BEDROCK_LATENCY_TARGET", "60")),
+            name=model_id
+        )
+        self.breaker = CircuitBreaker(
+            window=int(os.getenv("BEDROCK_BREAKER_WINDOW", "20")),
+            threshold=float(os.getenv("BEDROCK_BREAKER_THRESHOLD", "0.5")),
+            cooldown=float(os.getenv("BEDROCK_BREAKER_COOLDOWN", "30")),
+            name=model_id
+        )
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff before retry number `attempt` (0-based)"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def call(self, function: Callable[[], Any], can_retry: Optional[Callable[[], bool]] = None) -> Any:
+        """
+        Run a Bedrock call under the concurrency limit, retrying throttling and transient errors
+
+        Args:
+            function (Callable): The call to make
+            can_retry (Callable[[], bool], optional): Checked before each retry, e.g. to
+                avoid repeating a stream whose text was already passed on
+
+        Raises:
+            CircuitOpenError: If calls to the model are suspended
+            Exception: The last error, once it isn't retryable or attempts run out
+        """
+        for attempt in range(self.max_attempts):
+            self.breaker.before_call()
+            self.limiter.acquire()
+            start = time.perf_counter()
+            try:
+                result = function()
+            except Exception as e:
+                kind = classify_error(e)
+                if kind == "throttle":
+                    self.limiter.on_throttle()
+                # Throttling is handled by the limiter; only service failures count toward the breaker
+                self.breaker.record(False if kind == "transient" else None)
+                if kind == "fatal" or attempt == self.max_attempts - 1 or (can_retry and not can_retry()):
+                    raise
+                delay = self.backoff(attempt)
+                print(f"🔁 Bedrock {kind} error ({type(e).__name__}), retry {attempt + 1}/{self.max_attempts - 1} "
+                      f"in {delay:.1f}s")
+            else:
+                self.limiter.on_success(time.perf_counter() - start)
+                self.breaker.record(True)
+                return result
+            finally:
+                self.limiter.release()
+            time.sleep(delay)
+
+
+_controllers: Dict[str, BedrockController] = {}
+_controllers_lock = threading.Lock()
+
+
+def get_bedrock_controller(model_id: str) -> BedrockController:
+    """Return the process-wide controller for a model, shared by all clients using it"""
+    with _controllers_lock:
+        if model_id not in _controllers:
+            _controllers[model_id] = BedrockController(model_id)
+        return _controllers[model_id]
@@ -0,0 +1,138 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from .bedrock_client import BedrockClient
+from .prompts import get_prompt_registry, PromptTemplateError
+from .prompt_packer import format_piece
+
+DEFAULT_TRIAGE_MODEL_ID = "anthropic.claude-3-haiku-20240307-v1:0"
+
+
+def describe_piece(piece: Dict) -> str:
+    """Path of a file or piece, with its line range when it is only part of the file"""
+    if "start_line" in piece and (piece["start_line"] > 1 or piece["end_line"] < piece["total_lines"]):
+        return f"{piece['path']}:{piece['start_line']}-{piece['end_line']}"
+    return piece["path"]
+
+
+class ModelCascade:
+    """
+    Two-tier analysis: a small model triages every chunk and only the promising
+    ones are sent to the analysis model for a full suggestion
+    """
+
+    def __init__(self, analysis_client: BedrockClient, triage_client: Optional[BedrockClient] = None,
+                 threshold: Optional[float] = None, max_workers: int = 4):
+        self.analysis_client = analysis_client
+        self.triage_client = triage_client or BedrockClient(
+            model_id=os.getenv("TRIAGE_MODEL_ID", DEFAULT_TRIAGE_MODEL_ID),
+            region=analysis_client.region,
+            max_tokens=int(os.getenv("TRIAGE_MAX_TOKENS", "500")),
+            temperature=0.0
+        )
+        self.threshold = threshold if threshold is not None else float(os.getenv("CASCADE_THRESHOLD", "0.5"))
+        self.max_workers = max(1, max_workers)
+        self._latencies: Dict[str, List[float]] = {"triage": [], "analysis": []}
+        self._lock = threading.Lock()
+
+    def _timed(self, tier: str, call: Callable, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return call(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._latencies[tier].append(time.perf_counter() - start)
+
+    def triage_group(self, group: List[Dict]) -> List[Optional[Dict]]:
+        """
+        Score each piece of a group with the triage model
+
+        Returns a {"confidence", "reason"} dict per piece, or None for pieces the
+        model didn't score (including when the call fails).
+        """
+        try:
+            template = get_prompt_registry().get("triage")
+            files_section = "\n\n".join(
+                f"### Chunk {index}\n{format_piece(piece)}" for index, piece in enumerate(group, 1)
+            )
+            prompt = template.render(files_section=files_section)
+        except PromptTemplateError as e:
+            print(f"Error: {str(e)}")
+            return [None] * len(group)
+
+        response = self._timed("triage", self.triage_client.generate_text, prompt,
+                               template_id=template.id, cache_prefix=template.prefix,
+                               n_files=len({piece["path"] for piece in group}))
+        scores: List[Optional[Dict]] = [None] * len(group)
+        for entry in (response or {}).get("chunks") or []:
+            try:
+                index = int(entry["chunk"]) - 1
+                confidence = float(entry["confidence"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if 0 <= index < len(group):
+                scores[index] = {"confidence": confidence, "reason": str(entry.get("reason", ""))}
+        return scores
+
+    def route(self, groups: List[List[Dict]]) -> List[List[Dict]]:
+        """Triage all groups concurrently and keep the pieces to escalate, in their original groups"""
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, max(1, len(groups)))) as executor:
+            all_scores = list(executor.map(self.triage_group, groups))
+
+        escalated_groups = []
+        for group, scores in zip(groups, all_scores):
+            escalated = []
+            for piece, score in zip(group, scores):
+                if score is None:
+                    # Unscored chunks go to the analysis model rather than being dropped
+                    print(f"🔀 {describe_piece(piece)}: not triaged -> escalate")
+                    escalated.append(piece)
+                elif score["confidence"] >= self.threshold:
+                    print(f"🔀 {describe_piece(piece)}: confidence {score['confidence']:.2f} -> escalate "
+                          f"({score['reason']})")
+                    escalated.append(piece)
+                else:
+                    print(f"🔀 {describe_piece(piece)}: confidence {score['confidence']:.2f} -> skip "
+                          f"({score['reason']})")
+            if escalated:
+                escalated_groups.append(escalated)
+        return escalated_groups
+
+    def analyze(self, files: List[Dict], group_size: Optional[int] = 1, token_budget: Optional[int] = None,
+                on_suggestion: Optional[Callable[[Dict], None]] = None) -> List[Dict]:
+        """
+        Analyze files through the cascade
+
+        Files are split and grouped as the analysis model would get them, so the
+        escalated pieces are sent on unchanged; groups lose the pieces the triage
+        model skipped.
+        """
+        groups = self.analysis_client.plan_analysis_groups(files, group_size=group_size, token_budget=token_budget)
+        total = sum(len(group) for group in groups)
+        print(f"\n🔀 Triaging {total} chunks of {len(files)} files with {self.triage_client.model_id}")
+        escalated = self.route(groups)
+
+        suggestions = []
+        if escalated:
+            print(f"🚀 Escalating {sum(len(g) for g in escalated)} chunks in {len(escalated)} requests "
+                  f"to {self.analysis_client.model_id}")
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(escalated))) as executor:
+                for results in executor.map(
+                    lambda group: self._timed("analysis", self.analysis_client.analyze_group, group, on_suggestion),
+                    escalated
+                ):
+                    suggestions.extend(results)
+        self.print_summary(total, sum(len(group) for group in escalated))
+        return suggestions
+
+    def print_summary(self, total: int, escalated: int) -> None:
+        """Routing and per-tier latency of the calls made so far"""
+        parts = []
+        for tier, latencies in self._latencies.items():
+            if latencies:
+                parts.append(f"{tier} {len(latencies)} calls, {sum(latencies) / len(latencies):.1f}s avg, "
+                             f"{max(latencies):.1f}s max")
+        print(f"⏱️ Cascade: escalated {escalated}/{total} chunks; " + ("; ".join(parts) or "no model calls"))
@@ -0,0 +1,189 @@
+import ast
+from typing import Dict, List, Optional, Tuple
+from utils.ast_utils import matches_path, node_start
+from utils.text_utils import estimate_tokens
+
+# Rough size of the "File:/Path:/Lines:" header added in front of each piece
+HEADER_TOKENS = 30
+
+
+def _child_statements(node: ast.AST) -> List[ast.AST]:
+    """Statements nested directly inside a compound statement"""
+    children = []
+    for field in ("body", "handlers", "orelse", "finalbody"):
+        value = getattr(node, field, None)
+        if isinstance(value, list):
+            children.extend(child for child in value if hasattr(child, "lineno"))
+    return children
+
+
+class _Splitter:
+    """Splits the lines of one file into ranges that fit a token budget"""
+
+    def __init__(self, lines: List[str], max_tokens: int):
+        self.lines = lines
+        self.max_tokens = max_tokens
+
+    def tokens(self, start: int, end: int) -> int:
+        return estimate_tokens("".join(self.lines[start - 1:end]))
+
+    def by_lines(self, start: int, end: int) -> List[Tuple[int, int]]:
+        """Fallback split on line boundaries, for code without usable statements"""
+        ranges = []
+        piece_start, size = start, 0
+        for line_no in range(start, end + 1):
+            line_tokens = estimate_tokens(self.lines[line_no - 1])
+            if size and size + line_tokens > self.max_tokens:
+                ranges.append((piece_start, line_no - 1))
+                piece_start, size = line_no, 0
+            size += line_tokens
+        ranges.append((piece_start, end))
+        return ranges
+
+    def split(self, start: int, end: int, nodes: List[ast.AST]) -> List[Tuple[int, int]]:
+        """Split lines start..end (1-based, inclusive) at the statements in `nodes`"""
+        if self.tokens(start, end) <= self.max_tokens:
+            return [(start, end)]
+
+        bounds = sorted({node_start(node) for node in nodes if start < node_start(node) <= end})
+        if not bounds:
+            # A single statement spans the range: split inside it (class methods, function body)
+            children = [child for node in nodes for child in _child_statements(node)]
+            if any(start < node_start(child) <= end for child in children):
+                return self.split(start, end, children)
+            return self.by_lines(start, end)
+
+        ranges = []
+        bounds = [start] + bounds + [end + 1]
+        for range_start, next_start in zip(bounds, bounds[1:]):
+            inner = [node for node in nodes if range_start <= node_start(node) < next_start]
+            ranges.extend(self.split(range_start, next_start - 1, inner))
+        return ranges
+
+    def merge(self, ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """Join neighbouring ranges back together while they still fit"""
+        merged: List[Tuple[int, int]] = []
+        for start, end in ranges:
+            if merged and self.tokens(merged[-1][0], end) <= self.max_tokens:
+                merged[-1] = (merged[-1][0], end)
+            else:
+                merged.append((start, end))
+        return merged
+
+
+def split_file(file: Dict, max_tokens: int) -> List[Dict]:
+    """
+    Split a file into pieces of at most `max_tokens`, cutting at function and class boundaries
+
+    Each piece keeps the file's keys plus `start_line`/`end_line` (1-based, in
+    the original file), `total_lines` and `original_content` so line numbers
+    reported against a piece can be mapped back.
+    """
+    content = file["content"]
+    lines = content.splitlines(keepends=True)
+    if estimate_tokens(content) <= max_tokens or not lines:
+        ranges = [(1, max(1, len(lines)))]
+    else:
+        splitter = _Splitter(lines, max_tokens)
+        try:
+            tree = ast.parse(content)
+            ranges = splitter.split(1, len(lines), tree.body)
+        except SyntaxError:
+            ranges = splitter.by_lines(1, len(lines))
+        ranges = splitter.merge(ranges)
+
+    return [
+        {
+            **file,
+            "content": "".join(lines[start - 1:end]) if len(ranges) > 1 else content,
+            "start_line": start,
+            "end_line": end,
+            "total_lines": len(lines),
+            "original_content": content
+        }
+        for start, end in ranges
+    ]
+
+
+def pack_files(files: List[Dict], budget_tokens: int,
+               max_files_per_prompt: Optional[int] = None) -> List[List[Dict]]:
+    """
+    Bin-pack files into as few prompts as possible under a token budget
+
+    Files bigger than the budget are split first. Pieces are placed first-fit
+    in decreasing size order, then each prompt lists its pieces in the
+    original file order.
+
+    Args:
+        files (List[Dict]): Files with name, path and content
+        budget_tokens (int): Tokens available for the files section of one prompt
+        max_files_per_prompt (int, optional): Cap on pieces per prompt
+
+    Returns:
+        List[List[Dict]]: Pieces for each prompt
+    """
+    piece_budget = max(1, budget_tokens - HEADER_TOKENS)
+    pieces = []
+    for index, file in enumerate(files):
+        for piece in split_file(file, piece_budget):
+            pieces.append((index, piece, estimate_tokens(piece["content"]) + HEADER_TOKENS))
+
+    bins: List[List] = []
+    for entry in sorted(pieces, key=lambda entry: entry[2], reverse=True):
+        for packed in bins:
+            if (sum(e[2] for e in packed) + entry[2] <= budget_tokens
+                    and (max_files_per_prompt is None or len(packed) < max_files_per_prompt)):
+                packed.append(entry)
+                break
+        else:
+            bins.append([entry])
+
+    ordered = sorted(
+        (sorted(packed, key=lambda e: (e[0], e[1]["start_line"])) for packed in bins),
+        key=lambda packed: (packed[0][0], packed[0][1]["start_line"])
+    )
+    return [[piece for _, piece, _ in packed] for packed in ordered]
+
+
+def format_piece(piece: Dict) -> str:
+    """Render a piece for the files section, noting its line range when it is only part of a file"""
+    header = f"File: {piece['name']}\nPath: {piece['path']}\n"
+    if "start_line" in piece and (piece["start_line"] > 1 or piece["end_line"] < piece["total_lines"]):
+        header += (f"Lines: {piece['start_line']}-{piece['end_line']} of {piece['total_lines']} "
+                   f"(report line numbers of the full file)\n")
+    return f"{header}\n{piece['content']}"
+
+
+def remap_lines(suggestion: Dict, pieces: List[Dict]) -> Dict:
+    """
+    Make a suggestion's start_line/end_line refer to the original file
+
+    The position of old_code in the full file is authoritative. If it can't be
+    found, line numbers outside every piece are taken to be relative to the
+    piece and shifted by its offset.
+    """
+    target = str(suggestion.get("file_path") or suggestion.get("file") or "")
+    candidates = [p for p in pieces if "start_line" in p and matches_path(p["path"], target)]
+    if not candidates:
+        return suggestion
+
+    old_code = suggestion.get("old_code") or ""
+    original = candidates[0]["original_content"]
+    position = original.find(old_code) if old_code.strip() else -1
+    if position < 0 and old_code.strip():
+        position = original.find(old_code.strip())
+        old_code = old_code.strip()
+    if position >= 0:
+        start = original.count("\n", 0, position) + 1
+        suggestion["start_line"] = start
+        suggestion["end_line"] = start + old_code.rstrip("\n").count("\n")
+        return suggestion
+
+    try:
+        start, end = int(suggestion.get("start_line")), int(suggestion.get("end_line"))
+    except (TypeError, ValueError):
+        return suggestion
+    if not any(p["start_line"] <= start <= p["end_line"] for p in candidates):
+        offset = candidates[0]["start_line"] - 1
+        suggestion["start_line"], suggestion["end_line"] = start + offset, end + offset
+    return suggestion
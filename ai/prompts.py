@@ -0,0 +1,166 @@
+import os
+import string
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+# Placeholders each known template must use, checked whenever it is (re)loaded
+EXPECTED_FIELDS: Dict[str, Set[str]] = {
+    "code_analysis": {"files_section"},
+    "triage": {"files_section"},
+    "single_file_analysis": {"code"},
+    "code_review": {"code"},
+    "quick_review": {"code"},
+    "file_selection": {"n_files", "repo_name", "owner", "structure"},
+    "structured_analysis": {"repository", "files", "analysis_requirements"}
+}
+
+
+class PromptTemplateError(ValueError):
+    """A prompt template is missing or its placeholders are invalid"""
+
+
+class PromptTemplate:
+    """A prompt template parsed once, with a version hash of its text"""
+
+    _formatter = string.Formatter()
+
+    def __init__(self, name: str, text: str, path: Optional[Path] = None, mtime: float = 0.0, size: int = 0):
+        self.name = name
+        self.text = text
+        self.path = path
+        self.mtime = mtime
+        self.size = size
+        self.version = hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+        try:
+            self._segments: List[Tuple[str, Optional[str], str, Optional[str]]] = list(self._formatter.parse(text))
+        except ValueError as e:
+            raise PromptTemplateError(f"Invalid placeholder syntax in prompt '{name}': {e}")
+        self.fields = set()
+        for _, field, spec, _ in self._segments:
+            if field is None:
+                continue
+            self.fields.add(self._root(field))
+            # Nested fields in a format spec like {count:>{width}} need values too
+            self.fields.update(self._root(nested) for _, nested, _, _ in self._formatter.parse(spec or "")
+                               if nested is not None)
+        if "" in self.fields:
+            raise PromptTemplateError(f"Prompt '{name}' has a positional {{}} placeholder, use named fields")
+
+    @staticmethod
+    def _root(field: str) -> str:
+        """Variable name of a placeholder like "repo.name" or "files[0]\""""
+        for separator in (".", "["):
+            field = field.split(separator, 1)[0]
+        return field
+
+    @property
+    def id(self) -> str:
+        """Name and version, e.g. "code_analysis@1a2b3c4d5e6f", for cache keys and logs"""
+        return f"{self.name}@{self.version}"
+
+    @property
+    def prefix(self) -> str:
+        """Rendered text before the first placeholder, identical for every call"""
+        parts = []
+        for literal, field, _, _ in self._segments:
+            parts.append(literal)
+            if field is not None:
+                break
+        return "".join(parts)
+
+    def validate(self, expected: Optional[Set[str]]) -> None:
+        """Check the placeholders against the ones the caller fills in"""
+        if expected is None:
+            return
+        unknown, missing = self.fields - expected, expected - self.fields
+        if unknown or missing:
+            raise PromptTemplateError(
+                f"Prompt '{self.name}' placeholders don't match: "
+                f"unknown {sorted(unknown) or 'none'}, missing {sorted(missing) or 'none'}"
+            )
+
+    def render(self, **values) -> str:
+        """Fill in the template from the pre-parsed segments"""
+        missing = self.fields - set(values)
+        if missing:
+            raise PromptTemplateError(f"Missing values for prompt '{self.name}': {sorted(missing)}")
+        parts = []
+        for literal, field, spec, conversion in self._segments:
+            parts.append(literal)
+            if field is None:
+                continue
+            if spec and "{" in spec:
+                spec = self._formatter.vformat(spec, (), values)
+            value, _ = self._formatter.get_field(field, (), values)
+            parts.append(self._formatter.format_field(self._formatter.convert_field(value, conversion), spec))
+        return "".join(parts)
+
+
+class PromptRegistry:
+    """Prompt templates from the prompts directory, reloaded when their file changes"""
+
+    def __init__(self, prompt_dir: Optional[str] = None):
+        self.prompt_dir = Path(prompt_dir or os.getenv("PROMPTS_DIR") or Path(__file__).resolve().parent.parent / "prompts")
+        self._templates: Dict[str, PromptTemplate] = {}
+        self._lock = threading.Lock()
+        for path in sorted(self.prompt_dir.glob("*.txt")):
+            try:
+                self.get(path.stem)
+            except PromptTemplateError as e:
+                print(f"⚠️ {e}")
+
+    def _load(self, name: str, path: Path, stat: os.stat_result) -> PromptTemplate:
+        template = PromptTemplate(name, path.read_text(encoding="utf-8"), path, stat.st_mtime, stat.st_size)
+        template.validate(EXPECTED_FIELDS.get(name))
+        return template
+
+    def get(self, name: str) -> PromptTemplate:
+        """Return a template, reloading it if the file changed since it was last read"""
+        path = self.prompt_dir / f"{name}.txt"
+        with self._lock:
+            current = self._templates.get(name)
+            try:
+                stat = path.stat()
+            except OSError:
+                if current is not None:
+                    return current
+                raise PromptTemplateError(f"Prompt template {path} not found")
+            if current is not None and (current.mtime, current.size) == (stat.st_mtime, stat.st_size):
+                return current
+            try:
+                template = self._load(name, path, stat)
+            except (PromptTemplateError, OSError) as e:
+                if current is None:
+                    raise PromptTemplateError(str(e))
+                # Keep serving the last good version while the file is being edited
+                print(f"⚠️ Keeping previous version of prompt '{name}': {e}")
+                current.mtime, current.size = stat.st_mtime, stat.st_size
+                return current
+            if current is not None:
+                print(f"🔄 Reloaded prompt '{name}' ({current.version} -> {template.version})")
+            self._templates[name] = template
+            return template
+
+    def render(self, name: str, **values) -> str:
+        """Render a template by name"""
+        return self.get(name).render(**values)
+
+    def versions(self) -> Dict[str, str]:
+        """Version hash of every loaded template"""
+        with self._lock:
+            return {name: template.version for name, template in self._templates.items()}
+
+
+_prompt_registry: Optional[PromptRegistry] = None
+_prompt_registry_lock = threading.Lock()
+
+
+def get_prompt_registry() -> PromptRegistry:
+    """Return the process-wide prompt registry"""
+    global _prompt_registry
+    with _prompt_registry_lock:
+        if _prompt_registry is None:
+            _prompt_registry = PromptRegistry()
+        return _prompt_registry
@@ -0,0 +1,61 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+from utils.blob_cache import DiskLRUCache
+
+
+def response_cache_key(model_id: str, prompt: str, **params: Any) -> str:
+    """Hash of everything that determines a model response"""
+    payload = json.dumps({"model_id": model_id, "prompt": prompt, "params": params}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache(DiskLRUCache):
+    """Disk cache of Bedrock responses with a TTL, a size cap and LRU eviction"""
+
+    def __init__(self, cache_dir: Optional[Path] = None, max_bytes: Optional[int] = None,
+                 ttl_seconds: Optional[float] = None):
+        cache_dir = Path(cache_dir or os.path.join(os.getenv("CODEBREW_CACHE_DIR", "data/cache"), "bedrock"))
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv("BEDROCK_CACHE_MAX_MB", "64")) * 1024 * 1024)
+        super().__init__(cache_dir, max_bytes)
+        if ttl_seconds is None:
+            ttl_seconds = float(os.getenv("BEDROCK_CACHE_TTL_HOURS", "168")) * 3600
+        self.ttl_seconds = ttl_seconds
+        self.bypass = os.getenv("BEDROCK_CACHE_BYPASS", "0") == "1"
+
+    def get_response(self, key: str) -> Optional[str]:
+        """Return a cached response text, or None if missing or expired"""
+        def is_fresh(data: bytes) -> bool:
+            try:
+                entry = json.loads(data.decode("utf-8"))
+            except ValueError:
+                return False
+            return time.time() - entry.get("created", 0) <= self.ttl_seconds
+
+        data = self.get(key, is_valid=is_fresh)
+        return json.loads(data.decode("utf-8"))["text"] if data is not None else None
+
+    def put_response(self, key: str, text: str, metadata: Optional[Dict[str, Any]] = None) -> None:
+        """Store a response text"""
+        entry = {"created": time.time(), "text": text}
+        if metadata:
+            entry.update(metadata)
+        self.put(key, json.dumps(entry).encode("utf-8"))
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Return the process-wide Bedrock response cache"""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache()
+        return _response_cache
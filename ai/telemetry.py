@@ -0,0 +1,271 @@
+"""
+Per-call telemetry for Bedrock requests
+
+Every model call is appended to METRICS_DIR/llm_calls.jsonl (model, prompt
+template, tokens, latency, estimated cost, files in the prompt) and the running
+totals of the process are written to METRICS_DIR/codebrew_llm.prom for the
+Prometheus node exporter's textfile collector.
+
+    python -m ai.telemetry summary [--hours N] [--file PATH]
+"""
+import os
+import json
+import argparse
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from utils.blob_cache import atomic_write
+
+CALLS_FILE = "llm_calls.jsonl"
+PROMETHEUS_FILE = "codebrew_llm.prom"
+
+# USD per 1000 input/output tokens, matched by substring of the model ID (first match wins)
+MODEL_PRICES: List[Tuple[str, float, float]] = [
+    ("claude-3-5-haiku", 0.0008, 0.004),
+    ("claude-3-haiku", 0.00025, 0.00125),
+    ("claude-3-opus", 0.015, 0.075),
+    ("claude-opus", 0.015, 0.075),
+    ("sonnet", 0.003, 0.015),
+]
+# Prompt cache writes and reads relative to the input price
+CACHE_WRITE_FACTOR = 1.25
+CACHE_READ_FACTOR = 0.1
+
+LATENCY_BUCKETS = (1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+
+def parse_prices(spec: Optional[str] = None) -> List[Tuple[str, float, float]]:
+    """Prices with overrides from BEDROCK_PRICES, e.g. "claude-3-haiku=0.00025/0.00125;my-model=0.001/0.002\""""
+    prices = list(MODEL_PRICES)
+    spec = spec if spec is not None else os.getenv("BEDROCK_PRICES", "")
+    for item in spec.split(";"):
+        if "=" in item and "/" in item:
+            name, value = item.split("=", 1)
+            input_price, output_price = value.split("/", 1)
+            prices.insert(0, (name.strip(), float(input_price), float(output_price)))
+    return prices
+
+
+def estimate_cost(model_id: str, usage: Dict[str, int],
+                  prices: Optional[List[Tuple[str, float, float]]] = None) -> Optional[float]:
+    """Estimated cost in USD of a call's token usage, or None for models without a known price"""
+    for name, input_price, output_price in prices or parse_prices():
+        if name in model_id:
+            input_cost = (usage.get("input_tokens", 0)
+                          + CACHE_WRITE_FACTOR * usage.get("cache_creation_input_tokens", 0)
+                          + CACHE_READ_FACTOR * usage.get("cache_read_input_tokens", 0)) * input_price
+            return round((input_cost + usage.get("output_tokens", 0) * output_price) / 1000, 6)
+    return None
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def _labels(**labels: str) -> str:
+    """Prometheus label set, with backslashes and quotes escaped"""
+    def escape(value: str) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return ",".join(f'{key}="{escape(value)}"' for key, value in labels.items())
+
+
+class Telemetry:
+    """Appends call records to the JSONL sink and keeps the Prometheus textfile up to date"""
+
+    def __init__(self, metrics_dir: Optional[str] = None, enabled: Optional[bool] = None):
+        self.metrics_dir = Path(metrics_dir or os.getenv("METRICS_DIR", "data/metrics"))
+        self.enabled = os.getenv("TELEMETRY_ENABLED", "1") == "1" if enabled is None else enabled
+        self.prices = parse_prices()
+        self._totals: Dict[Tuple[str, str, str], Dict] = {}
+        self._lock = threading.Lock()
+
+    def record(self, model_id: str, template_id: Optional[str], usage: Dict[str, int], latency: float,
+               n_files: Optional[int] = None, status: str = "ok", response_cache: bool = False,
+               streamed: bool = False) -> Optional[Dict]:
+        """
+        Record one model call
+
+        Args:
+            model_id (str): Model the call went to
+            template_id (str, optional): Prompt template name and version
+            usage (Dict[str, int]): Token usage block of the response
+            latency (float): Wall time in seconds, including retries
+            n_files (int, optional): Files in the prompt, for tokens per file
+            status (str): "ok" or the error class name
+            response_cache (bool): Served from the local response cache, no model call made
+            streamed (bool): Whether the response was streamed
+
+        Returns:
+            Optional[Dict]: The record written, or None when telemetry is disabled
+        """
+        if not self.enabled:
+            return None
+        entry = {
+            "timestamp": datetime.now().isoformat(timespec="milliseconds"),
+            "model": model_id,
+            "template": template_id,
+            "status": status,
+            "response_cache": response_cache,
+            "streamed": streamed,
+            "latency_s": round(latency, 3),
+            "input_tokens": usage.get("input_tokens", 0),
+            "output_tokens": usage.get("output_tokens", 0),
+            "cache_read_input_tokens": usage.get("cache_read_input_tokens", 0),
+            "cache_creation_input_tokens": usage.get("cache_creation_input_tokens", 0),
+            "cost_usd": 0.0 if response_cache else estimate_cost(model_id, usage, self.prices),
+            "n_files": n_files
+        }
+        try:
+            with self._lock:
+                self.metrics_dir.mkdir(parents=True, exist_ok=True)
+                with open(self.metrics_dir / CALLS_FILE, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry) + "\n")
+                self._add_to_totals(entry)
+                atomic_write(self.metrics_dir / PROMETHEUS_FILE, self._prometheus_text().encode("utf-8"))
+        except OSError as e:
+            print(f"⚠️ Could not write telemetry: {str(e)}")
+        return entry
+
+    def _add_to_totals(self, entry: Dict) -> None:
+        template = (entry["template"] or "none").split("@", 1)[0]
+        status = "cached" if entry["response_cache"] else entry["status"]
+        totals = self._totals.setdefault((entry["model"], template, status), {
+            "calls": 0, "input_tokens": 0, "output_tokens": 0, "cache_read_input_tokens": 0,
+            "cache_creation_input_tokens": 0, "cost_usd": 0.0, "latency_sum": 0.0,
+            "buckets": [0] * len(LATENCY_BUCKETS)
+        })
+        totals["calls"] += 1
+        for key in ("input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens"):
+            totals[key] += entry[key]
+        totals["cost_usd"] += entry["cost_usd"] or 0.0
+        totals["latency_sum"] += entry["latency_s"]
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if entry["latency_s"] <= bound:
+                totals["buckets"][index] += 1
+
+    def _prometheus_text(self) -> str:
+        lines = [
+            "# HELP codebrew_llm_calls_total Bedrock calls by model, prompt template and status",
+            "# TYPE codebrew_llm_calls_total counter",
+        ]
+        for (model, template, status), totals in sorted(self._totals.items()):
+            lines.append(f"codebrew_llm_calls_total{{{_labels(model=model, template=template, status=status)}}} "
+                         f"{totals['calls']}")
+        for key, help_text in (("input_tokens", "Uncached input tokens"), ("output_tokens", "Output tokens"),
+                               ("cache_read_input_tokens", "Input tokens read from the prompt cache"),
+                               ("cache_creation_input_tokens", "Input tokens written to the prompt cache"),
+                               ("cost_usd", "Estimated cost in USD")):
+            lines += [f"# HELP codebrew_llm_{key}_total {help_text}", f"# TYPE codebrew_llm_{key}_total counter"]
+            for (model, template, status), totals in sorted(self._totals.items()):
+                lines.append(f"codebrew_llm_{key}_total{{{_labels(model=model, template=template, status=status)}}} "
+                             f"{totals[key]}")
+        lines += ["# HELP codebrew_llm_latency_seconds Wall time of Bedrock calls including retries",
+                  "# TYPE codebrew_llm_latency_seconds histogram"]
+        for (model, template, status), totals in sorted(self._totals.items()):
+            labels = _labels(model=model, template=template, status=status)
+            for bound, count in zip(LATENCY_BUCKETS, totals["buckets"]):
+                lines.append(f'codebrew_llm_latency_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'codebrew_llm_latency_seconds_bucket{{{labels},le="+Inf"}} {totals["calls"]}')
+            lines.append(f"codebrew_llm_latency_seconds_sum{{{labels}}} {totals['latency_sum']:.3f}")
+            lines.append(f"codebrew_llm_latency_seconds_count{{{labels}}} {totals['calls']}")
+        return "\n".join(lines) + "\n"
+
+
+def load_calls(path: Path, since: Optional[datetime] = None) -> List[Dict]:
+    """Call records from a JSONL sink, optionally only those after `since`"""
+    calls = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if since is None or datetime.fromisoformat(entry["timestamp"]) >= since:
+                calls.append(entry)
+    return calls
+
+
+def summarize(calls: List[Dict]) -> List[Dict]:
+    """Latency percentiles, tokens and cost per model and template, over calls that reached the model"""
+    groups: Dict[Tuple[str, str], List[Dict]] = {}
+    for entry in calls:
+        template = (entry.get("template") or "none").split("@", 1)[0]
+        groups.setdefault((entry["model"], template), []).append(entry)
+
+    rows = []
+    for (model, template), entries in sorted(groups.items()):
+        made = [e for e in entries if not e.get("response_cache")]
+        ok = [e for e in made if e.get("status") == "ok"]
+        latencies = [e["latency_s"] for e in ok]
+        tokens = sum(e["input_tokens"] + e["cache_read_input_tokens"] + e["cache_creation_input_tokens"]
+                     + e["output_tokens"] for e in ok)
+        files = sum(e.get("n_files") or 0 for e in ok)
+        rows.append({
+            "model": model,
+            "template": template,
+            "calls": len(made),
+            "errors": len(made) - len(ok),
+            "response_cache_hits": len(entries) - len(made),
+            "p50": percentile(latencies, 50) if latencies else None,
+            "p95": percentile(latencies, 95) if latencies else None,
+            "p99": percentile(latencies, 99) if latencies else None,
+            "tokens": tokens,
+            "tokens_per_file": round(tokens / files) if files else None,
+            "cost_usd": round(sum(e.get("cost_usd") or 0.0 for e in ok), 4)
+        })
+    return rows
+
+
+def print_summary(rows: List[Dict]) -> None:
+    if not rows:
+        print("No calls recorded")
+        return
+    def seconds(value: Optional[float]) -> str:
+        return f"{value:.1f}s" if value is not None else "-"
+    print(f"{'model':<45} {'template':<22} {'calls':>6} {'errors':>6} {'cached':>6} {'p50':>7} {'p95':>7} "
+          f"{'p99':>7} {'tokens':>10} {'tok/file':>9} {'cost $':>9}")
+    for row in rows:
+        print(f"{row['model']:<45} {row['template']:<22} {row['calls']:>6} {row['errors']:>6} "
+              f"{row['response_cache_hits']:>6} {seconds(row['p50']):>7} {seconds(row['p95']):>7} "
+              f"{seconds(row['p99']):>7} {row['tokens']:>10} {row['tokens_per_file'] or '-':>9} "
+              f"{row['cost_usd']:>9.4f}")
+    print(f"\nTotal: {sum(r['calls'] for r in rows)} calls, {sum(r['tokens'] for r in rows)} tokens, "
+          f"${sum(r['cost_usd'] for r in rows):.4f}")
+
+
+_telemetry: Optional[Telemetry] = None
+_telemetry_lock = threading.Lock()
+
+
+def get_telemetry() -> Telemetry:
+    """Return the process-wide telemetry sink"""
+    global _telemetry
+    with _telemetry_lock:
+        if _telemetry is None:
+            _telemetry = Telemetry()
+        return _telemetry
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bedrock call telemetry")
+    commands = parser.add_subparsers(dest="command", required=True)
+    summary = commands.add_parser("summary", help="Latency percentiles, tokens per file and cost per model and template")
+    summary.add_argument("--hours", type=float, help="Only calls from the last N hours")
+    summary.add_argument("--file", help=f"Call log (default: METRICS_DIR/{CALLS_FILE})")
+
+    args = parser.parse_args()
+    path = Path(args.file or Path(os.getenv("METRICS_DIR", "data/metrics")) / CALLS_FILE)
+    if not path.exists():
+        print(f"No telemetry at {path}")
+        return
+    since = datetime.now() - timedelta(hours=args.hours) if args.hours else None
+    print_summary(summarize(load_calls(path, since)))
+
+
+if __name__ == "__main__":
+    main()
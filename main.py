@@ -1,7 +1,10 @@
 import os
 from dotenv import load_dotenv
 from utils.repo_selector import RepoSelector
-from ai.analyzer import analyze_repository_structure, analyze_github_files
+from ai.analyzer import select_files, analyze_github_files
+from utils.blob_cache import get_blob_cache
+from utils.http_client import print_latency_report
+from ai.response_cache import get_response_cache
 
 def main():
     # Load environment variables
@@ -19,8 +22,8 @@ def main():
         print("Failed to get repository information")
         return
         
-    # Get Bedrock's analysis of which files to analyze
-    selected_files = analyze_repository_structure(repo_info)
+    # Pick the files to analyze (ranked locally, or by Bedrock with FILE_SELECTION=llm)
+    selected_files = select_files(repo_info, selector)
     if not selected_files:
         print("Failed to analyze repository structure")
         return
@@ -32,9 +35,13 @@ def main():
     
     # Analyze all selected files at once
     print("\n🔍 Analyzing files...")
-    analyses = analyze_github_files(selected_files)
+    analyses = analyze_github_files(
+        selected_files, source=repo_info.get("source"), repository=repo_info["repository"]
+    )
     
     if analyses:
+        # Only a successful analysis moves the incremental scan forward; failed runs look at the same changes again
+        selector.record_analyzed(repo_info)
         print(f"\n✅ Successfully analyzed {len(analyses)} files")
         if isinstance(analyses, list):
             for analysis in analyses:
@@ -59,6 +66,13 @@ def main():
     else:
         print("\n❌ Analysis failed")
             
+    cache_stats = get_blob_cache().stats()
+    print(f"\n📦 Blob cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+          f"{cache_stats['bytes_saved'] / 1024:.1f} KB of downloads saved")
+    print_latency_report()
+    bedrock_stats = get_response_cache().stats()
+    print(f"💾 Bedrock response cache: {bedrock_stats['hits']} hits, {bedrock_stats['misses']} misses")
+            
     print("\n✨ Analysis complete!")
 
 if __name__ == "__main__":
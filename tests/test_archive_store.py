@@ -0,0 +1,93 @@
+import io
+import gzip
+import tarfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.archive_store import ArchiveStore
+from utils.blob_cache import git_blob_sha
+
+FILES = {
+    "pkg/core.py": b"def add(a, b):\n    return a + b\n",
+    "pkg/legacy.py": "# caf\xe9\nx = 1\n".encode("latin-1"),
+    "tests/test_core.py": b"def test_add():\n    pass\n",
+    "README.md": b"# Demo\n",
+}
+
+
+def build_tarball(files, root="octo-demo-abc1234"):
+    """A gzipped tarball laid out like GitHub's, with everything under one root directory"""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as archive:
+        directory = tarfile.TarInfo(root)
+        directory.type = tarfile.DIRTYPE
+        archive.addfile(directory)
+        for path, data in files.items():
+            info = tarfile.TarInfo(f"{root}/{path}")
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return gzip.compress(buffer.getvalue())
+
+
+class TarballHandler(BaseHTTPRequestHandler):
+    tarball = build_tarball(FILES)
+    requested = []
+
+    def do_GET(self):
+        self.requested.append(self.path)
+        if self.path != "/repos/octo/demo/tarball/master":
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-gzip")
+        self.send_header("Content-Length", str(len(self.tarball)))
+        self.end_headers()
+        self.wfile.write(self.tarball)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ArchiveStoreTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), TarballHandler)
+        cls.api_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def download(self, **kwargs):
+        return ArchiveStore.download("octo", "demo", "master", headers={}, api_url=self.api_url,
+                                     raw_url="https://raw.example", **kwargs)
+
+    def test_keeps_python_files_without_archive_root(self):
+        store = self.download()
+        self.assertEqual(sorted(store.files), ["pkg/core.py", "pkg/legacy.py", "tests/test_core.py"])
+        self.assertIn("/repos/octo/demo/tarball/master", TarballHandler.requested)
+
+    def test_exclude_filters_paths(self):
+        store = self.download(exclude=lambda path: path.startswith("tests/"))
+        self.assertEqual(sorted(store.files), ["pkg/core.py", "pkg/legacy.py"])
+
+    def test_list_files_and_read(self):
+        store = self.download()
+        listed = {entry["name"]: entry for entry in store.list_files()}
+        core = listed["pkg/core.py"]
+        self.assertEqual(core["url"], "https://raw.example/octo/demo/master/pkg/core.py")
+        self.assertEqual(core["size"], len(FILES["pkg/core.py"]))
+        self.assertEqual(core["sha"], git_blob_sha(FILES["pkg/core.py"]))
+        self.assertEqual(store.read("pkg/core.py"), FILES["pkg/core.py"].decode("utf-8"))
+        self.assertIsNone(store.read("missing.py"))
+
+    def test_read_replaces_invalid_utf8(self):
+        store = self.download()
+        self.assertEqual(store.read("pkg/legacy.py"), "# caf�\nx = 1\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
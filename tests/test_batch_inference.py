@@ -0,0 +1,148 @@
+import json
+import os
+import re
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from ai import analyzer, batch_inference
+from ai.bedrock_client import BedrockClient
+from utils import repo_selector
+from utils.scan_state import ScanState
+
+TEST_FILES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_files")
+NESTED_LOOP = "        for i in range(2, num):\n"
+
+with open(os.path.join(TEST_FILES, "5_algorithm.py"), encoding="utf-8") as f:
+    ALGORITHM = f.read()
+
+# Both repositories have a pkg/core.py; beta's is long enough to be split over several records
+FILLER = 600
+REPOSITORIES = {
+    "alpha": ALGORITHM,
+    "beta": "".join(f"filler_{n} = {n}\n" for n in range(FILLER)) + ALGORITHM,
+}
+
+
+def repository(name):
+    return {"owner": "octo", "name": name, "url": f"https://github.com/octo/{name}", "default_branch": "main"}
+
+
+class FakeSelector:
+    def list_repositories(self, repo_file):
+        return [repository(name) for name in REPOSITORIES]
+
+    def analyze_repository(self, n_files, repo=None):
+        return {"repository": repo, "head_sha": f"{repo['name']}-sha", "source": None}
+
+
+def fetch_files(selected_files, headers, source=None, repository=None):
+    return [{"name": "pkg/core.py", "path": "pkg/core.py", "content": REPOSITORIES[repository["name"]]}]
+
+
+class StubClient(BedrockClient):
+    """Answers with the nested loop when the prompt shows it, else the last filler line, with piece-relative lines"""
+
+    def __init__(self, fail_on=None):
+        super().__init__(model_id="stub-model", max_tokens=100)
+        self.fail_on = fail_on
+        self.prompts = []
+
+    def invoke(self, prompt, max_tokens=None, temperature=None, **kwargs):
+        self.prompts.append(prompt)
+        if self.fail_on and self.fail_on in prompt:
+            raise RuntimeError("model unavailable")
+        if NESTED_LOOP in prompt:
+            old_code = NESTED_LOOP
+        else:
+            old_code = re.findall(r"^filler_\d+ = \d+\n", prompt, re.MULTILINE)[-1]
+        return json.dumps({"analyses": [{"file_path": "pkg/core.py", "start_line": 1, "end_line": 1,
+                                         "old_code": old_code, "new_code": old_code, "issue": "Slow"}]})
+
+
+class BatchFlowTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        self.saved = []
+        patches = [
+            mock.patch.dict("os.environ", {"BATCH_DIR": str(self.root / "batch"),
+                                           "SCAN_STATE_FILE": str(self.root / "scan_state.json")}),
+            mock.patch.object(repo_selector, "RepoSelector", FakeSelector),
+            mock.patch.object(analyzer, "select_files", lambda repo_info, selector: [{"name": "pkg/core.py"}]),
+            mock.patch.object(analyzer, "fetch_github_files", fetch_files),
+            mock.patch.object(analyzer, "save_suggestion", lambda file, suggestion: self.saved.append(json.loads(suggestion))),
+            mock.patch.object(analyzer, "analysis_mode", "parallel"),
+            mock.patch.object(analyzer, "analysis_merge", "all"),
+            mock.patch.object(analyzer, "analysis_group_size", 1),
+            mock.patch.object(analyzer, "prompt_token_budget", 2500),
+            mock.patch.object(analyzer, "cross_repo_dedup", False),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def prepare(self, client):
+        job_dir = batch_inference.prepare_job("sweep", n_files=1, client=client)
+        self.assertEqual(job_dir, self.root / "batch" / "sweep")
+        return job_dir
+
+    def test_prepare_run_collect(self):
+        client = StubClient()
+        job_dir = self.prepare(client)
+
+        with open(job_dir / batch_inference.INPUT_FILE, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+        manifest = json.loads((job_dir / batch_inference.MANIFEST_FILE).read_text(encoding="utf-8"))
+        self.assertEqual([r["recordId"] for r in records], sorted(manifest["records"]))
+        for record in records:
+            self.assertEqual(set(record), {"recordId", "modelInput"})
+            self.assertEqual(record["modelInput"]["messages"][0]["role"], "user")
+            self.assertEqual(record["modelInput"]["max_tokens"], 100)
+        by_repo = [manifest["records"][r["recordId"]]["repository"]["name"] for r in records]
+        self.assertEqual(by_repo.count("alpha"), 1)
+        self.assertGreater(by_repo.count("beta"), 1)
+
+        output_file = batch_inference.run_job_locally(job_dir, client=client)
+        self.assertEqual(output_file, job_dir / "input.jsonl.out")
+        self.assertEqual(len(client.prompts), len(records))
+
+        saved = batch_inference.collect_job(job_dir)
+        self.assertEqual(saved, self.saved)
+        self.assertEqual(len(saved), len(records))
+        # Line numbers refer to each repository's own copy of pkg/core.py, not to the prompt piece
+        loop_line = ALGORITHM[:ALGORITHM.index(NESTED_LOOP)].count("\n") + 1
+        loops = sorted(s["start_line"] for s in saved if s["old_code"] == NESTED_LOOP)
+        self.assertEqual(loops, [loop_line, loop_line + FILLER])
+        beta_lines = REPOSITORIES["beta"].splitlines(keepends=True)
+        for suggestion in saved:
+            self.assertEqual(suggestion["file_path"], "pkg/core.py")
+            self.assertEqual(suggestion["end_line"], suggestion["start_line"])
+            if suggestion["old_code"] != NESTED_LOOP:
+                self.assertEqual(beta_lines[suggestion["start_line"] - 1], suggestion["old_code"])
+
+        state = ScanState()
+        self.assertEqual(state.get_last_sha(repository("alpha")), "alpha-sha")
+        self.assertEqual(state.get_last_sha(repository("beta")), "beta-sha")
+
+        # Collecting the same output again saves nothing new
+        self.assertEqual(batch_inference.collect_job(job_dir), [])
+        self.assertEqual(len(self.saved), len(records))
+
+    def test_failed_records_stay_pending(self):
+        client = StubClient(fail_on="filler_0 = 0\n")
+        job_dir = self.prepare(client)
+        batch_inference.run_job_locally(job_dir, client=client)
+        batch_inference.collect_job(job_dir)
+
+        manifest = json.loads((job_dir / batch_inference.MANIFEST_FILE).read_text(encoding="utf-8"))
+        pending = set(manifest["records"]) - set(manifest["collected"])
+        self.assertEqual(len(pending), 1)
+        self.assertEqual(manifest["records"][pending.pop()]["repository"]["name"], "beta")
+        self.assertEqual(len(self.saved), len(manifest["collected"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,188 @@
+import threading
+import unittest
+from unittest import mock
+
+from ai import bedrock_controller
+from ai.bedrock_controller import (AdaptiveLimiter, BedrockController, CircuitBreaker, CircuitOpenError,
+                                   classify_error)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class ServiceError(Exception):
+    """Shaped like botocore's ClientError"""
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+
+class ReadTimeoutError(Exception):
+    pass
+
+
+class ClassifyErrorTest(unittest.TestCase):
+    def test_classification(self):
+        self.assertEqual(classify_error(ServiceError("ThrottlingException")), "throttle")
+        self.assertEqual(classify_error(ServiceError("ServiceUnavailableException")), "transient")
+        self.assertEqual(classify_error(ReadTimeoutError()), "transient")
+        self.assertEqual(classify_error(ServiceError("ValidationException")), "fatal")
+        self.assertEqual(classify_error(ValueError("bad")), "fatal")
+
+
+class AdaptiveLimiterTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patch = mock.patch.object(bedrock_controller.time, "monotonic", self.clock)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def fill(self, limiter):
+        for _ in range(int(limiter.limit)):
+            limiter.acquire()
+
+    def test_grows_about_one_per_round_while_saturated(self):
+        limiter = AdaptiveLimiter(initial=2, minimum=1, maximum=4, latency_target=10)
+        self.fill(limiter)
+        for _ in range(3):
+            limiter.on_success(1.0)
+        self.assertEqual(int(limiter.limit), 3)
+
+    def test_does_not_grow_when_slow_or_unsaturated(self):
+        limiter = AdaptiveLimiter(initial=2, minimum=1, maximum=4, latency_target=10)
+        limiter.acquire()
+        limiter.on_success(1.0)
+        self.assertEqual(limiter.limit, 2)
+        limiter.acquire()
+        limiter.on_success(30.0)
+        self.assertEqual(limiter.limit, 2)
+
+    def test_never_exceeds_maximum(self):
+        limiter = AdaptiveLimiter(initial=3, minimum=1, maximum=3, latency_target=10)
+        self.fill(limiter)
+        for _ in range(10):
+            limiter.on_success(1.0)
+        self.assertEqual(limiter.limit, 3)
+
+    def test_throttle_halves_once_per_interval(self):
+        limiter = AdaptiveLimiter(initial=8, minimum=1, maximum=16, latency_target=10, decrease_interval=2.0)
+        limiter.on_throttle()
+        limiter.on_throttle()
+        self.assertEqual(limiter.limit, 4)
+        self.clock.now += 2.5
+        limiter.on_throttle()
+        self.assertEqual(limiter.limit, 2)
+        for _ in range(5):
+            self.clock.now += 2.5
+            limiter.on_throttle()
+        self.assertEqual(limiter.limit, 1)
+
+    def test_acquire_waits_for_a_free_slot(self):
+        limiter = AdaptiveLimiter(initial=1, minimum=1, maximum=1, latency_target=10)
+        limiter.acquire()
+        acquired = threading.Event()
+        waiter = threading.Thread(target=lambda: (limiter.acquire(), acquired.set()))
+        waiter.start()
+        self.assertFalse(acquired.wait(0.1))
+        limiter.release()
+        self.assertTrue(acquired.wait(5))
+        waiter.join()
+        self.assertEqual(limiter.in_flight, 1)
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patch = mock.patch.object(bedrock_controller.time, "monotonic", self.clock)
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.breaker = CircuitBreaker(window=4, threshold=0.5, cooldown=10, min_calls=4)
+
+    def record_all(self, outcomes):
+        for ok in outcomes:
+            self.breaker.before_call()
+            self.breaker.record(ok)
+
+    def test_stays_closed_below_min_calls_or_threshold(self):
+        self.record_all([False, False, False])
+        self.assertEqual(self.breaker.state, "closed")
+        self.breaker.record(None)
+        self.assertEqual(self.breaker.state, "closed")
+
+    def test_opens_and_fails_fast(self):
+        self.record_all([True, True, False, False])
+        self.assertEqual(self.breaker.state, "open")
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+
+    def test_single_probe_after_cooldown(self):
+        self.record_all([False] * 4)
+        self.clock.now += 10
+        self.breaker.before_call()
+        self.assertEqual(self.breaker.state, "half_open")
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+        self.breaker.record(True)
+        self.assertEqual(self.breaker.state, "closed")
+        self.breaker.before_call()
+
+    def test_failed_probe_doubles_cooldown_up_to_ten_times(self):
+        self.record_all([False] * 4)
+        for expected in (20, 40, 80, 100, 100):
+            self.clock.now += self.breaker.cooldown
+            self.breaker.before_call()
+            self.breaker.record(False)
+            self.assertEqual((self.breaker.state, self.breaker.cooldown), ("open", expected))
+        self.clock.now += 99
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+
+
+class BedrockControllerTest(unittest.TestCase):
+    def setUp(self):
+        patch = mock.patch.object(bedrock_controller.time, "sleep")
+        self.sleep = patch.start()
+        self.addCleanup(patch.stop)
+        with mock.patch.dict("os.environ", {"BEDROCK_MAX_ATTEMPTS": "3", "BEDROCK_INITIAL_CONCURRENCY": "4"}):
+            self.controller = BedrockController("test-model")
+
+    def failing(self, errors, result="ok"):
+        errors = list(errors)
+        def call():
+            if errors:
+                raise errors.pop(0)
+            return result
+        return call
+
+    def test_retries_throttling_and_lowers_concurrency(self):
+        call = self.failing([ServiceError("ThrottlingException")])
+        self.assertEqual(self.controller.call(call), "ok")
+        self.assertEqual(self.controller.limiter.limit, 2)
+        self.assertEqual(self.sleep.call_count, 1)
+        self.assertEqual(self.controller.limiter.in_flight, 0)
+
+    def test_fatal_errors_are_not_retried(self):
+        with self.assertRaises(ServiceError):
+            self.controller.call(self.failing([ServiceError("ValidationException")]))
+        self.sleep.assert_not_called()
+
+    def test_gives_up_after_max_attempts(self):
+        errors = [ServiceError("ServiceUnavailableException")] * 3
+        with self.assertRaises(ServiceError):
+            self.controller.call(self.failing(errors))
+        self.assertEqual(self.sleep.call_count, 2)
+
+    def test_can_retry_stops_retries(self):
+        with self.assertRaises(ServiceError):
+            self.controller.call(self.failing([ServiceError("ServiceUnavailableException")]), can_retry=lambda: False)
+        self.sleep.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import re
+import threading
+import unittest
+from unittest import mock
+
+from ai.bedrock_client import BedrockClient
+from ai.cascade import ModelCascade, describe_piece
+
+
+class TriageClient(BedrockClient):
+    """Scores each chunk from a table keyed by file name; names missing from the table are left unscored"""
+
+    def __init__(self, confidences, extra_chunks=()):
+        super().__init__(model_id="triage-model", max_tokens=100)
+        self.confidences = confidences
+        self.extra_chunks = list(extra_chunks)
+        self.prompts = []
+        self.lock = threading.Lock()
+
+    def generate_text(self, prompt, **kwargs):
+        with self.lock:
+            self.prompts.append(prompt)
+        if "fail.py" in prompt:
+            return None
+        chunks = [{"chunk": index, "confidence": self.confidences[name], "reason": f"looked at {name}"}
+                  for index, name in re.findall(r"### Chunk (\d+)\nFile: (\S+)", prompt) if name in self.confidences]
+        return {"chunks": chunks + self.extra_chunks}
+
+
+class AnalysisClient(BedrockClient):
+    """Returns one suggestion per piece it is sent"""
+
+    def __init__(self):
+        super().__init__(model_id="analysis-model", max_tokens=100)
+        self.groups = []
+        self.lock = threading.Lock()
+
+    def analyze_group(self, group, on_suggestion=None):
+        with self.lock:
+            self.groups.append([piece["name"] for piece in group])
+        return [{"file_path": piece["path"]} for piece in group]
+
+
+def file(name):
+    return {"name": name, "path": f"pkg/{name}", "content": f"# {name}\nvalue = 1\n"}
+
+
+class ModelCascadeTest(unittest.TestCase):
+    def cascade(self, confidences, threshold=0.5, **kwargs):
+        self.analysis = AnalysisClient()
+        self.triage = TriageClient(confidences, **kwargs)
+        return ModelCascade(self.analysis, self.triage, threshold=threshold)
+
+    def route(self, cascade, groups):
+        return [[piece["name"] for piece in group] for group in cascade.route([[file(n) for n in g] for g in groups])]
+
+    def test_escalates_at_or_above_the_threshold(self):
+        cascade = self.cascade({"a.py": 0.49, "b.py": 0.5, "c.py": 0.9})
+        self.assertEqual(self.route(cascade, [["a.py", "b.py", "c.py"]]), [["b.py", "c.py"]])
+
+    def test_threshold_changes_routing(self):
+        confidences = {"a.py": 0.3, "b.py": 0.6}
+        self.assertEqual(self.route(self.cascade(confidences, threshold=0.2), [["a.py", "b.py"]]), [["a.py", "b.py"]])
+        self.assertEqual(self.route(self.cascade(confidences, threshold=0.7), [["a.py", "b.py"]]), [])
+
+    def test_threshold_from_environment(self):
+        with mock.patch.dict("os.environ", {"CASCADE_THRESHOLD": "0.8"}):
+            cascade = ModelCascade(AnalysisClient(), TriageClient({}))
+        self.assertEqual(cascade.threshold, 0.8)
+
+    def test_groups_keep_their_pieces_and_empty_groups_are_dropped(self):
+        cascade = self.cascade({"a.py": 0.9, "b.py": 0.1, "c.py": 0.2, "d.py": 0.1, "e.py": 0.7})
+        self.assertEqual(self.route(cascade, [["a.py", "b.py"], ["c.py", "d.py"], ["e.py"]]), [["a.py"], ["e.py"]])
+        self.assertEqual(len(self.triage.prompts), 3)
+
+    def test_unscored_chunks_are_escalated(self):
+        # The model skipped b.py, answered for a chunk that doesn't exist and sent an unreadable score
+        extra = [{"chunk": 9, "confidence": 1.0}, {"chunk": "x", "confidence": 1.0}, {"chunk": 1}]
+        cascade = self.cascade({"a.py": 0.1}, extra_chunks=extra)
+        self.assertEqual(self.route(cascade, [["a.py", "b.py"]]), [["b.py"]])
+
+    def test_failed_triage_call_escalates_the_whole_group(self):
+        cascade = self.cascade({"a.py": 0.1, "b.py": 0.1})
+        self.assertEqual(self.route(cascade, [["a.py"], ["fail.py", "b.py"]]), [["fail.py", "b.py"]])
+
+    def test_analyze_sends_only_escalated_pieces(self):
+        cascade = self.cascade({"a.py": 0.9, "b.py": 0.1, "c.py": 0.6})
+        suggestions = cascade.analyze([file("a.py"), file("b.py"), file("c.py")], group_size=2)
+        self.assertEqual(self.analysis.groups, [["a.py"], ["c.py"]])
+        self.assertEqual([s["file_path"] for s in suggestions], ["pkg/a.py", "pkg/c.py"])
+
+    def test_analyze_without_escalations_makes_no_analysis_calls(self):
+        cascade = self.cascade({"a.py": 0.1})
+        self.assertEqual(cascade.analyze([file("a.py")]), [])
+        self.assertEqual(self.analysis.groups, [])
+
+    def test_describe_piece(self):
+        self.assertEqual(describe_piece({"path": "m.py", "start_line": 1, "end_line": 9, "total_lines": 9}), "m.py")
+        self.assertEqual(describe_piece({"path": "m.py", "start_line": 5, "end_line": 9, "total_lines": 20}),
+                         "m.py:5-9")
+
+
+if __name__ == "__main__":
+    unittest.main()
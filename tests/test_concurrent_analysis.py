@@ -0,0 +1,93 @@
+import threading
+import unittest
+
+from ai.analyzer import rank_suggestions
+from ai.bedrock_client import BedrockClient
+
+
+class StubClient(BedrockClient):
+    """Answers each group with one suggestion for its first file, without calling Bedrock"""
+
+    def __init__(self, barrier=None, fail_paths=()):
+        super().__init__(model_id="stub-model", max_tokens=100)
+        self.barrier = barrier
+        self.fail_paths = set(fail_paths)
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def analyze_multiple_files(self, files, on_suggestion=None):
+        with self.lock:
+            self.calls.append([file["path"] for file in files])
+        if self.barrier:
+            # Every group must be in flight at once for the barrier to open
+            self.barrier.wait()
+        if files[0]["path"] in self.fail_paths:
+            return None
+        first = files[0]
+        suggestion = {"file_path": first["path"], "issue": f"issue in {first['path']}",
+                      "old_code": first["content"].splitlines(keepends=True)[-1], "start_line": 1, "end_line": 1}
+        if on_suggestion:
+            on_suggestion(suggestion)
+        return suggestion
+
+
+def make_files(count, lines=1):
+    return [{"name": f"f{i}.py", "path": f"pkg/f{i}.py",
+             "content": "".join(f"value_{i}_{n} = {n}\n" for n in range(lines))} for i in range(count)]
+
+
+class AnalyzeFilesConcurrentlyTest(unittest.TestCase):
+    def test_one_call_per_group_in_group_order(self):
+        client = StubClient()
+        suggestions = client.analyze_files_concurrently(make_files(5), group_size=2, max_workers=3)
+        self.assertEqual(sorted(client.calls), [["pkg/f0.py", "pkg/f1.py"], ["pkg/f2.py", "pkg/f3.py"], ["pkg/f4.py"]])
+        self.assertEqual([s["file_path"] for s in suggestions], ["pkg/f0.py", "pkg/f2.py", "pkg/f4.py"])
+
+    def test_groups_run_concurrently(self):
+        client = StubClient(barrier=threading.Barrier(3, timeout=5))
+        suggestions = client.analyze_files_concurrently(make_files(3), group_size=1, max_workers=3)
+        self.assertEqual(len(suggestions), 3)
+
+    def test_failed_group_only_loses_its_own_suggestion(self):
+        client = StubClient(fail_paths={"pkg/f1.py"})
+        suggestions = client.analyze_files_concurrently(make_files(3), group_size=1, max_workers=2)
+        self.assertEqual([s["file_path"] for s in suggestions], ["pkg/f0.py", "pkg/f2.py"])
+
+    def test_streamed_suggestions_are_the_returned_ones(self):
+        client = StubClient()
+        streamed = []
+        suggestions = client.analyze_files_concurrently(make_files(2), group_size=1, max_workers=2,
+                                                        on_suggestion=streamed.append)
+        self.assertEqual(sorted(id(s) for s in streamed), sorted(id(s) for s in suggestions))
+
+    def test_split_file_lines_are_mapped_back(self):
+        client = StubClient()
+        big = make_files(1, lines=1000)
+        suggestions = client.analyze_files_concurrently(big, group_size=1, max_workers=4, token_budget=2500)
+        self.assertGreater(len(client.calls), 1)
+        lines = big[0]["content"].splitlines(keepends=True)
+        for suggestion in suggestions:
+            self.assertEqual(lines[suggestion["start_line"] - 1], suggestion["old_code"])
+        self.assertEqual(suggestions[-1]["start_line"], 1000)
+
+
+class RankSuggestionsTest(unittest.TestCase):
+    def test_impact_then_claimed_improvement_then_smaller_change(self):
+        suggestions = [
+            {"id": "low", "benefit": {"impact": "Low", "explanation": "90% faster"}, "old_code": "x"},
+            {"id": "high-10", "benefit": {"impact": "High", "explanation": "About 10% less memory"}, "old_code": "x"},
+            {"id": "high-50-long", "benefit": {"impact": "High", "explanation": "50% faster"}, "old_code": "x" * 40},
+            {"id": "high-50-short", "benefit": {"impact": "High", "explanation": "50% faster"}, "old_code": "x"},
+            {"id": "medium", "benefit": {"impact": "Medium", "explanation": "Clearer"}, "old_code": "x"},
+            {"id": "plain", "benefit": "medium impact, 20% faster", "old_code": "x"},
+            {"id": "none", "old_code": "x"},
+        ]
+        ranked = [s["id"] for s in rank_suggestions(suggestions)]
+        self.assertEqual(ranked, ["high-50-short", "high-50-long", "high-10", "plain", "medium", "low", "none"])
+
+    def test_empty(self):
+        self.assertEqual(rank_suggestions([]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+
+from utils.fingerprint import FingerprintIndex, fingerprint_source
+
+DEDUPE = '''def dedupe(items):
+    """Drop repeated items, keeping order"""
+    seen = []
+    for item in items:
+        if item not in seen:
+            seen.append(item)
+    return seen
+'''
+
+SUGGESTION = {
+    "file_path": "lib/helpers.py",
+    "start_line": 3,
+    "end_line": 6,
+    "old_code": "    seen = []\n    for item in items:\n        if item not in seen:\n            seen.append(item)\n",
+    "new_code": "    seen = list(dict.fromkeys(items))\n",
+    "issue": "Quadratic membership test on a list",
+}
+
+ORIGIN = {"owner": "octo", "name": "first"}
+OTHER = {"owner": "octo", "name": "second"}
+
+
+class FingerprintSourceTest(unittest.TestCase):
+    def test_ignores_comments_and_formatting(self):
+        reformatted = "# helpers\n\n\n" + DEDUPE.replace("seen = []", "seen = [ ]  # keep order")
+        self.assertEqual(fingerprint_source(DEDUPE)["file"], fingerprint_source(reformatted)["file"])
+
+    def test_function_hashes_and_lines(self):
+        source = "import os\n\nclass Cache:\n    @staticmethod\n    def get(key):\n        return key\n"
+        functions = fingerprint_source(source)["functions"]
+        self.assertEqual([(f["name"], f["start"], f["end"]) for f in functions], [("Cache.get", 4, 6)])
+
+    def test_unparseable_source(self):
+        self.assertIsNone(fingerprint_source("def broken(:\n"))
+
+
+class FingerprintIndexTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.index_file = os.path.join(directory.name, "fingerprints.json")
+        self.index = FingerprintIndex(self.index_file, min_function_lines=3)
+        self.assertEqual(self.index.record([dict(SUGGESTION)], [{"path": "lib/helpers.py", "content": DEDUPE}],
+                                           ORIGIN), 1)
+
+    def test_record_skips_known_suggestions(self):
+        self.assertEqual(self.index.record([dict(SUGGESTION)], [{"path": "lib/helpers.py", "content": DEDUPE}],
+                                           ORIGIN), 0)
+
+    def test_whole_file_copy_is_reused_and_not_analyzed(self):
+        copy = {"path": "vendor/helpers.py", "content": "# vendored\n" + DEDUPE}
+        reused, remaining = self.index.reuse([copy], OTHER)
+        self.assertEqual(remaining, [])
+        self.assertEqual(len(reused), 1)
+        suggestion = reused[0]
+        self.assertEqual((suggestion["file_path"], suggestion["start_line"], suggestion["end_line"]),
+                         ("vendor/helpers.py", 4, 7))
+        self.assertEqual(suggestion["repo_name"], "second")
+        self.assertEqual(suggestion["reused_from"],
+                         {"repository": "octo/first", "path": "lib/helpers.py", "match": "file"})
+
+    def test_function_match_is_reused_but_file_still_analyzed(self):
+        content = "import os\n\n\n" + DEDUPE + "\n\ndef novel(path):\n    return os.path.basename(path)\n"
+        mixed = {"path": "app/util.py", "content": content}
+        reused, remaining = self.index.reuse([mixed], OTHER)
+        self.assertEqual(remaining, [mixed])
+        self.assertEqual(len(reused), 1)
+        self.assertEqual(reused[0]["reused_from"]["match"], "function")
+        self.assertEqual((reused[0]["start_line"], reused[0]["end_line"]), (6, 9))
+
+    def test_changed_function_is_not_matched(self):
+        changed = {"path": "app/util.py", "content": DEDUPE.replace("seen.append(item)", "seen.insert(0, item)")}
+        reused, remaining = self.index.reuse([changed], OTHER)
+        self.assertEqual((reused, remaining), ([], [changed]))
+
+    def test_same_file_at_same_place_is_not_reused(self):
+        original = {"path": "lib/helpers.py", "content": DEDUPE}
+        reused, remaining = self.index.reuse([original], ORIGIN)
+        self.assertEqual((reused, remaining), ([], [original]))
+
+    def test_small_functions_are_not_matched(self):
+        index = FingerprintIndex(self.index_file, min_function_lines=20)
+        content = "x = 1\n\n" + DEDUPE
+        reused, remaining = index.reuse([{"path": "app/util.py", "content": content}], OTHER)
+        self.assertEqual(reused, [])
+        self.assertEqual(len(remaining), 1)
+
+    def test_index_is_shared_through_the_file(self):
+        other_process = FingerprintIndex(self.index_file)
+        reused, _ = other_process.reuse([{"path": "copy.py", "content": DEDUPE}], OTHER)
+        self.assertEqual(len(reused), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import json
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from utils import graphql_fetch
+from utils.blob_cache import BlobCache, git_blob_sha
+
+BLOBS = {
+    "a.py": {"text": "a = 1\n"},
+    "b.py": {"text": "b = 2\n"},
+    "c.py": {"text": "c = 3\n"},
+    "big.py": {"text": None, "isTruncated": True},
+    "image.py": {"text": None, "isBinary": True},
+}
+
+
+class GraphQLHandler(BaseHTTPRequestHandler):
+    queries = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.queries.append(body)
+        variables = body["variables"]
+        if variables["owner"] == "broken":
+            self.send_error(502)
+            return
+        repository = {}
+        for key, expression in variables.items():
+            if not key.startswith("e"):
+                continue
+            ref, path = expression.split(":", 1)
+            blob = BLOBS.get(path) if ref == "master" else None
+            if blob is not None:
+                text = blob["text"]
+                repository["f" + key[1:]] = {
+                    "oid": git_blob_sha(text.encode("utf-8")) if text is not None else "0" * 40,
+                    "text": text,
+                    "isBinary": blob.get("isBinary", False),
+                    "isTruncated": blob.get("isTruncated", False),
+                }
+            else:
+                repository["f" + key[1:]] = None
+        payload = json.dumps({"data": {"repository": repository}}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FetchBlobsGraphQLTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), GraphQLHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}/graphql"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        GraphQLHandler.queries.clear()
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.cache = BlobCache(self.cache_dir.name)
+        patches = [
+            mock.patch.dict("os.environ", {"GITHUB_GRAPHQL_URL": self.url}),
+            mock.patch.object(graphql_fetch, "get_blob_cache", return_value=self.cache),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.addCleanup(self.cache_dir.cleanup)
+
+    def test_batches_paths_into_chunks(self):
+        paths = ["a.py", "b.py", "c.py"]
+        contents = graphql_fetch.fetch_blobs_graphql("octo", "demo", "master", paths, {}, chunk_size=2)
+        self.assertEqual(contents, {"a.py": "a = 1\n", "b.py": "b = 2\n", "c.py": "c = 3\n"})
+        self.assertEqual(len(GraphQLHandler.queries), 2)
+        first = GraphQLHandler.queries[0]
+        self.assertEqual(first["variables"], {"owner": "octo", "name": "demo", "e0": "master:a.py", "e1": "master:b.py"})
+        self.assertIn("f1: object(expression: $e1)", first["query"])
+        self.assertEqual(GraphQLHandler.queries[1]["variables"]["e0"], "master:c.py")
+
+    def test_fills_blob_cache(self):
+        graphql_fetch.fetch_blobs_graphql("octo", "demo", "master", ["a.py"], {})
+        self.assertIn(git_blob_sha(b"a = 1\n"), self.cache)
+
+    def test_leaves_out_missing_binary_and_truncated_files(self):
+        paths = ["a.py", "gone.py", "big.py", "image.py"]
+        contents = graphql_fetch.fetch_blobs_graphql("octo", "demo", "master", paths, {})
+        self.assertEqual(contents, {"a.py": "a = 1\n"})
+        self.assertEqual(len(GraphQLHandler.queries), 1)
+
+    def test_uses_the_given_ref(self):
+        contents = graphql_fetch.fetch_blobs_graphql("octo", "demo", "main", ["a.py"], {})
+        self.assertEqual(contents, {})
+        self.assertEqual(GraphQLHandler.queries[0]["variables"]["e0"], "main:a.py")
+
+    def test_failed_query_returns_nothing_for_its_chunk(self):
+        contents = graphql_fetch.fetch_blobs_graphql("broken", "demo", "master", ["a.py"], {})
+        self.assertEqual(contents, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import glob
+import os
+import unittest
+from unittest import mock
+
+from utils.file_ranker import rank_files
+from utils.hotspots import filter_hotspots, hotspot_threshold, scan_source
+
+TEST_FILES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_files")
+
+# Everyday code a reviewer wouldn't bother a maintainer about
+ORDINARY = {
+    "config.py": '''import json
+import os
+
+
+def load_config(path):
+    """Read settings from a JSON file, falling back to defaults"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"debug": os.getenv("DEBUG") == "1"}
+''',
+    "models.py": '''from dataclasses import dataclass, field
+from typing import List
+
+
+@dataclass
+class Order:
+    id: int
+    items: List[str] = field(default_factory=list)
+
+    def total(self, prices):
+        return sum(prices.get(item, 0) for item in self.items)
+''',
+    "report.py": '''def summarize(rows):
+    """Totals per region"""
+    totals = {}
+    for row in rows:
+        totals[row["region"]] = totals.get(row["region"], 0) + row["amount"]
+    return totals
+
+
+def write_report(path, lines):
+    with open(path, "w") as f:
+        for line in lines:
+            f.write(line + "\\n")
+''',
+    "cli.py": '''import argparse
+import sys
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("name")
+    args = parser.parse_args(argv)
+    try:
+        print(f"Hello {args.name}")
+    except:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
+''',
+    "cache.py": '''class Cache:
+    def __init__(self):
+        self._items = {}
+
+    def get(self, key, default=None):
+        try:
+            return self._items[key]
+        except Exception:
+            pass
+        return default
+''',
+}
+
+
+class HotspotCorpusTest(unittest.TestCase):
+    def test_sample_corpus_passes_the_default_threshold(self):
+        paths = sorted(glob.glob(os.path.join(TEST_FILES, "*.py")))
+        self.assertTrue(paths)
+        for path in paths:
+            with open(path, encoding="utf-8") as f:
+                report = scan_source(f.read())
+            with self.subTest(file=os.path.basename(path)):
+                self.assertGreaterEqual(report["score"], hotspot_threshold(), report["findings"])
+
+    def test_ordinary_code_stays_below_the_default_threshold(self):
+        for name, content in ORDINARY.items():
+            report = scan_source(content)
+            with self.subTest(file=name):
+                self.assertLess(report["score"], hotspot_threshold(), report["findings"])
+
+    def test_single_weak_hints_do_not_pass(self):
+        snippets = [
+            "def f(x):\n    try:\n        return 1 / x\n    except:\n        raise\n",
+            "def f(rows):\n    for r in rows:\n        print(r[0], r[0])\n",
+            "def f(paths):\n    for p in paths:\n        with open(p) as f:\n            print(f.read())\n",
+        ]
+        for snippet in snippets:
+            with self.subTest(snippet=snippet):
+                self.assertLess(scan_source(snippet)["score"], hotspot_threshold())
+
+    def test_repeated_weak_hints_count_once(self):
+        source = "".join(f"def f{i}(rows):\n    for r in rows:\n        print(r[0], r[0])\n\n" for i in range(5))
+        report = scan_source(source)
+        self.assertEqual(len(report["findings"]), 5)
+        self.assertEqual(report["score"], 1)
+
+    def test_filter_hotspots(self):
+        files = [{"name": name, "content": content} for name, content in ORDINARY.items()]
+        with open(os.path.join(TEST_FILES, "5_algorithm.py"), encoding="utf-8") as f:
+            files.append({"name": "5_algorithm.py", "content": f.read()})
+        files.append({"name": "broken.py", "content": "def broken(:\n"})
+        kept = filter_hotspots(files, threshold=3)
+        self.assertEqual([file["name"] for file in kept], ["5_algorithm.py", "broken.py"])
+        self.assertEqual(kept[0]["hotspot_score"], 3)
+
+
+class RankWithHotspotsTest(unittest.TestCase):
+    def test_hotspot_files_are_kept_even_when_they_rank_lower(self):
+        contents = {f"pkg/{name}": content for name, content in ORDINARY.items()}
+        with open(os.path.join(TEST_FILES, "1_list_operations.py"), encoding="utf-8") as f:
+            contents["pkg/small.py"] = f.read()
+        # The ordinary files are bigger and churn more, so they would win without the filter
+        structure = [{"name": name, "url": f"https://raw.example/{name}", "size": 100 if name == "pkg/small.py" else 50000}
+                     for name in contents]
+        churn = {name: 500 for name in contents if name != "pkg/small.py"}
+        read_files = lambda entries: {e["name"]: contents[e["name"]] for e in entries}
+
+        unfiltered = rank_files(structure, 2, read_files, churn=churn)
+        self.assertNotIn("pkg/small.py", [file["name"] for file in unfiltered])
+        selected = rank_files(structure, 2, read_files, churn=churn, min_hotspot_score=3)
+        self.assertEqual([file["name"] for file in selected], ["pkg/small.py"])
+        self.assertIn("hotspot score", selected[0]["reason"])
+
+    def test_threshold_comes_from_the_environment(self):
+        with mock.patch.dict("os.environ", {"HOTSPOT_THRESHOLD": "5"}):
+            self.assertEqual(hotspot_threshold(), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
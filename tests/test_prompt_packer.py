@@ -0,0 +1,124 @@
+import unittest
+
+from ai.prompt_packer import HEADER_TOKENS, pack_files, remap_lines, split_file
+from utils.ast_utils import matches_path
+from utils.text_utils import estimate_tokens
+
+
+def make_file(path, content):
+    return {"name": path.rsplit("/", 1)[-1], "path": path, "content": content}
+
+
+def function_source(name, body_lines=6):
+    body = "".join(f"    value_{i} = {i} * 2\n" for i in range(body_lines))
+    return f"def {name}():\n{body}    return value_0\n"
+
+
+MODULE = "import os\n\n\n" + "\n\n".join(function_source(f"func_{i}") for i in range(6))
+
+
+class SplitFileTest(unittest.TestCase):
+    def test_small_file_is_one_piece(self):
+        pieces = split_file(make_file("a.py", "x = 1\ny = 2\n"), max_tokens=100)
+        self.assertEqual(len(pieces), 1)
+        piece = pieces[0]
+        self.assertEqual((piece["start_line"], piece["end_line"], piece["total_lines"]), (1, 2, 2))
+        self.assertEqual(piece["content"], "x = 1\ny = 2\n")
+        self.assertEqual(piece["original_content"], "x = 1\ny = 2\n")
+
+    def test_pieces_cover_the_file_at_function_boundaries(self):
+        budget = estimate_tokens(function_source("f")) + 10
+        pieces = split_file(make_file("pkg/mod.py", MODULE), max_tokens=budget)
+        lines = MODULE.splitlines(keepends=True)
+        self.assertGreater(len(pieces), 1)
+        self.assertEqual(pieces[0]["start_line"], 1)
+        self.assertEqual(pieces[-1]["end_line"], len(lines))
+        for previous, piece in zip(pieces, pieces[1:]):
+            self.assertEqual(piece["start_line"], previous["end_line"] + 1)
+        for piece in pieces:
+            self.assertLessEqual(estimate_tokens(piece["content"]), budget)
+            self.assertEqual(piece["content"], "".join(lines[piece["start_line"] - 1:piece["end_line"]]))
+            if piece["start_line"] > 1:
+                self.assertTrue(piece["content"].lstrip("\n").startswith("def "))
+
+    def test_unparseable_file_is_split_by_lines(self):
+        content = "".join(f"line {i} (\n" for i in range(40))
+        pieces = split_file(make_file("bad.py", content), max_tokens=20)
+        self.assertGreater(len(pieces), 1)
+        self.assertEqual("".join(piece["content"] for piece in pieces), content)
+
+
+class PackFilesTest(unittest.TestCase):
+    def test_small_files_share_one_prompt_in_original_order(self):
+        files = [make_file(f"f{i}.py", f"x{i} = {i}\n") for i in range(3)]
+        groups = pack_files(files, budget_tokens=1000)
+        self.assertEqual([[piece["path"] for piece in group] for group in groups], [["f0.py", "f1.py", "f2.py"]])
+
+    def test_max_files_per_prompt(self):
+        files = [make_file(f"f{i}.py", f"x{i} = {i}\n") for i in range(5)]
+        groups = pack_files(files, budget_tokens=1000, max_files_per_prompt=2)
+        self.assertEqual([len(group) for group in groups], [2, 2, 1])
+        self.assertEqual([piece["path"] for group in groups for piece in group], [f"f{i}.py" for i in range(5)])
+
+    def test_groups_stay_within_budget(self):
+        files = [make_file("big.py", MODULE)] + [make_file(f"s{i}.py", function_source(f"s{i}")) for i in range(4)]
+        budget = 2 * (estimate_tokens(function_source("f")) + HEADER_TOKENS) + 20
+        groups = pack_files(files, budget_tokens=budget)
+        for group in groups:
+            self.assertLessEqual(sum(estimate_tokens(p["content"]) + HEADER_TOKENS for p in group), budget)
+        big = [piece for group in groups for piece in group if piece["path"] == "big.py"]
+        self.assertEqual("".join(piece["content"] for piece in sorted(big, key=lambda p: p["start_line"])), MODULE)
+
+
+class RemapLinesTest(unittest.TestCase):
+    def setUp(self):
+        budget = estimate_tokens(function_source("f")) + 10
+        self.pieces = split_file(make_file("pkg/mod.py", MODULE), max_tokens=budget)
+        self.lines = MODULE.splitlines(keepends=True)
+
+    def line_of(self, text):
+        return next(i for i, line in enumerate(self.lines, 1) if text in line)
+
+    def test_old_code_position_is_authoritative(self):
+        target = self.line_of("def func_4")
+        suggestion = {"file_path": "pkg/mod.py", "old_code": "def func_4():\n    value_0 = 0 * 2\n",
+                      "start_line": 1, "end_line": 2}
+        remapped = remap_lines(suggestion, self.pieces)
+        self.assertEqual((remapped["start_line"], remapped["end_line"]), (target, target + 1))
+
+    def test_piece_relative_lines_are_shifted(self):
+        piece = self.pieces[-1]
+        self.assertGreater(piece["start_line"], 1)
+        relative = piece["end_line"] - piece["start_line"] + 1
+        outside = relative + len(self.lines)
+        suggestion = {"file_path": "mod.py", "old_code": "not in the file", "start_line": outside, "end_line": outside}
+        remapped = remap_lines(suggestion, [piece])
+        self.assertEqual(remapped["start_line"], outside + piece["start_line"] - 1)
+
+    def test_lines_inside_a_piece_are_kept(self):
+        piece = self.pieces[-1]
+        suggestion = {"file_path": "pkg/mod.py", "old_code": "not in the file",
+                      "start_line": piece["start_line"], "end_line": piece["end_line"]}
+        remapped = remap_lines(dict(suggestion), [piece])
+        self.assertEqual((remapped["start_line"], remapped["end_line"]), (piece["start_line"], piece["end_line"]))
+
+    def test_unknown_file_is_untouched(self):
+        suggestion = {"file_path": "other.py", "old_code": "def func_4", "start_line": 3, "end_line": 3}
+        self.assertEqual(remap_lines(dict(suggestion), self.pieces), suggestion)
+
+
+class MatchesPathTest(unittest.TestCase):
+    def test_matches_full_and_shortened_paths(self):
+        self.assertTrue(matches_path("pkg/mod.py", "pkg/mod.py"))
+        self.assertTrue(matches_path("pkg/mod.py", "mod.py"))
+        self.assertTrue(matches_path("pkg/mod.py", "repo/pkg/mod.py"))
+        self.assertFalse(matches_path("pkg/mod.py", "pkg/other.py"))
+        self.assertFalse(matches_path("pkg/mod.py", "od.py"))
+        self.assertFalse(matches_path("bar.py", "xbar.py"))
+        self.assertFalse(matches_path("foo/bar.py", "foo/xbar.py"))
+        self.assertFalse(matches_path("foo/bar.py", "afoo/bar.py"))
+        self.assertFalse(matches_path("pkg/mod.py", ""))
+
+
+if __name__ == "__main__":
+    unittest.main()
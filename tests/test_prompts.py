@@ -0,0 +1,88 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from ai.prompts import EXPECTED_FIELDS, PromptRegistry, PromptTemplate, PromptTemplateError
+
+
+class PromptTemplateTest(unittest.TestCase):
+    def test_render_fields_specs_and_attributes(self):
+        template = PromptTemplate("t", "Repo {repo[name]} has {count:>{width}} files: {{literal}} {count!r}")
+        self.assertEqual(template.fields, {"repo", "count", "width"})
+        self.assertEqual(template.render(repo={"name": "x"}, count=7, width=3), "Repo x has   7 files: {literal} 7")
+
+    def test_missing_values(self):
+        with self.assertRaises(PromptTemplateError):
+            PromptTemplate("t", "{a} {b}").render(a=1)
+
+    def test_invalid_placeholders(self):
+        for text in ("{unclosed", "positional {}", "stray }"):
+            with self.subTest(text=text), self.assertRaises(PromptTemplateError):
+                PromptTemplate("t", text)
+
+    def test_validate_against_expected_fields(self):
+        template = PromptTemplate("code_analysis", "Review:\n{files_section}\n{extra}")
+        with self.assertRaisesRegex(PromptTemplateError, r"unknown \['extra'\], missing none"):
+            template.validate({"files_section"})
+        with self.assertRaisesRegex(PromptTemplateError, r"unknown none, missing \['code'\]"):
+            PromptTemplate("t", "no fields").validate({"code"})
+        template.validate(None)
+
+    def test_prefix_and_version(self):
+        template = PromptTemplate("code_analysis", "Fixed instructions\n{files_section}\nmore")
+        self.assertEqual(template.prefix, "Fixed instructions\n")
+        self.assertEqual(template.id, f"code_analysis@{template.version}")
+        self.assertNotEqual(template.version, PromptTemplate("code_analysis", "Other\n{files_section}").version)
+
+
+class PromptRegistryTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dir = Path(directory.name)
+        self.path = self.dir / "code_review.txt"
+        self.write("Review this:\n{code}\n")
+        self.registry = PromptRegistry(str(self.dir))
+
+    def write(self, text, mtime=None):
+        self.path.write_text(text, encoding="utf-8")
+        if mtime is not None:
+            os.utime(self.path, (mtime, mtime))
+
+    def test_shipped_prompts_match_their_placeholders(self):
+        registry = PromptRegistry()
+        self.assertEqual(set(registry.versions()), set(EXPECTED_FIELDS))
+
+    def test_unchanged_file_is_not_reparsed(self):
+        self.assertIs(self.registry.get("code_review"), self.registry.get("code_review"))
+
+    def test_reloads_when_the_file_changes(self):
+        before = self.registry.get("code_review")
+        self.write("Review this carefully:\n{code}\n", mtime=before.mtime + 10)
+        after = self.registry.get("code_review")
+        self.assertNotEqual(before.version, after.version)
+        self.assertEqual(self.registry.render("code_review", code="x = 1"), "Review this carefully:\nx = 1\n")
+        self.assertEqual(self.registry.versions(), {"code_review": after.version})
+
+    def test_invalid_edit_keeps_previous_version(self):
+        before = self.registry.get("code_review")
+        self.write("Review this:\n{source}\n", mtime=before.mtime + 10)
+        self.assertIs(self.registry.get("code_review"), before)
+        self.assertEqual(self.registry.render("code_review", code="y"), "Review this:\ny\n")
+
+    def test_deleted_file_keeps_previous_version(self):
+        before = self.registry.get("code_review")
+        self.path.unlink()
+        self.assertIs(self.registry.get("code_review"), before)
+
+    def test_unknown_or_invalid_prompt_raises(self):
+        with self.assertRaises(PromptTemplateError):
+            self.registry.get("missing")
+        (self.dir / "triage.txt").write_text("Triage {code}", encoding="utf-8")
+        with self.assertRaises(PromptTemplateError):
+            self.registry.get("triage")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import re
+import unittest
+
+from utils.structure_encoder import encode_structure, format_size, resolve_paths
+from utils.text_utils import estimate_tokens
+
+
+def entry(name, size=1000, **extra):
+    return dict({"name": name, "size": size, "url": f"https://raw.example/{name}", "sha": f"sha-{name}"}, **extra)
+
+
+def listed_paths(text):
+    """Full paths of the files shown in an encoded tree"""
+    paths, stack = [], []
+    for line in text.splitlines():
+        depth = (len(line) - len(line.lstrip(" "))) // 2
+        name = line.strip()
+        del stack[depth:]
+        if name.startswith("..."):
+            continue
+        if name.endswith("/"):
+            stack.append(name)
+        else:
+            paths.append("".join(stack) + name.split(" ")[0])
+    return paths
+
+
+STRUCTURE = [
+    entry("setup.py", 800),
+    entry("src/pkg/__init__.py", 10),
+    entry("src/pkg/core.py", 25000, hotspot_score=4),
+    entry("src/pkg/util.py", 1500),
+    entry("tests/test_core.py", 9000),
+] + [entry(f"src/pkg/plugins/plugin_{i:02d}.py", 3000 + i) for i in range(40)]
+
+
+class EncodeStructureTest(unittest.TestCase):
+    def test_format_size(self):
+        self.assertEqual([format_size(s) for s in (812, 1500, 12400, 1400000)], ["812", "1.5k", "12k", "1.4M"])
+
+    def test_tree_without_budget(self):
+        text, stats = encode_structure(STRUCTURE[:5], budget_tokens=0)
+        self.assertEqual(text.splitlines(), [
+            "src/pkg/",
+            "  __init__.py 10",
+            "  core.py 25k hot:4",
+            "  util.py 1.5k",
+            "tests/",
+            "  test_core.py 9.0k",
+            "setup.py 800",
+        ])
+        self.assertEqual((stats["files"], stats["shown"]), (5, 5))
+        self.assertLess(stats["tokens"], stats["json_tokens"])
+
+    def test_every_path_round_trips(self):
+        text, _ = encode_structure(STRUCTURE, budget_tokens=0)
+        paths = listed_paths(text)
+        self.assertEqual(sorted(paths), sorted(e["name"] for e in STRUCTURE))
+        resolved = resolve_paths([{"name": path, "reason": "r"} for path in paths], STRUCTURE)
+        self.assertEqual([(f["name"], f["url"], f["sha"], f["reason"]) for f in resolved],
+                         [(p, f"https://raw.example/{p}", f"sha-{p}", "r") for p in paths])
+
+    def test_budget_truncation(self):
+        full, _ = encode_structure(STRUCTURE, budget_tokens=0)
+        budget = estimate_tokens(full) // 3
+        text, stats = encode_structure(STRUCTURE, budget_tokens=budget)
+        self.assertLessEqual(estimate_tokens(text), budget)
+        self.assertLess(stats["shown"], stats["files"])
+        paths = listed_paths(text)
+        self.assertEqual(len(paths), stats["shown"])
+        omitted = sum(int(n) for n in re.findall(r"\.\.\. (\d+) more files?", text))
+        self.assertEqual(len(paths) + omitted, len(STRUCTURE))
+        # Hotspots survive; tests and tiny package markers are dropped first
+        self.assertIn("src/pkg/core.py", paths)
+        self.assertNotIn("tests/test_core.py", paths)
+        self.assertNotIn("src/pkg/__init__.py", paths)
+        self.assertIn("tests/", text.splitlines())
+        self.assertEqual(len(resolve_paths([{"name": p} for p in paths], STRUCTURE)), len(paths))
+
+    def test_budget_too_small_for_any_file(self):
+        text, stats = encode_structure(STRUCTURE, budget_tokens=1)
+        self.assertEqual(stats["shown"], 0)
+        self.assertEqual(listed_paths(text), [])
+
+
+class ResolvePathsTest(unittest.TestCase):
+    def test_shortened_and_prefixed_paths(self):
+        selected = [{"name": "./setup.py"}, {"name": "/src/pkg/util.py"}, {"name": "pkg/core.py"},
+                    {"name": "plugin_03.py"}]
+        resolved = resolve_paths(selected, STRUCTURE)
+        self.assertEqual([f["name"] for f in resolved],
+                         ["setup.py", "src/pkg/util.py", "src/pkg/core.py", "src/pkg/plugins/plugin_03.py"])
+
+    def test_unknown_and_ambiguous_paths_are_dropped(self):
+        structure = [entry("a/util.py"), entry("b/util.py")]
+        self.assertEqual(resolve_paths([{"name": "util.py"}, {"name": "c/util.py"}, {"name": "til.py"}], structure), [])
+
+    def test_sha_is_optional(self):
+        structure = [{"name": "mod.py", "url": "https://raw.example/mod.py"}]
+        self.assertNotIn("sha", resolve_paths([{"name": "mod.py"}], structure)[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
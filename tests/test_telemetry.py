@@ -0,0 +1,141 @@
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from ai.telemetry import (CALLS_FILE, PROMETHEUS_FILE, Telemetry, estimate_cost, load_calls, parse_prices,
+                          percentile, summarize)
+
+SONNET = "anthropic.claude-3-sonnet-20240229-v1:0"
+HAIKU = "anthropic.claude-3-haiku-20240307-v1:0"
+
+
+def prometheus_samples(text):
+    """Metric line -> value, without the HELP/TYPE comments"""
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+class PercentileTest(unittest.TestCase):
+    def test_nearest_rank(self):
+        values = list(range(100, 0, -1))
+        self.assertEqual([percentile(values, p) for p in (50, 95, 99, 100)], [50, 95, 99, 100])
+        self.assertEqual(percentile([3.0, 1.0, 2.0, 4.0], 50), 2.0)
+        self.assertEqual(percentile([0.4, 9.0, 1.2, 0.8, 1.0, 0.9, 1.1, 0.7, 0.6, 0.5], 95), 9.0)
+        self.assertEqual(percentile([7.5], 99), 7.5)
+
+
+class CostTest(unittest.TestCase):
+    def test_prices_by_model(self):
+        usage = {"input_tokens": 1000, "output_tokens": 1000}
+        self.assertEqual(estimate_cost(SONNET, usage), 0.018)
+        self.assertEqual(estimate_cost(HAIKU, usage), 0.0015)
+        self.assertEqual(estimate_cost("anthropic.claude-3-5-haiku-20241022-v1:0", usage), 0.0048)
+        self.assertIsNone(estimate_cost("meta.llama3", usage))
+
+    def test_prompt_cache_tokens(self):
+        usage = {"input_tokens": 0, "cache_creation_input_tokens": 1000, "cache_read_input_tokens": 1000}
+        self.assertEqual(estimate_cost(SONNET, usage), round(0.003 * 1.25 + 0.003 * 0.1, 6))
+
+    def test_price_overrides(self):
+        prices = parse_prices("claude-3-sonnet=0.001/0.002; broken")
+        self.assertEqual(prices[0], ("claude-3-sonnet", 0.001, 0.002))
+        self.assertEqual(estimate_cost(SONNET, {"input_tokens": 1000, "output_tokens": 1000}, prices), 0.003)
+
+
+class TelemetryTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dir = Path(directory.name)
+        self.telemetry = Telemetry(str(self.dir), enabled=True)
+        self.telemetry.prices = parse_prices("")
+
+    def test_calls_are_appended_to_the_sink(self):
+        self.telemetry.record(SONNET, "code_analysis@abc", {"input_tokens": 1000, "output_tokens": 500}, 3.2,
+                              n_files=2)
+        self.telemetry.record(SONNET, "code_analysis@abc", {"input_tokens": 1000}, 0.0, response_cache=True)
+        calls = load_calls(self.dir / CALLS_FILE)
+        self.assertEqual([(c["cost_usd"], c["n_files"], c["response_cache"]) for c in calls],
+                         [(0.0105, 2, False), (0.0, None, True)])
+
+    def test_disabled(self):
+        telemetry = Telemetry(str(self.dir / "off"), enabled=False)
+        self.assertIsNone(telemetry.record(SONNET, None, {}, 1.0))
+        self.assertFalse((self.dir / "off").exists())
+
+    def test_prometheus_textfile(self):
+        for latency in (0.5, 3.0, 45.0):
+            self.telemetry.record(SONNET, "code_analysis@v1", {"input_tokens": 1000, "output_tokens": 1000}, latency)
+        self.telemetry.record(SONNET, "code_analysis@v2", {}, 1.5, status="ThrottlingException")
+        self.telemetry.record(HAIKU, None, {"input_tokens": 10}, 0.0, response_cache=True)
+        self.telemetry.record('model"with\\quotes', "triage@v1", {"output_tokens": 5}, 700.0)
+
+        samples = prometheus_samples((self.dir / PROMETHEUS_FILE).read_text(encoding="utf-8"))
+        ok = f'model="{SONNET}",template="code_analysis",status="ok"'
+        self.assertEqual(samples[f"codebrew_llm_calls_total{{{ok}}}"], 3)
+        self.assertEqual(
+            samples[f'codebrew_llm_calls_total{{model="{SONNET}",template="code_analysis",status="ThrottlingException"}}'],
+            1)
+        self.assertEqual(samples[f'codebrew_llm_calls_total{{model="{HAIKU}",template="none",status="cached"}}'], 1)
+        self.assertEqual(samples[f"codebrew_llm_input_tokens_total{{{ok}}}"], 3000)
+        self.assertAlmostEqual(samples[f"codebrew_llm_cost_usd_total{{{ok}}}"], 0.054)
+        # Buckets are cumulative and end with +Inf
+        buckets = {le: samples[f'codebrew_llm_latency_seconds_bucket{{{ok},le="{le}"}}']
+                   for le in ("1", "2.5", "5", "30", "60", "300", "+Inf")}
+        self.assertEqual(buckets, {"1": 1, "2.5": 1, "5": 2, "30": 2, "60": 3, "300": 3, "+Inf": 3})
+        self.assertAlmostEqual(samples[f"codebrew_llm_latency_seconds_sum{{{ok}}}"], 48.5)
+        self.assertEqual(samples[f"codebrew_llm_latency_seconds_count{{{ok}}}"], 3)
+        escaped = 'model="model\\"with\\\\quotes",template="triage",status="ok"'
+        self.assertEqual(samples[f'codebrew_llm_latency_seconds_bucket{{{escaped},le="300"}}'], 0)
+        self.assertEqual(samples[f'codebrew_llm_latency_seconds_bucket{{{escaped},le="+Inf"}}'], 1)
+
+
+class SummaryTest(unittest.TestCase):
+    def call(self, latency, template="code_analysis@v1", model=SONNET, status="ok", cached=False, cost=0.01,
+             n_files=2, timestamp=None):
+        return {"timestamp": (timestamp or datetime.now()).isoformat(timespec="milliseconds"), "model": model,
+                "template": template, "status": status, "response_cache": cached, "latency_s": latency,
+                "input_tokens": 100, "output_tokens": 50, "cache_read_input_tokens": 30,
+                "cache_creation_input_tokens": 20, "cost_usd": 0.0 if cached else cost, "n_files": n_files}
+
+    def test_percentiles_tokens_and_cost_per_model_and_template(self):
+        calls = [self.call(latency) for latency in range(1, 21)]
+        calls.append(self.call(1.0, template="code_analysis@v2", status="ThrottlingException", cost=None))
+        calls.append(self.call(0.0, cached=True))
+        calls.append(self.call(2.0, template="triage@v1", model=HAIKU, cost=0.001, n_files=4))
+
+        triage, analysis = summarize(calls)
+        self.assertEqual((analysis["model"], analysis["template"]), (SONNET, "code_analysis"))
+        self.assertEqual((analysis["calls"], analysis["errors"], analysis["response_cache_hits"]), (21, 1, 1))
+        self.assertEqual((analysis["p50"], analysis["p95"], analysis["p99"]), (10, 19, 20))
+        self.assertEqual(analysis["tokens"], 20 * 200)
+        self.assertEqual(analysis["tokens_per_file"], 100)
+        self.assertEqual(analysis["cost_usd"], 0.2)
+        self.assertEqual((triage["model"], triage["template"], triage["p50"], triage["tokens_per_file"]),
+                         (HAIKU, "triage", 2.0, 50))
+
+    def test_group_without_successful_calls(self):
+        row = summarize([self.call(1.0, status="ReadTimeoutError")])[0]
+        self.assertEqual((row["p50"], row["tokens_per_file"], row["cost_usd"]), (None, None, 0.0))
+
+    def test_load_calls_since(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, CALLS_FILE)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(json.dumps(self.call(1.0, timestamp=datetime.now() - timedelta(hours=3))) + "\n")
+                f.write("not json\n")
+                f.write(json.dumps(self.call(2.0)) + "\n")
+            self.assertEqual(len(load_calls(Path(path))), 2)
+            recent = load_calls(Path(path), since=datetime.now() - timedelta(hours=1))
+            self.assertEqual([c["latency_s"] for c in recent], [2.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import json
+import unittest
+
+from utils.text_utils import IncrementalJSONParser
+
+RESPONSE = (
+    "Here are the suggestions:\n```json\n"
+    + json.dumps({"analyses": [
+        {"issue": "Braces {in} strings", "old_code": "print(f\"{x}\")\n", "start_line": 3},
+        {"issue": "Nested", "benefit": {"impact": "High", "details": {"note": "}"}}}
+    ]}, indent=2)
+    + "\n```\nLet me know if you need more."
+)
+
+
+def feed_in_chunks(parser, text, size):
+    found = []
+    for start in range(0, len(text), size):
+        found.extend(parser.feed(text[start:start + size]))
+    return found
+
+
+class IncrementalJSONParserTest(unittest.TestCase):
+    def test_objects_with_required_key(self):
+        found = IncrementalJSONParser(required_key="issue").feed(RESPONSE)
+        self.assertEqual([obj["issue"] for obj in found], ["Braces {in} strings", "Nested"])
+        self.assertEqual(found[1]["benefit"]["details"], {"note": "}"})
+
+    def test_same_result_for_any_chunking(self):
+        expected = IncrementalJSONParser(required_key="issue").feed(RESPONSE)
+        for size in (1, 2, 7, 64):
+            with self.subTest(size=size):
+                self.assertEqual(feed_in_chunks(IncrementalJSONParser(required_key="issue"), RESPONSE, size), expected)
+
+    def test_objects_are_returned_as_soon_as_they_close(self):
+        parser = IncrementalJSONParser(required_key="issue")
+        first_end = RESPONSE.index("}", RESPONSE.index('"start_line"')) + 1
+        self.assertEqual([obj["issue"] for obj in parser.feed(RESPONSE[:first_end])], ["Braces {in} strings"])
+        self.assertEqual([obj["issue"] for obj in parser.feed(RESPONSE[first_end:])], ["Nested"])
+
+    def test_without_required_key_every_object_is_returned(self):
+        found = IncrementalJSONParser().feed('{"a": {"b": 1}}')
+        self.assertEqual(found, [{"b": 1}, {"a": {"b": 1}}])
+
+    def test_quoted_brace_in_prose(self):
+        text = 'He said "hi {" then {"issue": "x"}'
+        self.assertEqual(IncrementalJSONParser(required_key="issue").feed(text), [{"issue": "x"}])
+        self.assertEqual(feed_in_chunks(IncrementalJSONParser(required_key="issue"), text, 1), [{"issue": "x"}])
+
+    def test_braces_in_prose_that_are_not_json(self):
+        text = 'Use a set {a, b} here. { not json {"issue": 1} either } and {"issue": 2}'
+        found = IncrementalJSONParser(required_key="issue").feed(text)
+        self.assertEqual(found, [{"issue": 1}, {"issue": 2}])
+
+    def test_incomplete_object_is_not_returned(self):
+        parser = IncrementalJSONParser(required_key="issue")
+        self.assertEqual(parser.feed('{"issue": "cut off'), [])
+        self.assertEqual(parser.feed('"}'), [{"issue": "cut off"}])
+
+
+if __name__ == "__main__":
+    unittest.main()
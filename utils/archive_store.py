@@ -0,0 +1,103 @@
+import tarfile
+import zipfile
+import tempfile
+from typing import Callable, Dict, List, Optional
+from urllib.parse import quote
+from utils.blob_cache import git_blob_sha
+from utils.github_scheduler import github_request, PRIORITY_BULK
+
+
+class ArchiveStore:
+    """In-memory store of a repository's Python files, loaded from one archive download"""
+
+    def __init__(self, owner: str, repo: str, ref: str, files: Dict[str, bytes], raw_url: str):
+        self.owner = owner
+        self.repo = repo
+        self.ref = ref
+        self.files = files
+        self.raw_url = raw_url.rstrip("/")
+
+    @staticmethod
+    def _strip_root(name: str) -> Optional[str]:
+        """Drop the leading '<owner>-<repo>-<sha>/' directory GitHub adds to archives"""
+        parts = name.split("/", 1)
+        return parts[1] if len(parts) == 2 and parts[1] else None
+
+    @classmethod
+    def download(cls, owner: str, repo: str, ref: str, headers: Dict[str, str], api_url: str,
+                 raw_url: str, exclude: Optional[Callable[[str], bool]] = None,
+                 archive_format: str = "tarball", timeout: Optional[float] = None) -> "ArchiveStore":
+        """
+        Download a repository archive and keep only its Python files
+
+        Args:
+            owner (str): Repository owner
+            repo (str): Repository name
+            ref (str): Branch, tag or commit to download
+            headers (Dict[str, str]): Request headers (auth)
+            api_url (str): GitHub API base URL
+            raw_url (str): Base URL used to build download URLs in the structure
+            exclude (Callable[[str], bool], optional): Returns True for paths to skip
+            archive_format (str): "tarball" (streamed) or "zipball"
+            timeout (float, optional): Connect/read timeout in seconds
+
+        Returns:
+            ArchiveStore: Store holding the Python files of the archive
+        """
+        url = f"{api_url.rstrip('/')}/repos/{owner}/{repo}/{archive_format}/{quote(ref)}"
+        files: Dict[str, bytes] = {}
+
+        def keep(name: str) -> Optional[str]:
+            path = cls._strip_root(name)
+            if not path or not path.endswith(".py"):
+                return None
+            if exclude and exclude(path):
+                return None
+            return path
+
+        with github_request("GET", url, priority=PRIORITY_BULK, headers=headers, stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            if archive_format == "tarball":
+                # Stream-decompress the tarball without holding the whole archive in memory
+                response.raw.decode_content = True
+                with tarfile.open(fileobj=response.raw, mode="r|gz") as archive:
+                    for member in archive:
+                        path = keep(member.name) if member.isfile() else None
+                        if path:
+                            files[path] = archive.extractfile(member).read()
+            else:
+                # Zip archives need random access, so spool them to disk first
+                with tempfile.TemporaryFile() as spool:
+                    for chunk in response.iter_content(chunk_size=1024 * 1024):
+                        spool.write(chunk)
+                    spool.seek(0)
+                    with zipfile.ZipFile(spool) as archive:
+                        for info in archive.infolist():
+                            path = None if info.is_dir() else keep(info.filename)
+                            if path:
+                                files[path] = archive.read(info)
+
+        print(f"📦 Loaded {len(files)} Python files from {owner}/{repo}@{ref} archive")
+        return cls(owner, repo, ref, files, raw_url)
+
+    def list_files(self) -> List[Dict]:
+        """Return the stored files in the repository structure format"""
+        return [
+            {
+                "name": path,
+                "url": f"{self.raw_url}/{self.owner}/{self.repo}/{quote(self.ref)}/{quote(path)}",
+                "size": len(data),
+                "sha": git_blob_sha(data),
+                "type": "file",
+                "language": "Python"
+            }
+            for path, data in sorted(self.files.items())
+        ]
+
+    def read(self, path: str) -> Optional[str]:
+        """Return the contents of a stored file, or None if it is not in the archive
+
+        Bytes that aren't valid UTF-8 (e.g. latin-1 sources) are replaced rather than failing the run.
+        """
+        data = self.files.get(path)
+        return data.decode("utf-8", errors="replace") if data is not None else None
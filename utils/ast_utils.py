@@ -0,0 +1,12 @@
+import ast
+
+
+def node_start(node: ast.AST) -> int:
+    """First line of a statement, including its decorators"""
+    decorators = getattr(node, "decorator_list", None) or []
+    return min([node.lineno] + [d.lineno for d in decorators])
+
+
+def matches_path(path: str, target: str) -> bool:
+    """Whether a path given by the model (possibly shortened) refers to the file at path"""
+    return bool(target) and (path == target or path.endswith("/" + target) or target.endswith("/" + path))
@@ -0,0 +1,239 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+from utils.github_scheduler import github_request, PRIORITY_BULK
+
+
+def git_blob_sha(data: bytes) -> str:
+    """Compute the git blob SHA of raw file contents"""
+    header = f"blob {len(data)}\0".encode()
+    return hashlib.sha1(header + data).hexdigest()
+
+
+def atomic_write(path: Path, data: bytes) -> None:
+    """Write a file via a temporary file and rename so readers never see partial data"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class DiskLRUCache:
+    """On-disk key/value cache with a size cap and least-recently-used eviction"""
+
+    def __init__(self, cache_dir: Path, max_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+        self._index: Optional["OrderedDict[str, int]"] = None
+        self._total_bytes = 0
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / key
+
+    def _load_index(self) -> None:
+        """Build the LRU index from the files on disk, oldest access first"""
+        entries = []
+        if self.cache_dir.exists():
+            for sub_dir in self.cache_dir.iterdir():
+                if not sub_dir.is_dir():
+                    continue
+                for entry in os.scandir(sub_dir):
+                    if entry.is_file() and not entry.name.startswith(".tmp-"):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, entry.name, stat.st_size))
+        entries.sort()
+        self._index = OrderedDict((key, size) for _, key, size in entries)
+        self._total_bytes = sum(self._index.values())
+
+    def _ensure_index(self) -> "OrderedDict[str, int]":
+        if self._index is None:
+            self._load_index()
+        return self._index
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._ensure_index()
+
+    def get(self, key: str, is_valid: Optional[Callable[[bytes], bool]] = None) -> Optional[bytes]:
+        """Return the cached value for a key, or None on a miss
+
+        Entries rejected by is_valid (e.g. expired ones) are removed and count as misses.
+        """
+        with self._lock:
+            index = self._ensure_index()
+            if key not in index:
+                self.misses += 1
+                return None
+            path = self._path(key)
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                # Touch the file so LRU order survives restarts
+                os.utime(path)
+            except OSError:
+                self._total_bytes -= index.pop(key)
+                self.misses += 1
+                return None
+            if is_valid and not is_valid(data):
+                self._total_bytes -= index.pop(key)
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                self.misses += 1
+                return None
+            index.move_to_end(key)
+            self.hits += 1
+            self.bytes_saved += len(data)
+            return data
+
+    def count_miss(self) -> None:
+        """Record a lookup that could not be attempted, e.g. an unknown key"""
+        with self._lock:
+            self.misses += 1
+
+    def put(self, key: str, data: bytes) -> None:
+        """Store a value and evict least recently used entries above the size cap"""
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            index = self._ensure_index()
+            try:
+                atomic_write(self._path(key), data)
+            except OSError as e:
+                print(f"Warning: could not write cache entry {key}: {str(e)}")
+                return
+            self._total_bytes += len(data) - index.pop(key, 0)
+            index[key] = len(data)
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._total_bytes > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters and current size of the cache"""
+        with self._lock:
+            index = self._ensure_index()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bytes_saved": self.bytes_saved,
+                "entries": len(index),
+                "bytes": self._total_bytes
+            }
+
+
+class BlobCache(DiskLRUCache):
+    """Cache of file contents keyed by git blob SHA"""
+
+    def __init__(self, cache_dir: Optional[Path] = None, max_bytes: Optional[int] = None):
+        base_dir = Path(cache_dir or os.path.join(os.getenv("CODEBREW_CACHE_DIR", "data/cache"), "blobs"))
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv("BLOB_CACHE_MAX_MB", "256")) * 1024 * 1024)
+        super().__init__(base_dir / "objects", max_bytes)
+        self._validators_file = base_dir / "validators.json"
+        self._validators: Optional[Dict[str, Dict[str, str]]] = None
+        self._validators_lock = threading.Lock()
+
+    def get_validator(self, url: str) -> Optional[Tuple[str, str]]:
+        """Return the (etag, sha) last seen for a URL"""
+        with self._validators_lock:
+            if self._validators is None:
+                try:
+                    with open(self._validators_file, encoding="utf-8") as f:
+                        self._validators = json.load(f)
+                except (OSError, ValueError):
+                    self._validators = {}
+            entry = self._validators.get(url)
+        return (entry["etag"], entry["sha"]) if entry else None
+
+    def set_validator(self, url: str, etag: Optional[str], sha: str) -> None:
+        """Remember the ETag and blob SHA of a URL for conditional requests"""
+        if not etag:
+            return
+        self.get_validator(url)
+        with self._validators_lock:
+            self._validators[url] = {"etag": etag, "sha": sha}
+            try:
+                atomic_write(self._validators_file, json.dumps(self._validators).encode("utf-8"))
+            except OSError as e:
+                print(f"Warning: could not save cache validators: {str(e)}")
+
+
+_blob_cache: Optional[BlobCache] = None
+_blob_cache_lock = threading.Lock()
+
+
+def get_blob_cache() -> BlobCache:
+    """Return the process-wide blob cache"""
+    global _blob_cache
+    with _blob_cache_lock:
+        if _blob_cache is None:
+            _blob_cache = BlobCache()
+        return _blob_cache
+
+
+def fetch_file_content(url: str, headers: Dict[str, str], sha: Optional[str] = None,
+                       timeout: Optional[float] = None, priority: int = PRIORITY_BULK) -> str:
+    """
+    Fetch a raw file, serving it from the blob cache when possible
+
+    Args:
+        url (str): Raw download URL of the file
+        headers (Dict[str, str]): Request headers (auth, accept)
+        sha (str, optional): Git blob SHA from a tree or contents listing
+        timeout (float, optional): Per-request timeout in seconds
+        priority (int): Scheduling priority of the download
+
+    Returns:
+        str: Decoded file contents, with bytes that aren't valid UTF-8 replaced
+    """
+    cache = get_blob_cache()
+    if sha:
+        cached = cache.get(sha)
+        if cached is not None:
+            return cached.decode("utf-8", errors="replace")
+
+    # Without a known SHA, revalidate the last copy we saw of this URL
+    request_headers = dict(headers)
+    validator = None if sha else cache.get_validator(url)
+    if validator:
+        request_headers["If-None-Match"] = validator[0]
+
+    response = github_request("GET", url, priority=priority, headers=request_headers, timeout=timeout)
+    if response.status_code == 304 and validator:
+        cached = cache.get(validator[1])
+        if cached is not None:
+            return cached.decode("utf-8", errors="replace")
+        # The blob was evicted, fetch it again unconditionally
+        response = github_request("GET", url, priority=priority, headers=headers, timeout=timeout)
+    elif not sha:
+        cache.count_miss()
+    response.raise_for_status()
+
+    data = response.content
+    blob_sha = sha or git_blob_sha(data)
+    cache.put(blob_sha, data)
+    cache.set_validator(url, response.headers.get("ETag"), blob_sha)
+    return data.decode("utf-8", errors="replace")
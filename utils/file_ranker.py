@@ -0,0 +1,193 @@
+import os
+import ast
+import math
+from typing import Callable, Dict, List, Optional, Set
+from utils.hotspots import scan_source
+
+DEFAULT_WEIGHTS = {"complexity": 0.35, "fan_in": 0.25, "churn": 0.25, "size": 0.15}
+
+# Files that are never worth a suggestion, on top of the excluded test directories
+SKIPPED_NAMES = {"setup.py", "conftest.py", "__main__.py"}
+
+
+def parse_weights(spec: Optional[str] = None) -> Dict[str, float]:
+    """Signal weights from FILE_RANK_WEIGHTS, e.g. "complexity=0.4,fan_in=0.3,churn=0.2,size=0.1\""""
+    weights = dict(DEFAULT_WEIGHTS)
+    spec = spec if spec is not None else os.getenv("FILE_RANK_WEIGHTS", "")
+    for item in spec.split(","):
+        if "=" in item:
+            name, value = item.split("=", 1)
+            if name.strip() in weights:
+                weights[name.strip()] = float(value)
+    return weights
+
+
+def is_test_file(path: str) -> bool:
+    """Test modules and packaging files the model would also be told to ignore"""
+    name = path.rsplit("/", 1)[-1]
+    return name.startswith("test_") or name.endswith("_test.py") or name in SKIPPED_NAMES
+
+
+def cyclomatic_complexity(tree: ast.AST) -> int:
+    """Decision points in a module, counted the way McCabe does for each function"""
+    complexity = 0
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.If, ast.For, ast.AsyncFor, ast.While, ast.IfExp, ast.ExceptHandler,
+                             ast.Assert)):
+            complexity += 1
+        elif isinstance(node, ast.BoolOp):
+            complexity += len(node.values) - 1
+        elif isinstance(node, ast.comprehension):
+            complexity += 1 + len(node.ifs)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            complexity += 1
+    return complexity
+
+
+def module_name(path: str) -> str:
+    """Dotted module name of a file path, e.g. "pkg/sub/__init__.py" -> "pkg.sub\""""
+    parts = path[:-3].split("/") if path.endswith(".py") else path.split("/")
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    return ".".join(parts)
+
+
+def imported_modules(path: str, tree: ast.AST) -> Set[str]:
+    """Absolute dotted names a module imports, including `from pkg import mod` candidates"""
+    package = module_name(path).split(".")
+    if not path.endswith("__init__.py"):
+        package = package[:-1]
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                base = package[:len(package) - node.level + 1] if node.level <= len(package) + 1 else []
+                prefix = ".".join(base + ([node.module] if node.module else []))
+            else:
+                prefix = node.module or ""
+            if prefix:
+                names.add(prefix)
+            names.update(f"{prefix}.{alias.name}" if prefix else alias.name for alias in node.names)
+    return names
+
+
+def build_fan_in(trees: Dict[str, ast.AST]) -> Dict[str, int]:
+    """Number of files in the repository importing each file"""
+    # Index modules by their full dotted name and by shorter suffixes (src/ layouts, nested roots)
+    index: Dict[str, Set[str]] = {}
+    for path in trees:
+        parts = module_name(path).split(".")
+        for start in range(len(parts)):
+            if len(parts) - start >= 2 or start == 0:
+                index.setdefault(".".join(parts[start:]), set()).add(path)
+
+    fan_in = {path: 0 for path in trees}
+    for path, tree in trees.items():
+        targets = set()
+        for name in imported_modules(path, tree):
+            matches = index.get(name, set())
+            # Ambiguous suffixes don't count
+            if len(matches) == 1:
+                targets |= matches
+        for target in targets - {path}:
+            fan_in[target] += 1
+    return fan_in
+
+
+def _normalize(values: Dict[str, float], log: bool = False) -> Dict[str, float]:
+    scaled = {k: math.log1p(v) if log else float(v) for k, v in values.items()}
+    top = max(scaled.values(), default=0.0)
+    return {k: (v / top if top else 0.0) for k, v in scaled.items()}
+
+
+def rank_files(structure: List[Dict], n_files: int,
+               read_files: Callable[[List[Dict]], Dict[str, str]],
+               churn: Optional[Dict[str, int]] = None,
+               weights: Optional[Dict[str, float]] = None,
+               max_read: Optional[int] = None,
+               min_hotspot_score: int = 0) -> List[Dict]:
+    """
+    Pick the files most worth analyzing without asking the model
+
+    Files are scored on cyclomatic complexity, fan-in from the import graph,
+    recent churn (lines changed) and size. Contents are only read for up to
+    `max_read` candidates, shortlisted by size and churn, unless it is None.
+    Candidates below `min_hotspot_score` are dropped before the top files are
+    taken, so the selection only holds files the hotspot filter will keep.
+
+    Args:
+        structure (List[Dict]): Repository structure entries (name, url, size, sha)
+        n_files (int): Number of files to select
+        read_files (Callable): Returns file contents by name for a list of structure entries
+        churn (Dict[str, int], optional): Lines changed per path
+        weights (Dict[str, float], optional): Signal weights, defaults to FILE_RANK_WEIGHTS
+        max_read (int, optional): Cap on files whose contents are read
+        min_hotspot_score (int): Minimum static hotspot score, 0 to rank every file
+
+    Returns:
+        List[Dict]: Selected files as {"name", "url", "sha", "reason"}, best first
+    """
+    weights = weights or parse_weights()
+    churn = churn or {}
+    candidates = [entry for entry in structure if not is_test_file(entry["name"])]
+    if not candidates:
+        return []
+
+    if max_read is not None and len(candidates) > max_read:
+        size_score = _normalize({e["name"]: e.get("size") or 0 for e in candidates}, log=True)
+        churn_score = _normalize({e["name"]: churn.get(e["name"], 0) for e in candidates}, log=True)
+        candidates = sorted(
+            candidates,
+            key=lambda e: weights["size"] * size_score[e["name"]] + weights["churn"] * churn_score[e["name"]],
+            reverse=True
+        )[:max_read]
+
+    contents = read_files(candidates)
+    trees = {}
+    for entry in candidates:
+        try:
+            trees[entry["name"]] = ast.parse(contents.get(entry["name"]) or "")
+        except (SyntaxError, ValueError):
+            continue
+
+    hotspot_scores = {}
+    if min_hotspot_score > 0:
+        for name in list(trees):
+            report = scan_source(contents.get(name) or "")
+            hotspot_scores[name] = report["score"] if report else 0
+            if hotspot_scores[name] < min_hotspot_score:
+                del trees[name]
+        print(f"🔥 Hotspot filter kept {len(trees)}/{len(hotspot_scores)} ranking candidates "
+              f"(threshold {min_hotspot_score})")
+
+    signals = {
+        "complexity": {name: cyclomatic_complexity(tree) for name, tree in trees.items()},
+        "fan_in": build_fan_in(trees),
+        "churn": {name: churn.get(name, 0) for name in trees},
+        "size": {e["name"]: e.get("size") or len(contents.get(e["name"]) or "") for e in candidates
+                 if e["name"] in trees}
+    }
+    scores = {
+        "complexity": _normalize(signals["complexity"]),
+        "fan_in": _normalize(signals["fan_in"]),
+        "churn": _normalize(signals["churn"], log=True),
+        "size": _normalize(signals["size"], log=True)
+    }
+    total = {name: sum(weights[s] * scores[s][name] for s in scores) for name in trees}
+
+    selected = []
+    entries = {entry["name"]: entry for entry in candidates}
+    for name in sorted(total, key=total.get, reverse=True)[:n_files]:
+        entry = entries[name]
+        reason = (f"Complexity {signals['complexity'][name]}, imported by {signals['fan_in'][name]} files, "
+                  f"{signals['churn'][name]} lines changed recently, {signals['size'][name] / 1024:.1f} KB "
+                  f"(score {total[name]:.2f})")
+        if name in hotspot_scores:
+            reason += f", hotspot score {hotspot_scores[name]}"
+        file = {"name": name, "url": entry["url"], "reason": reason}
+        if entry.get("sha"):
+            file["sha"] = entry["sha"]
+        selected.append(file)
+    return selected
@@ -0,0 +1,260 @@
+import os
+import ast
+import json
+import hashlib
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from utils.ast_utils import matches_path, node_start
+from utils.blob_cache import atomic_write
+
+
+def _hash(node: ast.AST) -> str:
+    # ast.dump leaves out line/column attributes, and comments and formatting never reach the AST
+    return hashlib.sha256(ast.dump(node).encode("utf-8")).hexdigest()[:32]
+
+
+def fingerprint_source(content: str) -> Optional[Dict]:
+    """
+    Normalized AST hashes of a file and of each function and method in it
+
+    Args:
+        content (str): Python source
+
+    Returns:
+        Optional[Dict]: {"file": hash, "functions": [{"name", "hash", "start", "end"}]},
+            or None if the source doesn't parse
+    """
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError):
+        return None
+
+    functions = []
+    def visit(node: ast.AST, prefix: str) -> None:
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                name = f"{prefix}{child.name}"
+                if not isinstance(child, ast.ClassDef):
+                    functions.append({"name": name, "hash": _hash(child), "start": node_start(child),
+                                      "end": child.end_lineno})
+                visit(child, name + ".")
+    visit(tree, "")
+    return {"file": _hash(tree), "functions": functions}
+
+
+def _locate(content: str, old_code: str, first_line: int = 1, last_line: Optional[int] = None) -> Optional[Tuple[int, int]]:
+    """Lines of the first verbatim occurrence of old_code within first_line..last_line"""
+    lines = content.splitlines(keepends=True)
+    last_line = last_line or len(lines)
+    region = "".join(lines[first_line - 1:last_line])
+    snippet = old_code if old_code in region else old_code.strip()
+    if not snippet.strip() or snippet not in region:
+        return None
+    start = first_line + region[:region.find(snippet)].count("\n")
+    return start, start + snippet.rstrip("\n").count("\n")
+
+
+class FingerprintIndex:
+    """
+    Suggestions indexed by the normalized AST hashes of the code they were made for
+
+    When the same file, or the same function, shows up again in another
+    repository or path, the earlier suggestion is re-anchored to the new
+    location instead of asking the model again. A suggestion is only reused if
+    its old_code occurs verbatim in the new copy, so the patch still applies.
+
+    The index is read once and re-read only when another process has rewritten
+    it; updates are serialized by a lock, so parallel workers can share one index.
+    """
+
+    def __init__(self, index_file: Optional[str] = None, min_function_lines: Optional[int] = None):
+        self.index_file = Path(index_file or os.getenv("FINGERPRINT_INDEX_FILE", "data/fingerprints.json"))
+        # Tiny functions (getters, one-line wrappers) match by coincidence and carry little context
+        self.min_function_lines = (min_function_lines if min_function_lines is not None
+                                   else int(os.getenv("FINGERPRINT_MIN_LINES", "3")))
+        self._lock = threading.Lock()
+        self._entries: List[Dict] = []
+        self._lookup: Optional[Dict] = None
+        self._stamp: Optional[Tuple[int, int]] = None
+
+    def _file_stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = self.index_file.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self) -> List[Dict]:
+        """Entries of the index, read from disk only if the file changed since the last read"""
+        stamp = self._file_stamp()
+        if stamp != self._stamp:
+            try:
+                with open(self.index_file, encoding="utf-8") as f:
+                    self._entries = json.load(f).get("entries", [])
+            except (OSError, ValueError):
+                self._entries = []
+            self._lookup = None
+            self._stamp = stamp
+        return self._entries
+
+    def _get_lookup(self) -> Dict[str, Dict]:
+        with self._lock:
+            self._load()
+            if self._lookup is None:
+                self._lookup = self._build_lookup(self._entries)
+            return self._lookup
+
+    @staticmethod
+    def _repo_key(repository: Optional[Dict]) -> str:
+        return f"{repository['owner']}/{repository['name']}" if repository else "local"
+
+    def record(self, suggestions: List[Dict], files: List[Dict], repository: Optional[Dict] = None) -> int:
+        """
+        Remember suggestions together with the fingerprints of the files they refer to
+
+        Args:
+            suggestions (List[Dict]): Suggestions with file_path, start_line, end_line and old_code
+            files (List[Dict]): The analyzed files, with name/path and full content
+            repository (Dict, optional): Repository the files come from
+
+        Returns:
+            int: Number of suggestions added to the index
+        """
+        with self._lock:
+            return self._record(suggestions, files, repository)
+
+    def _record(self, suggestions: List[Dict], files: List[Dict], repository: Optional[Dict]) -> int:
+        entries = list(self._load())
+        known = {(e["file_hash"], e["suggestion"].get("start_line"), e["suggestion"].get("old_code")) for e in entries}
+        added = 0
+        for suggestion in suggestions:
+            target = str(suggestion.get("file_path") or suggestion.get("file") or "")
+            file = next((f for f in files if matches_path(f["path"], target)), None)
+            if file is None or not str(suggestion.get("old_code") or "").strip():
+                continue
+            fingerprint = fingerprint_source(file["content"])
+            if fingerprint is None:
+                continue
+            key = (fingerprint["file"], suggestion.get("start_line"), suggestion.get("old_code"))
+            if key in known:
+                continue
+            known.add(key)
+            entries.append({
+                "repository": self._repo_key(repository),
+                "path": file["path"],
+                "file_hash": fingerprint["file"],
+                "functions": fingerprint["functions"],
+                "suggestion": {k: v for k, v in suggestion.items() if k != "reused_from"},
+                "recorded_at": datetime.now().isoformat(timespec="seconds")
+            })
+            added += 1
+        if added:
+            atomic_write(self.index_file, json.dumps({"entries": entries}).encode("utf-8"))
+            self._entries, self._lookup, self._stamp = entries, None, self._file_stamp()
+        return added
+
+    def _reanchor(self, entry: Dict, file: Dict, repository: Optional[Dict], match: str,
+                  lines: Tuple[int, Optional[int]] = (1, None)) -> Optional[Dict]:
+        suggestion = entry["suggestion"]
+        located = _locate(file["content"], str(suggestion.get("old_code") or ""), *lines)
+        if located is None:
+            return None
+        reused = dict(suggestion)
+        reused.update({
+            "file": file["path"],
+            "file_path": file["path"],
+            "file_name": file["path"].rsplit("/", 1)[-1],
+            "start_line": located[0],
+            "end_line": located[1],
+            "reused_from": {"repository": entry["repository"], "path": entry["path"], "match": match}
+        })
+        if repository:
+            reused["repo_name"] = repository["name"]
+        return reused
+
+    @staticmethod
+    def _build_lookup(entries: List[Dict]) -> Dict[str, Dict]:
+        """Entries by file hash, and by the hash of the function each suggestion lies in"""
+        by_file: Dict[str, List[Dict]] = {}
+        by_function: Dict[str, List[Dict]] = {}
+        for entry in entries:
+            by_file.setdefault(entry["file_hash"], []).append(entry)
+            try:
+                start, end = int(entry["suggestion"]["start_line"]), int(entry["suggestion"]["end_line"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            # Innermost function containing the whole suggestion
+            containing = [f for f in entry["functions"] if f["start"] <= start and end <= f["end"]]
+            if containing:
+                function = min(containing, key=lambda f: f["end"] - f["start"])
+                by_function.setdefault(function["hash"], []).append(entry)
+        return {"file": by_file, "function": by_function}
+
+    def find(self, file: Dict, repository: Optional[Dict] = None, lookup: Optional[Dict] = None) -> List[Dict]:
+        """Earlier suggestions that apply to a file, re-anchored to its path and line numbers"""
+        fingerprint = fingerprint_source(file["content"])
+        if fingerprint is None:
+            return []
+        lookup = lookup or self._get_lookup()
+        location = (self._repo_key(repository), file["path"])
+        def elsewhere(entries: List[Dict]) -> List[Dict]:
+            # The same file at the same place was analyzed before, not copied
+            return [e for e in entries if (e["repository"], e["path"]) != location]
+
+        found = [self._reanchor(entry, file, repository, "file")
+                 for entry in elsewhere(lookup["file"].get(fingerprint["file"], []))]
+        if not any(found):
+            # The suggestion must lie inside a function that exists, unchanged, in the new file
+            for function in fingerprint["functions"]:
+                if function["end"] - function["start"] + 1 < self.min_function_lines:
+                    continue
+                for entry in elsewhere(lookup["function"].get(function["hash"], [])):
+                    found.append(self._reanchor(entry, file, repository, "function",
+                                                (function["start"], function["end"])))
+
+        unique = {}
+        for suggestion in found:
+            if suggestion:
+                unique.setdefault((suggestion["start_line"], suggestion.get("old_code")), suggestion)
+        return list(unique.values())
+
+    def reuse(self, files: List[Dict], repository: Optional[Dict] = None) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Split files into reused suggestions and the files still needing analysis
+
+        Only a copy of a whole file is left out of the analysis. A file that merely
+        contains a known function gets the earlier suggestion and is still analyzed,
+        since the rest of it is new code.
+
+        Returns:
+            Tuple[List[Dict], List[Dict]]: Re-anchored suggestions, and the files to send to the model
+        """
+        lookup = self._get_lookup()
+        if not lookup["file"]:
+            return [], files
+        reused, remaining = [], []
+        for file in files:
+            suggestions = self.find(file, repository, lookup)
+            for suggestion in suggestions:
+                origin = suggestion["reused_from"]
+                print(f"♻️ {file['path']}: reusing suggestion from {origin['repository']}/{origin['path']} "
+                      f"({origin['match']} match, lines {suggestion['start_line']}-{suggestion['end_line']})")
+            reused.extend(suggestions)
+            if not any(suggestion["reused_from"]["match"] == "file" for suggestion in suggestions):
+                remaining.append(file)
+        return reused, remaining
+
+
+_fingerprint_index: Optional[FingerprintIndex] = None
+_fingerprint_index_lock = threading.Lock()
+
+
+def get_fingerprint_index() -> FingerprintIndex:
+    """Return the process-wide fingerprint index"""
+    global _fingerprint_index
+    with _fingerprint_index_lock:
+        if _fingerprint_index is None:
+            _fingerprint_index = FingerprintIndex()
+        return _fingerprint_index
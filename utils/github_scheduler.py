@@ -0,0 +1,222 @@
+import os
+import time
+import heapq
+import random
+import itertools
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Dict, Optional
+from urllib.parse import urlparse
+
+if TYPE_CHECKING:
+    import requests
+
+# Priority classes, lower runs first
+PRIORITY_PR = 0           # Pull request creation triggered by a user
+PRIORITY_INTERACTIVE = 1  # Single-file fetches and API lookups
+PRIORITY_BULK = 2         # Repository scanning and bulk file downloads
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Seconds to wait according to a Retry-After header
+
+    Args:
+        value (str, optional): Header value, either delay-seconds or an HTTP date
+
+    Returns:
+        Optional[float]: The delay, or None if the header is missing or malformed
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if when is None:
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """Token bucket for one host, refilled at the rate GitHub says we can afford"""
+
+    def __init__(self, capacity: float):
+        self.capacity = capacity
+        self.tokens = capacity
+        # No refill limit until the first rate-limit headers arrive
+        self.refill_rate: Optional[float] = None
+        self.remaining: Optional[int] = None
+        self.reset_at: Optional[float] = None
+        self.blocked_until = 0.0
+        self.backoff = 0.0
+        self.updated_at = time.monotonic()
+
+    def refill(self) -> None:
+        now = time.monotonic()
+        if self.refill_rate is None:
+            self.tokens = self.capacity
+        else:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available"""
+        now = time.monotonic()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        if not self.refill_rate:
+            return 1.0
+        return (1 - self.tokens) / self.refill_rate
+
+
+class GitHubScheduler:
+    """Shared scheduler that paces GitHub requests by priority and the rate-limit headers"""
+
+    def __init__(self, burst: Optional[float] = None, reserve: Optional[int] = None,
+                 max_retries: Optional[int] = None, max_backoff: Optional[float] = None):
+        self.burst = burst if burst is not None else float(os.getenv("GITHUB_RATE_BURST", "20"))
+        # Requests left in the window below which only pull request creation may proceed
+        self.reserve = reserve if reserve is not None else int(os.getenv("GITHUB_RATE_RESERVE", "50"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("GITHUB_MAX_RETRIES", "3"))
+        self.max_backoff = max_backoff if max_backoff is not None else float(os.getenv("GITHUB_MAX_BACKOFF", "300"))
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    def _bucket(self, host: str) -> TokenBucket:
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.burst)
+        return self._buckets[host]
+
+    def acquire(self, url: str, priority: int = PRIORITY_BULK) -> None:
+        """Block until the request may be sent, letting higher priorities go first"""
+        host = urlparse(url).netloc
+        ticket = (priority, next(self._sequence), host)
+        with self._condition:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    bucket = self._bucket(host)
+                    bucket.refill()
+                    wait = bucket.wait_time()
+                    # Keep the last requests of the window for pull request creation
+                    if (priority > PRIORITY_PR and bucket.remaining is not None
+                            and bucket.remaining <= self.reserve and bucket.reset_at):
+                        wait = max(wait, bucket.reset_at - time.time())
+                    ahead = [t for t in self._waiting if t[2] == host and t < ticket]
+                    if not ahead and wait <= 0:
+                        bucket.tokens -= 1
+                        if bucket.remaining is not None:
+                            bucket.remaining -= 1
+                        return
+                    self._condition.wait(timeout=min(max(wait, 0.05), 5.0))
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._condition.notify_all()
+
+    def update(self, response: "requests.Response") -> Optional[float]:
+        """
+        Feed the rate-limit headers of a response into the host's bucket
+
+        Returns:
+            Optional[float]: Seconds to wait before retrying if the response was throttled
+        """
+        host = urlparse(response.url).netloc
+        headers = response.headers
+        with self._condition:
+            bucket = self._bucket(host)
+            bucket.refill()
+            remaining = headers.get("X-RateLimit-Remaining")
+            reset = headers.get("X-RateLimit-Reset")
+            if remaining is not None and reset is not None:
+                bucket.remaining = int(remaining)
+                bucket.reset_at = float(reset)
+                # Spread what is left of the quota over the rest of the window
+                window = max(1.0, bucket.reset_at - time.time())
+                bucket.refill_rate = max(bucket.remaining / window, 1.0 / window)
+                bucket.tokens = min(bucket.tokens, float(bucket.remaining))
+
+            retry_after = None
+            if self.is_throttled(response):
+                # Retry-After may be a number of seconds or an HTTP date
+                retry_after = parse_retry_after(headers.get("Retry-After"))
+                if retry_after is None and remaining == "0" and reset is not None:
+                    retry_after = max(0.0, float(reset) - time.time())
+                elif retry_after is None:
+                    # Secondary rate limit without a usable hint: back off exponentially
+                    bucket.backoff = min(self.max_backoff, max(1.0, bucket.backoff * 2))
+                    retry_after = bucket.backoff
+                retry_after = min(self.max_backoff, retry_after) + random.uniform(0, 1)
+                bucket.blocked_until = time.monotonic() + retry_after
+                print(f"⏳ GitHub rate limit hit on {host}, backing off {retry_after:.1f}s")
+            else:
+                bucket.backoff = bucket.backoff / 2 if bucket.backoff > 1 else 0.0
+            self._condition.notify_all()
+            return retry_after
+
+    @staticmethod
+    def is_throttled(response: "requests.Response") -> bool:
+        """Check whether GitHub rejected a request because of a primary or secondary rate limit"""
+        if response.status_code == 429:
+            return True
+        if response.status_code != 403:
+            return False
+        if response.headers.get("X-RateLimit-Remaining") == "0" or response.headers.get("Retry-After"):
+            return True
+        return "rate limit" in response.text.lower()
+
+    def request(self, method: str, url: str, priority: int = PRIORITY_BULK, **kwargs) -> "requests.Response":
+        """Send a request through the scheduler, retrying throttled responses after backing off"""
+        # Imported here so the priority constants can be used without loading the HTTP stack
+        from utils import http_client
+        for attempt in range(self.max_retries + 1):
+            self.acquire(url, priority)
+            response = http_client.request(method, url, **kwargs)
+            retry_after = self.update(response)
+            if retry_after is None or attempt == self.max_retries:
+                return response
+            response.close()
+        return response
+
+    def stats(self) -> Dict[str, Dict]:
+        """Current view of the rate limit for each host"""
+        with self._condition:
+            return {
+                host: {
+                    "remaining": bucket.remaining,
+                    "reset_at": bucket.reset_at,
+                    "refill_rate": bucket.refill_rate,
+                    "backoff": bucket.backoff
+                }
+                for host, bucket in self._buckets.items()
+            }
+
+
+_scheduler: Optional[GitHubScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> GitHubScheduler:
+    """Return the process-wide GitHub scheduler"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = GitHubScheduler()
+        return _scheduler
+
+
+def github_request(method: str, url: str, priority: int = PRIORITY_BULK, **kwargs) -> "requests.Response":
+    """Send a GitHub request through the shared scheduler"""
+    return get_scheduler().request(method, url, priority=priority, **kwargs)
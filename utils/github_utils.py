@@ -1,14 +1,19 @@
 import os
-from github import Github
 from dotenv import load_dotenv
-from typing import Optional, Tuple, List, Dict
-from urllib.parse import urljoin
+from typing import Optional, Tuple, List, Dict, Iterator
+from urllib.parse import urljoin, quote
+from utils.blob_cache import fetch_file_content
+from utils.github_scheduler import github_request, PRIORITY_BULK, PRIORITY_INTERACTIVE
 
 class GitHubCodeFetcher:
     def __init__(self):
         load_dotenv()
         self.github_token = os.getenv('GITHUB_TOKEN')
-        self.github = Github(self.github_token) if self.github_token else None
+        self.api_url = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+        self.headers = {
+            "Authorization": f"token {self.github_token}",
+            "Accept": "application/vnd.github.v3+json"
+        }
 
     def get_repo_and_file_path(self, github_url: str) -> Tuple[Optional[str], Optional[str]]:
         """
@@ -96,76 +101,106 @@ class GitHubCodeFetcher:
             str: File contents or None if error
         """
         try:
-            if not self.github:
+            if not self.github_token:
                 raise ValueError("GitHub token not configured")
             
             repo_name, file_path = self.get_repo_and_file_path(github_url)
             if not repo_name or not file_path:
                 raise ValueError("Invalid GitHub URL format")
             
-            repo = self.github.get_repo(repo_name)
-            file_content = repo.get_contents(file_path)
-            
-            # GitHub API returns content in base64
-            import base64
-            decoded_content = base64.b64decode(file_content.content).decode('utf-8')
-            return decoded_content
+            # Request the raw body so unchanged files are served from the blob cache
+            api_url = f"{self.api_url}/repos/{repo_name}/contents/{quote(file_path)}"
+            headers = dict(self.headers, Accept="application/vnd.github.v3.raw")
+            return fetch_file_content(api_url, headers, priority=PRIORITY_INTERACTIVE)
             
         except Exception as e:
             print(f"Error fetching code from GitHub: {str(e)}")
             return None
 
-    def get_python_files(self, github_url: str) -> List[Dict[str, str]]:
+    def iter_python_files(self, github_url: str, max_files: Optional[int] = None,
+                          max_bytes: Optional[int] = None) -> Iterator[Dict[str, str]]:
         """
-        Get all Python files from a GitHub repository
+        Lazily yield the Python files of a GitHub repository as each directory listing arrives
         
         Args:
             github_url (str): GitHub repository URL
+            max_files (int, optional): Stop after yielding this many files
+            max_bytes (int, optional): Stop before the total size of yielded files exceeds this
             
-        Returns:
-            List[Dict[str, str]]: List of dictionaries containing file information:
-                {
-                    'name': 'filename.py',
-                    'path': 'path/to/file.py',
-                    'url': 'https://github.com/owner/repo/blob/branch/path/to/file.py',
-                    'size': 1234  # file size in bytes
-                }
+        Yields:
+            Dict[str, str]: File information in the same format as get_python_files
         """
         try:
-            if not self.github:
+            if not self.github_token:
                 raise ValueError("GitHub token not configured")
             
             repo_name, branch, base_url = self.get_repo_from_url(github_url)
             if not repo_name:
                 raise ValueError("Invalid GitHub URL format")
             
-            repo = self.github.get_repo(repo_name)
-            python_files = []
-            
-            # Get all contents recursively
-            contents = repo.get_contents("", ref=branch)
-            
-            def process_contents(contents):
-                for content in contents:
-                    if content.type == "dir":
-                        # Recursively process subdirectories
-                        process_contents(repo.get_contents(content.path, ref=branch))
-                    elif content.type == "file" and content.name.endswith('.py'):
-                        # Add Python file to the list
-                        file_url = urljoin(base_url, content.path)
-                        python_files.append({
-                            'name': content.name,
-                            'path': content.path,
-                            'url': file_url,
-                            'size': content.size
-                        })
-            
-            process_contents(contents)
-            return python_files
+            def get_content_pages(path: str) -> Iterator[List[Dict]]:
+                """Yield the pages of a directory listing, following Link headers"""
+                api_url = f"{self.api_url}/repos/{repo_name}/contents/{quote(path)}"
+                params = {"ref": branch, "per_page": 100}
+                while api_url:
+                    response = github_request(
+                        "GET", api_url, priority=PRIORITY_BULK, headers=self.headers, params=params
+                    )
+                    response.raise_for_status()
+                    yield response.json()
+                    # The next link already carries the query string
+                    api_url = response.links.get("next", {}).get("url")
+                    params = None
+            
+            def process_directory(path: str) -> Iterator[Dict[str, str]]:
+                for page in get_content_pages(path):
+                    for content in page:
+                        if content["type"] == "dir":
+                            # Recursively process subdirectories
+                            yield from process_directory(content["path"])
+                        elif content["type"] == "file" and content["name"].endswith('.py'):
+                            yield {
+                                'name': content["name"],
+                                'path': content["path"],
+                                'url': urljoin(base_url + "/", content["path"]),
+                                'size': content["size"],
+                                'sha': content["sha"]
+                            }
+            
+            # Stopping here closes the generator, so no further directories are listed
+            files_yielded = 0
+            bytes_yielded = 0
+            if max_files is not None and max_files <= 0:
+                return
+            for file_info in process_directory(""):
+                if max_bytes is not None and bytes_yielded + file_info['size'] > max_bytes:
+                    return
+                files_yielded += 1
+                bytes_yielded += file_info['size']
+                yield file_info
+                if max_files is not None and files_yielded >= max_files:
+                    return
             
         except Exception as e:
             print(f"Error getting Python files: {str(e)}")
-            return []
+
+    def get_python_files(self, github_url: str) -> List[Dict[str, str]]:
+        """
+        Get all Python files from a GitHub repository
+        
+        Args:
+            github_url (str): GitHub repository URL
+            
+        Returns:
+            List[Dict[str, str]]: List of dictionaries containing file information:
+                {
+                    'name': 'filename.py',
+                    'path': 'path/to/file.py',
+                    'url': 'https://github.com/owner/repo/blob/branch/path/to/file.py',
+                    'size': 1234  # file size in bytes
+                }
+        """
+        return list(self.iter_python_files(github_url))
 
 if __name__ == "__main__":
     # Example usage
@@ -191,4 +226,8 @@ if __name__ == "__main__":
             print(f"URL: {file['url']}")
             print(f"Size: {file['size']} bytes")
     else:
-        print("No Python files found or error occurred") 
\ No newline at end of file
+        print("No Python files found or error occurred")
+    
+    # Example 3: Stream the first Python files while the listing is still running
+    for file in fetcher.iter_python_files("https://github.com/username/repo", max_files=5):
+        print(f"Streamed: {file['path']} ({file['size']} bytes)") 
\ No newline at end of file
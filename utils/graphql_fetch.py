@@ -0,0 +1,78 @@
+import os
+from typing import Dict, List, Optional
+from utils.blob_cache import get_blob_cache
+from utils.github_scheduler import github_request, PRIORITY_BULK
+
+BLOB_FIELDS = "... on Blob { oid text isBinary isTruncated }"
+
+
+def graphql_url() -> str:
+    """GraphQL endpoint, derived from GITHUB_API_URL unless set explicitly"""
+    api_url = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+    return os.getenv("GITHUB_GRAPHQL_URL", f"{api_url}/graphql")
+
+
+def build_blob_query(count: int) -> str:
+    """Build a query fetching `count` blobs by expression, one alias per file"""
+    variables = ", ".join(f"$e{i}: String!" for i in range(count))
+    objects = "\n".join(f"    f{i}: object(expression: $e{i}) {{ {BLOB_FIELDS} }}" for i in range(count))
+    return (
+        f"query($owner: String!, $name: String!, {variables}) {{\n"
+        f"  repository(owner: $owner, name: $name) {{\n{objects}\n  }}\n}}"
+    )
+
+
+def fetch_blobs_graphql(owner: str, repo: str, ref: str, paths: List[str], headers: Dict[str, str],
+                        chunk_size: Optional[int] = None, timeout: Optional[float] = None) -> Dict[str, str]:
+    """
+    Fetch many file bodies by path with batched GraphQL queries
+
+    Files that come back missing, binary or truncated, and whole chunks whose
+    query fails, are left out of the result so callers can fall back to REST.
+
+    Args:
+        owner (str): Repository owner
+        repo (str): Repository name
+        ref (str): Branch, tag or commit to read
+        paths (List[str]): File paths relative to the repository root
+        headers (Dict[str, str]): Request headers (auth)
+        chunk_size (int, optional): Files per query, kept small to stay under query-cost limits
+        timeout (float, optional): Per-request timeout in seconds
+
+    Returns:
+        Dict[str, str]: File contents by path
+    """
+    if chunk_size is None:
+        chunk_size = int(os.getenv("GITHUB_GRAPHQL_BATCH", "50"))
+    cache = get_blob_cache()
+    url = graphql_url()
+    contents: Dict[str, str] = {}
+
+    for start in range(0, len(paths), chunk_size):
+        chunk = paths[start:start + chunk_size]
+        variables = {"owner": owner, "name": repo}
+        variables.update({f"e{i}": f"{ref}:{path}" for i, path in enumerate(chunk)})
+        try:
+            response = github_request(
+                "POST", url, priority=PRIORITY_BULK, headers=headers, timeout=timeout,
+                json={"query": build_blob_query(len(chunk)), "variables": variables}
+            )
+            response.raise_for_status()
+            body = response.json()
+        except Exception as e:
+            print(f"Error fetching files with GraphQL: {str(e)}")
+            continue
+
+        for error in body.get("errors") or []:
+            print(f"GraphQL error: {error.get('message', error)}")
+        repository = (body.get("data") or {}).get("repository") or {}
+        for i, path in enumerate(chunk):
+            blob = repository.get(f"f{i}")
+            if not blob or blob.get("isBinary") or blob.get("isTruncated") or blob.get("text") is None:
+                continue
+            contents[path] = blob["text"]
+            cache.put(blob["oid"], blob["text"].encode("utf-8"))
+
+    print(f"📦 Fetched {len(contents)}/{len(paths)} files with "
+          f"{(len(paths) + chunk_size - 1) // chunk_size if paths else 0} GraphQL queries")
+    return contents
@@ -0,0 +1,361 @@
+import os
+import ast
+from typing import Dict, List, Optional, Set, Tuple
+
+# Points added to a file's score for each finding. Patterns that are a clear win on their
+# own weigh 3 (the default threshold); weaker hints only count together with others.
+WEIGHTS = {
+    "nested_loop": 3,
+    "blocking_call_in_loop": 3,
+    "list_membership_in_loop": 3,
+    "linear_search": 3,
+    "string_concat_in_loop": 2,
+    "manual_counting": 2,
+    "unclosed_resource": 2,
+    "whole_file_read": 2,
+    "heavy_import": 2,
+    "list_front_op": 2,
+    "swallowed_exception": 2,
+    "repeated_lookup": 1,
+    "file_io_in_loop": 1,
+    "bare_except": 1
+}
+
+# Hints common enough in ordinary code that repeats within a file don't add up
+ONCE_PER_FILE = {"repeated_lookup", "bare_except"}
+
+# Modules slow enough to import that a single-use top-level import is worth moving
+HEAVY_MODULES = {
+    "boto3", "botocore", "pandas", "numpy", "scipy", "sklearn", "tensorflow", "torch", "matplotlib",
+    "seaborn", "plotly", "sqlalchemy", "requests", "transformers", "cv2", "PIL", "nltk", "spacy",
+    "openpyxl", "lxml", "django", "flask", "fastapi", "streamlit"
+}
+
+BLOCKING_CALLS = {
+    "time.sleep", "sleep", "requests.get", "requests.post", "requests.put", "requests.patch",
+    "requests.delete", "requests.head", "requests.request", "urlopen", "urllib.request.urlopen",
+    "subprocess.run", "subprocess.call", "subprocess.check_call", "subprocess.check_output",
+    "os.system", "socket.create_connection"
+}
+
+# File system calls; one per iteration is often fine, so they only add to other findings
+FILE_IO_CALLS = {
+    "open", "io.open", "os.remove", "os.unlink", "os.rename", "os.replace",
+    "shutil.copy", "shutil.copyfile", "shutil.move"
+}
+
+# Methods that do I/O on a file (or file-like) object, whatever it is called
+FILE_IO_METHODS = {"read", "readline", "readlines", "write", "writelines"}
+
+# Exception types broad enough that silently ignoring them hides bugs
+BROAD_EXCEPTIONS = {"Exception", "BaseException"}
+
+FUNCTIONS = (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)
+
+
+def _dotted_name(node: ast.AST) -> str:
+    """Name of a called function as written, e.g. "time.sleep" (empty if not a plain name chain)"""
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return ""
+    parts.append(node.id)
+    return ".".join(reversed(parts))
+
+
+def _names(node: ast.AST) -> Set[str]:
+    return {n.id for n in ast.walk(node) if isinstance(n, ast.Name)}
+
+
+def _slice(node: ast.Subscript) -> ast.AST:
+    """Index expression of a subscript (unwrapping ast.Index on Python 3.8)"""
+    return node.slice.value if type(node.slice).__name__ == "Index" else node.slice
+
+
+def _loop_body_nodes(loop: ast.AST):
+    """Nodes inside a loop body, not descending into nested functions or classes"""
+    stack = list(loop.body) + list(getattr(loop, "orelse", []))
+    while stack:
+        node = stack.pop()
+        yield node
+        if not isinstance(node, FUNCTIONS + (ast.ClassDef,)):
+            stack.extend(ast.iter_child_nodes(node))
+
+
+class _HotspotVisitor(ast.NodeVisitor):
+    def __init__(self, tree: ast.Module):
+        self.findings: List[Dict] = []
+        self.parents: Dict[ast.AST, ast.AST] = {}
+        for node in ast.walk(tree):
+            for child in ast.iter_child_nodes(node):
+                self.parents[child] = node
+        self.loops: List[ast.AST] = []
+        self.list_names: List[Set[str]] = [set()]
+        self.str_names: List[Set[str]] = [set()]
+        self.closed_names: List[Set[str]] = [set()]
+        self.managed: Set[ast.AST] = set()
+        self.flagged_loops: Set[Tuple[str, int]] = set()
+
+    def add(self, pattern: str, node: ast.AST, message: str) -> None:
+        self.findings.append({"pattern": pattern, "line": getattr(node, "lineno", 0), "message": message})
+
+    def add_once(self, pattern: str, loop: ast.AST, node: ast.AST, message: str) -> None:
+        """Report a pattern at most once per loop"""
+        if (pattern, id(loop)) not in self.flagged_loops:
+            self.flagged_loops.add((pattern, id(loop)))
+            self.add(pattern, node, message)
+
+    # Scopes
+
+    def visit_FunctionDef(self, node: ast.AST) -> None:
+        saved_loops, self.loops = self.loops, []
+        self.list_names.append(set())
+        self.str_names.append(set())
+        self.closed_names.append({
+            _dotted_name(n.func.value) for n in ast.walk(node)
+            if isinstance(n, ast.Call) and isinstance(n.func, ast.Attribute) and n.func.attr == "close"
+        })
+        self.generic_visit(node)
+        self.closed_names.pop()
+        self.str_names.pop()
+        self.list_names.pop()
+        self.loops = saved_loops
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+    visit_Lambda = visit_FunctionDef
+
+    def visit_Module(self, node: ast.Module) -> None:
+        self.closed_names[0] = {
+            _dotted_name(n.func.value) for n in ast.walk(node)
+            if isinstance(n, ast.Call) and isinstance(n.func, ast.Attribute) and n.func.attr == "close"
+        }
+        self.generic_visit(node)
+
+    # Loops
+
+    def visit_loop(self, node: ast.AST) -> None:
+        if self.loops:
+            self.add("nested_loop", node, "Loop nested inside another loop (quadratic scan)")
+        self.check_lookups(node)
+        if isinstance(node, (ast.For, ast.AsyncFor)):
+            self.check_linear_search(node)
+        self.loops.append(node)
+        self.generic_visit(node)
+        self.loops.pop()
+
+    visit_For = visit_loop
+    visit_AsyncFor = visit_loop
+    visit_While = visit_loop
+
+    def check_lookups(self, loop: ast.AST) -> None:
+        """The same subscript evaluated repeatedly, or a membership test followed by the same lookup"""
+        seen: Dict[str, int] = {}
+        tested = set()
+        for node in _loop_body_nodes(loop):
+            if isinstance(node, ast.Subscript) and isinstance(node.ctx, ast.Load):
+                key = ast.dump(node)
+                seen[key] = seen.get(key, 0) + 1
+            elif isinstance(node, ast.Compare) and len(node.ops) == 1 and isinstance(node.ops[0], (ast.In, ast.NotIn)):
+                tested.add((ast.dump(node.left), ast.dump(node.comparators[0])))
+        checked_then_read = any(
+            isinstance(node, ast.Subscript) and (ast.dump(_slice(node)), ast.dump(node.value)) in tested
+            for node in _loop_body_nodes(loop)
+        )
+        if checked_then_read or any(count > 1 for count in seen.values()):
+            self.add("repeated_lookup", loop, "Same lookup repeated inside a loop (use get/defaultdict/a local)")
+        for node in _loop_body_nodes(loop):
+            if self.is_manual_count(node):
+                self.add("manual_counting", node,
+                         "Key tested for membership before updating it (use collections.Counter, defaultdict or get)")
+                break
+
+    @staticmethod
+    def is_manual_count(node: ast.AST) -> bool:
+        """`if key in d: d[key] ... else: d[key] = ...`, the Counter/defaultdict idiom written by hand"""
+        if not (isinstance(node, ast.If) and isinstance(node.test, ast.Compare) and len(node.test.ops) == 1
+                and isinstance(node.test.ops[0], (ast.In, ast.NotIn))):
+            return False
+        key, mapping = ast.dump(node.test.left), ast.dump(node.test.comparators[0])
+        for statement in node.body + node.orelse:
+            targets = statement.targets if isinstance(statement, ast.Assign) else (
+                [statement.target] if isinstance(statement, ast.AugAssign) else [])
+            for target in targets:
+                if (isinstance(target, ast.Subscript) and ast.dump(_slice(target)) == key
+                        and ast.dump(target.value) == mapping):
+                    return True
+        return False
+
+    def check_linear_search(self, loop: ast.AST) -> None:
+        """A loop that compares each item to a key and stops at the first match"""
+        targets = _names(loop.target)
+        for node in loop.body:
+            if not isinstance(node, ast.If) or not isinstance(node.test, ast.Compare):
+                continue
+            test = node.test
+            if len(test.ops) != 1 or not isinstance(test.ops[0], ast.Eq):
+                continue
+            left = test.left.value if isinstance(test.left, ast.Subscript) else test.left
+            stops = any(isinstance(n, (ast.Return, ast.Break)) for n in ast.walk(node))
+            if isinstance(left, ast.Name) and left.id in targets and stops:
+                self.add("linear_search", loop, "Linear search for a key (use a dict or set)")
+                return
+
+    # Statements and expressions
+
+    def visit_Assign(self, node: ast.Assign) -> None:
+        value = node.value
+        for target in node.targets:
+            if not isinstance(target, ast.Name):
+                continue
+            is_list = isinstance(value, (ast.List, ast.ListComp)) or (
+                isinstance(value, ast.Call) and _dotted_name(value.func) == "list")
+            # s = s + "..." keeps s a string
+            is_concat = (isinstance(value, ast.BinOp) and isinstance(value.op, ast.Add)
+                         and isinstance(value.left, ast.Name) and value.left.id == target.id
+                         and target.id in self.str_names[-1])
+            is_str = is_concat or isinstance(value, ast.JoinedStr) or (
+                isinstance(value, ast.Constant) and isinstance(value.value, str))
+            (self.list_names[-1].add if is_list else self.list_names[-1].discard)(target.id)
+            (self.str_names[-1].add if is_str else self.str_names[-1].discard)(target.id)
+            if is_concat and self.loops:
+                self.add_once("string_concat_in_loop", self.loops[-1], node,
+                              "String built by concatenation in a loop (use join)")
+        self.generic_visit(node)
+
+    def visit_AugAssign(self, node: ast.AugAssign) -> None:
+        if self.loops and isinstance(node.op, ast.Add) and isinstance(node.target, ast.Name):
+            value = node.value
+            is_str = (node.target.id in self.str_names[-1] or isinstance(value, ast.JoinedStr)
+                      or (isinstance(value, ast.Constant) and isinstance(value.value, str)))
+            if is_str:
+                self.add_once("string_concat_in_loop", self.loops[-1], node,
+                              "String built by concatenation in a loop (use join)")
+        self.generic_visit(node)
+
+    def visit_Compare(self, node: ast.Compare) -> None:
+        if self.loops:
+            for op, comparator in zip(node.ops, node.comparators):
+                if (isinstance(op, (ast.In, ast.NotIn)) and isinstance(comparator, ast.Name)
+                        and comparator.id in self.list_names[-1]):
+                    self.add_once("list_membership_in_loop", self.loops[-1], node,
+                                  f"Membership test on list '{comparator.id}' inside a loop (use a set)")
+        self.generic_visit(node)
+
+    def visit_ExceptHandler(self, node: ast.ExceptHandler) -> None:
+        if node.type is None:
+            self.add("bare_except", node, "Bare except also catches KeyboardInterrupt and SystemExit")
+        broad = node.type is None or _dotted_name(node.type) in BROAD_EXCEPTIONS
+        ignored = all(
+            isinstance(statement, (ast.Pass, ast.Continue)) or (
+                isinstance(statement, ast.Return) and (statement.value is None or (
+                    isinstance(statement.value, ast.Constant) and statement.value.value is None)))
+            for statement in node.body
+        )
+        if broad and ignored:
+            self.add("swallowed_exception", node, "Every error is silently ignored (catch the expected exceptions)")
+        self.generic_visit(node)
+
+    def visit_With(self, node: ast.AST) -> None:
+        for item in node.items:
+            self.managed.add(item.context_expr)
+        self.generic_visit(node)
+
+    visit_AsyncWith = visit_With
+
+    def visit_Call(self, node: ast.Call) -> None:
+        name = _dotted_name(node.func)
+        if self.loops and name in BLOCKING_CALLS:
+            self.add_once("blocking_call_in_loop", self.loops[-1], node,
+                          f"Blocking {name}() called on every iteration (batch or run concurrently)")
+        elif self.loops and (name in FILE_IO_CALLS or (
+                isinstance(node.func, ast.Attribute) and node.func.attr in FILE_IO_METHODS)):
+            self.add_once("file_io_in_loop", self.loops[-1], node,
+                          f"File I/O ({name or node.func.attr}) on every iteration (batch or buffer it)")
+        if name in ("open", "io.open") and node not in self.managed:
+            parent = self.parents.get(node)
+            assigned = [t for t in getattr(parent, "targets", []) if isinstance(t, ast.Name)]
+            if not any(t.id in self.closed_names[-1] for t in assigned):
+                self.add("unclosed_resource", node, "File opened without a with block or close()")
+        if isinstance(node.func, ast.Attribute):
+            if node.func.attr == "readlines" and not node.args:
+                self.add("whole_file_read", node, "readlines() loads the whole file (iterate the file instead)")
+            elif ((node.func.attr == "pop" and len(node.args) == 1 or node.func.attr == "insert" and len(node.args) == 2)
+                  and isinstance(node.args[0], ast.Constant) and node.args[0].value == 0):
+                self.add("list_front_op", node, f"list.{node.func.attr}(0) is O(n) (use collections.deque)")
+        self.generic_visit(node)
+
+
+def _heavy_imports(tree: ast.Module) -> List[Dict]:
+    """Top-level imports of heavy modules used in at most one function"""
+    findings = []
+    functions = [n for n in ast.walk(tree) if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))]
+    module_level = set()
+    for node in tree.body:
+        if not isinstance(node, (ast.Import, ast.ImportFrom, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            module_level |= _names(node)
+
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            imported = [(alias.name, alias.asname or alias.name.split(".")[0]) for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            imported = [(node.module, alias.asname or alias.name) for alias in node.names]
+        else:
+            continue
+        for module, bound in imported:
+            if module.split(".")[0] not in HEAVY_MODULES or bound in module_level:
+                continue
+            users = [f.name for f in functions if bound in _names(f)]
+            if len(users) <= 1:
+                where = f"only used in {users[0]}()" if users else "unused"
+                findings.append({"pattern": "heavy_import", "line": node.lineno,
+                                 "message": f"Heavy top-level import of {module}, {where}"})
+    return findings
+
+
+def scan_source(content: str) -> Optional[Dict]:
+    """
+    Score a Python source file by the performance patterns it contains
+
+    Returns:
+        Optional[Dict]: {"score", "findings"}, or None if the file does not parse
+    """
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError):
+        return None
+    visitor = _HotspotVisitor(tree)
+    visitor.visit(tree)
+    findings = sorted(visitor.findings + _heavy_imports(tree), key=lambda f: f["line"])
+    patterns = [f["pattern"] for f in findings]
+    score = sum(WEIGHTS[p] for p in patterns if p not in ONCE_PER_FILE)
+    score += sum(WEIGHTS[p] for p in ONCE_PER_FILE if p in patterns)
+    return {"score": score, "findings": findings}
+
+
+def hotspot_threshold() -> int:
+    """Minimum score for a file to be sent to the model (0 turns the filter off)"""
+    return int(os.getenv("HOTSPOT_THRESHOLD", "3"))
+
+
+def filter_hotspots(files: List[Dict], threshold: Optional[int] = None) -> List[Dict]:
+    """
+    Keep the files whose hotspot score reaches the threshold
+
+    Each file needs a "content" key; kept files get "hotspot_score" and
+    "hotspots" added. Files that don't parse are kept so the model can still
+    look at them.
+    """
+    threshold = hotspot_threshold() if threshold is None else threshold
+    if threshold <= 0:
+        return files
+    kept = []
+    for file in files:
+        report = scan_source(file.get("content") or "")
+        if report is None:
+            kept.append(file)
+        elif report["score"] >= threshold:
+            kept.append(dict(file, hotspot_score=report["score"], hotspots=report["findings"]))
+    print(f"🔥 Hotspot filter kept {len(kept)}/{len(files)} files (threshold {threshold})")
+    return kept
@@ -0,0 +1,158 @@
+import os
+import re
+import bisect
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+from urllib3.util.retry import Retry
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Methods that are safe to retry without creating duplicate side effects
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram for one endpoint"""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile as the upper bound of the bucket it falls in"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTP adapter that applies a default timeout to requests that don't set one"""
+
+    def __init__(self, timeout: Tuple[float, float], **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+_histograms: Dict[str, LatencyHistogram] = {}
+_histograms_lock = threading.Lock()
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def endpoint_key(method: str, url: str) -> str:
+    """Group URLs into endpoints, e.g. 'GET api.github.com /repos/:owner/:repo/git/trees'"""
+    parsed = urlparse(url)
+    path = parsed.path
+    match = re.match(r"^/repos/[^/]+/[^/]+(/[^/]+(?:/[^/]+)?)?", path)
+    if match:
+        suffix = match.group(1) or ""
+        # Keep the resource name but drop refs, shas and file paths
+        if suffix.startswith("/git/"):
+            suffix = "/".join(suffix.split("/")[:3])
+        else:
+            suffix = "/".join(suffix.split("/")[:2])
+        path = "/repos/:owner/:repo" + suffix
+    elif parsed.netloc != urlparse(os.getenv("GITHUB_API_URL", "https://api.github.com")).netloc:
+        # Raw and archive downloads: one endpoint per host
+        path = ""
+    return f"{method.upper()} {parsed.netloc} {path}".rstrip()
+
+
+def _record_latency(response: requests.Response, *args, **kwargs) -> None:
+    key = endpoint_key(response.request.method, response.url)
+    with _histograms_lock:
+        if key not in _histograms:
+            _histograms[key] = LatencyHistogram()
+        _histograms[key].observe(response.elapsed.total_seconds())
+
+
+def _build_retry() -> Retry:
+    retry_args = dict(
+        total=int(os.getenv("HTTP_MAX_RETRIES", "3")),
+        backoff_factor=float(os.getenv("HTTP_BACKOFF_FACTOR", "0.5")),
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=IDEMPOTENT_METHODS,
+        raise_on_status=False,
+        # Rate limiting (403/429 with Retry-After) is handled by the GitHub scheduler
+        respect_retry_after_header=False
+    )
+    try:
+        return Retry(backoff_jitter=float(os.getenv("HTTP_BACKOFF_JITTER", "0.5")), **retry_args)
+    except TypeError:
+        # urllib3 < 2 has no built-in jitter
+        return Retry(**retry_args)
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide pooled session"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = TimeoutHTTPAdapter(
+                timeout=(
+                    float(os.getenv("HTTP_CONNECT_TIMEOUT", "10")),
+                    float(os.getenv("HTTP_READ_TIMEOUT", "60"))
+                ),
+                pool_connections=int(os.getenv("HTTP_POOL_CONNECTIONS", "10")),
+                pool_maxsize=int(os.getenv("HTTP_POOL_MAXSIZE", "32")),
+                max_retries=_build_retry()
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.hooks["response"].append(_record_latency)
+            _session = session
+        return _session
+
+
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    """Send a request on the shared session"""
+    return get_session().request(method, url, **kwargs)
+
+
+def latency_stats() -> Dict[str, Dict]:
+    """Request count and latency quantiles for each endpoint"""
+    with _histograms_lock:
+        return {
+            key: {
+                "count": histogram.count,
+                "mean": histogram.total / histogram.count if histogram.count else None,
+                "p50": histogram.quantile(0.5),
+                "p95": histogram.quantile(0.95),
+                "p99": histogram.quantile(0.99),
+                "buckets": dict(zip([str(b) for b in LATENCY_BUCKETS] + ["+Inf"], histogram.counts))
+            }
+            for key, histogram in _histograms.items()
+        }
+
+
+def print_latency_report() -> None:
+    """Print a per-endpoint latency summary"""
+    stats = latency_stats()
+    if not stats:
+        return
+    print("\n🌐 HTTP latency by endpoint:")
+    for key, entry in sorted(stats.items(), key=lambda item: -item[1]["count"]):
+        print(f"  {key}: {entry['count']} calls, mean {entry['mean'] * 1000:.0f}ms, "
+              f"p50 ≤{entry['p50']}s, p95 ≤{entry['p95']}s")
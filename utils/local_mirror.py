@@ -0,0 +1,173 @@
+import os
+import time
+import subprocess
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from urllib.parse import quote
+
+
+class LocalMirror:
+    """Repository source backed by a local git clone or a shared bare mirror"""
+
+    def __init__(self, git_dir: Path, owner: str, repo: str, ref: str, raw_url: str,
+                 exclude: Optional[Callable[[str], bool]] = None):
+        self.git_dir = Path(git_dir)
+        self.owner = owner
+        self.repo = repo
+        self.ref = ref
+        self.raw_url = raw_url.rstrip("/")
+        self.exclude = exclude
+        self._shas: Dict[str, str] = {}
+
+    def _git(self, *args: str, binary: bool = False):
+        """Run a git command against the mirror and return its output"""
+        result = subprocess.run(
+            ["git", "--git-dir", str(self.git_dir), *args],
+            check=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        return result.stdout if binary else result.stdout.decode("utf-8")
+
+    @staticmethod
+    def _lock(lock_file: Path, timeout: float = 600) -> None:
+        """Take a simple lock file so workers sharing a mirror directory don't fetch concurrently"""
+        deadline = time.time() + timeout
+        while True:
+            try:
+                os.close(os.open(str(lock_file), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return
+            except FileExistsError:
+                # Break locks left behind by crashed workers
+                try:
+                    if time.time() - lock_file.stat().st_mtime > timeout:
+                        os.remove(lock_file)
+                        continue
+                except OSError:
+                    continue
+                if time.time() > deadline:
+                    raise TimeoutError(f"Timed out waiting for mirror lock {lock_file}")
+                time.sleep(0.5)
+
+    @classmethod
+    def open(cls, repo_url: str, owner: str, repo: str, ref: str, mirror_root: str, raw_url: str,
+             clone_mode: str = "mirror", refresh_seconds: float = 0,
+             exclude: Optional[Callable[[str], bool]] = None) -> "LocalMirror":
+        """
+        Clone a repository into the mirror directory, or update the existing mirror
+
+        Args:
+            repo_url (str): Clone URL (https://, ssh or file://)
+            owner (str): Repository owner
+            repo (str): Repository name
+            ref (str): Branch, tag or commit to read; falls back to HEAD if missing
+            mirror_root (str): Directory holding the shared bare mirrors
+            raw_url (str): Base URL used to build download URLs in the structure
+            clone_mode (str): "mirror" (full), "partial" (blobs fetched on demand) or "shallow" (depth 1)
+            refresh_seconds (float): Skip fetching if the mirror was updated more recently than this
+            exclude (Callable[[str], bool], optional): Returns True for paths to skip
+
+        Returns:
+            LocalMirror: Source reading files from the local mirror
+        """
+        git_dir = Path(mirror_root) / owner / f"{repo}.git"
+        git_dir.parent.mkdir(parents=True, exist_ok=True)
+        lock_file = git_dir.parent / f"{repo}.git.lock"
+
+        depth_args = ["--depth", "1"] if clone_mode == "shallow" else []
+        cls._lock(lock_file)
+        try:
+            if not (git_dir / "HEAD").exists():
+                print(f"📥 Cloning {repo_url} into {git_dir} ({clone_mode})")
+                clone_args = ["--bare"] + depth_args
+                if clone_mode == "partial":
+                    clone_args.append("--filter=blob:none")
+                subprocess.run(
+                    ["git", "clone", *clone_args, repo_url, str(git_dir)],
+                    check=True,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE
+                )
+            else:
+                fetch_head = git_dir / "FETCH_HEAD"
+                age = time.time() - fetch_head.stat().st_mtime if fetch_head.exists() else None
+                if age is None or age >= refresh_seconds:
+                    print(f"🔄 Updating mirror {git_dir}")
+                    subprocess.run(
+                        ["git", "--git-dir", str(git_dir), "fetch", "--prune", *depth_args,
+                         "origin", "+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*"],
+                        check=True,
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.PIPE
+                    )
+        finally:
+            try:
+                os.remove(lock_file)
+            except OSError:
+                pass
+
+        mirror = cls(git_dir, owner, repo, ref, raw_url, exclude)
+        try:
+            mirror._git("rev-parse", "--verify", "--quiet", f"{ref}^{{commit}}")
+        except subprocess.CalledProcessError:
+            print(f"Ref {ref} not found in mirror, using HEAD")
+            mirror.ref = "HEAD"
+        return mirror
+
+    def head_sha(self) -> str:
+        """Commit SHA of the ref being read"""
+        return self._git("rev-parse", f"{self.ref}^{{commit}}").strip()
+
+    def changed_paths(self, base_sha: str, head_sha: str) -> Optional[List[str]]:
+        """Paths added or modified between two commits, or None if the base is unknown"""
+        try:
+            output = self._git("diff", "--name-only", "-z", "--diff-filter=d", base_sha, head_sha)
+        except subprocess.CalledProcessError:
+            return None
+        return [path for path in output.split("\0") if path]
+
+    def churn(self, since_days: float) -> Dict[str, int]:
+        """Lines added and deleted per path in commits of the last `since_days` days"""
+        churn: Dict[str, int] = {}
+        output = self._git("log", f"--since={since_days:g}.days.ago", "--numstat", "--no-renames",
+                           "--format=", self.ref)
+        for line in output.splitlines():
+            parts = line.split("\t", 2)
+            # Binary files show "-" instead of line counts
+            if len(parts) != 3 or not parts[0].isdigit() or not parts[1].isdigit():
+                continue
+            churn[parts[2]] = churn.get(parts[2], 0) + int(parts[0]) + int(parts[1])
+        return churn
+
+    def list_files(self) -> List[Dict]:
+        """Return the Python files of the ref in the repository structure format"""
+        structure = []
+        output = self._git("ls-tree", "-r", "-l", "-z", self.ref)
+        for record in output.split("\0"):
+            if not record:
+                continue
+            meta, path = record.split("\t", 1)
+            _, object_type, sha, size = meta.split()
+            if object_type != "blob" or not path.endswith(".py"):
+                continue
+            if self.exclude and self.exclude(path):
+                continue
+            self._shas[path] = sha
+            structure.append({
+                "name": path,
+                "url": f"{self.raw_url}/{self.owner}/{self.repo}/{quote(self.ref)}/{quote(path)}",
+                "size": int(size) if size.isdigit() else 0,
+                "sha": sha,
+                "type": "file",
+                "language": "Python"
+            })
+        return structure
+
+    def read(self, path: str) -> Optional[str]:
+        """Return the contents of a file at the ref, or None if it does not exist"""
+        try:
+            data = self._git("cat-file", "blob", self._shas.get(path) or f"{self.ref}:{path}", binary=True)
+        except subprocess.CalledProcessError:
+            return None
+        # Sources that aren't valid UTF-8 (e.g. latin-1) shouldn't end the run
+        return data.decode("utf-8", errors="replace")
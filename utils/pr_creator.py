@@ -1,7 +1,8 @@
-import requests, base64
+import base64
 import os
 import json
 from dotenv import load_dotenv
+from utils.github_scheduler import github_request, PRIORITY_PR
 
 
 class PRCreator:
@@ -60,7 +61,7 @@ class PRCreator:
     def get_branch_sha(self):
         url = f"https://api.github.com/repos/{self.owner}/{self.repo}/git/ref/heads/{self.base_branch}"
         headers = {"Authorization": f"Bearer {self.github_token}", "Accept": "application/vnd.github+json"}
-        res = requests.get(url, headers=headers)
+        res = github_request("GET", url, priority=PRIORITY_PR, headers=headers)
         res.raise_for_status()
         print(res.json())
         return res.json()["object"]["sha"]
@@ -76,14 +77,14 @@ class PRCreator:
             "ref": f"refs/heads/{new_branch}",
             "sha": base_sha
         }
-        res = requests.post(url, json=data, headers=headers)
+        res = github_request("POST", url, priority=PRIORITY_PR, json=data, headers=headers)
         res.raise_for_status()
 
 
     def get_file(self, path, new_code, start_line, end_line):
         url = f"https://api.github.com/repos/{self.owner}/{self.repo}/contents/{path}?ref={self.base_branch}"
         headers = {"Authorization": f"Bearer {self.github_token}", "Accept": "application/vnd.github+json"}
-        res = requests.get(url, headers=headers)
+        res = github_request("GET", url, priority=PRIORITY_PR, headers=headers)
         res.raise_for_status()
         content = base64.b64decode(res.json()["content"]).decode("utf-8")
 
@@ -115,7 +116,7 @@ class PRCreator:
             "sha": sha
         }
 
-        res = requests.put(url, json=data, headers=headers)
+        res = github_request("PUT", url, priority=PRIORITY_PR, json=data, headers=headers)
         res.raise_for_status()
 
 
@@ -129,7 +130,7 @@ class PRCreator:
             "base": self.base_branch   # The branch you want to merge into (e.g., main)
         }
 
-        res = requests.post(url, json=data, headers=headers)
+        res = github_request("POST", url, priority=PRIORITY_PR, json=data, headers=headers)
         res.raise_for_status()
         pr_url = res.json()["html_url"]
         print(f"Pull Request created: {pr_url}")
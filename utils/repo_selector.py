@@ -1,70 +1,330 @@
 import os
+import json
 import random
 import requests
-from typing import Dict, List, Optional
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Union
 from pathlib import Path
+from urllib.parse import quote
+from utils.archive_store import ArchiveStore
+from utils.local_mirror import LocalMirror
+from utils.github_scheduler import github_request, PRIORITY_BULK, PRIORITY_INTERACTIVE
+from utils.scan_state import ScanState
+
+# The compare API lists at most this many files, however many changed
+COMPARE_FILES_LIMIT = 300
 
 class RepoSelector:
     def __init__(self):
+        # "tree" lists the whole repository in one request, "contents" walks it directory by directory,
+        # "archive" downloads the repository once and serves file contents from memory,
+        # "mirror" reads from a local git clone and needs no GitHub API access at all
+        self.listing_mode = os.getenv("REPO_LISTING_MODE", "tree")
+
         self.token = os.getenv("GITHUB_TOKEN")
-        if not self.token:
+        if not self.token and self.listing_mode != "mirror":
             raise ValueError("GITHUB_TOKEN not found in environment variables")
             
         self.headers = {
-            "Authorization": f"token {self.token}",
             "Accept": "application/vnd.github.v3+json"
         }
+        if self.token:
+            self.headers["Authorization"] = f"token {self.token}"
+        self.api_url = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+        self.raw_url = os.getenv("GITHUB_RAW_URL", "https://raw.githubusercontent.com").rstrip("/")
+        self.archive_format = os.getenv("ARCHIVE_FORMAT", "tarball")
+        self.mirror_dir = os.getenv("CODEBREW_MIRROR_DIR", "data/mirrors")
+        self.mirror_clone_mode = os.getenv("MIRROR_CLONE_MODE", "mirror")
+        self.mirror_refresh_seconds = float(os.getenv("MIRROR_REFRESH_SECONDS", "0"))
+        # Source backend (ArchiveStore or LocalMirror) serving file contents for the current repository
+        self.source: Optional[Union[ArchiveStore, LocalMirror]] = None
+        self.cache_dir = Path(os.getenv("CODEBREW_CACHE_DIR", "data/cache"))
+        # Only re-list and re-analyze files changed since the last analyzed commit
+        self.incremental = os.getenv("INCREMENTAL_SCAN", "1") == "1"
+        self.scan_state = ScanState()
         
     def get_default_branch(self, owner: str, repo: str) -> Optional[str]:
         """Get the default branch of a repository"""
         try:
-            api_url = f"https://api.github.com/repos/{owner}/{repo}"
-            response = requests.get(api_url, headers=self.headers)
+            api_url = f"{self.api_url}/repos/{owner}/{repo}"
+            response = github_request("GET", api_url, priority=PRIORITY_INTERACTIVE, headers=self.headers)
             response.raise_for_status()
             return response.json().get("default_branch", "main")
         except Exception as e:
             print(f"Error getting default branch: {str(e)}")
             return None
         
-    def get_random_repo(self) -> Optional[Dict]:
-        """Get a random repository from the list"""
+    @staticmethod
+    def parse_repo_url(repo_url: str) -> Dict:
+        """Build the repository info used throughout the pipeline from a repository URL"""
+        repo_name = repo_url.split("/")[-1]
+        if repo_name.endswith(".git"):
+            repo_name = repo_name[:-4]
+        owner = repo_url.split("/")[-2]
+        
+        return {
+            "url": repo_url,
+            "name": repo_name,
+            "owner": owner,
+            # HEAD always names the default branch; analyze_repository resolves the actual name
+            "default_branch": "HEAD"
+        }
+
+    def resolve_default_branch(self, repo: Dict) -> Dict:
+        """Look up the repository's default branch once, keeping HEAD if it can't be determined"""
+        if repo["default_branch"] == "HEAD" and self.listing_mode != "mirror":
+            repo["default_branch"] = self.get_default_branch(repo["owner"], repo["name"]) or "HEAD"
+        return repo
+
+    def list_repositories(self, repo_file: str = "data/repositories.txt") -> List[Dict]:
+        """All repositories in the list file"""
         try:
             # Read repositories from file
-            repo_file = Path("data/repositories.txt")
-            if not repo_file.exists():
+            if not Path(repo_file).exists():
                 print("Error: repositories.txt not found")
-                return None
+                return []
                 
             with open(repo_file) as f:
-                repos = [line.strip() for line in f if line.strip()]
-                
-            if not repos:
-                print("Error: No repositories found in file")
-                return None
+                return [self.parse_repo_url(line.strip()) for line in f if line.strip()]
                 
-            # Select random repository
-            repo_url = random.choice(repos)
-            repo_name = repo_url.split("/")[-1]
-            owner = repo_url.split("/")[-2]
+        except Exception as e:
+            print(f"Error reading repository list: {str(e)}")
+            return []
+
+    def get_random_repo(self) -> Optional[Dict]:
+        """Get a random repository from the list"""
+        repos = self.list_repositories()
+        if not repos:
+            print("Error: No repositories found in file")
+            return None
             
-            return {
-                "url": repo_url,
-                "name": repo_name,
-                "owner": owner,
-                "default_branch": "main"  # Using main as default branch
-            }
+        # Select random repository
+        return random.choice(repos)
             
+    def _open_mirror(self, repo: Dict) -> LocalMirror:
+        """Open (clone or update) the local mirror of a repository once per run"""
+        if not (isinstance(self.source, LocalMirror)
+                and (self.source.owner, self.source.repo) == (repo["owner"], repo["name"])):
+            self.source = LocalMirror.open(
+                repo["url"], repo["owner"], repo["name"], repo["default_branch"],
+                mirror_root=self.mirror_dir,
+                raw_url=self.raw_url,
+                clone_mode=self.mirror_clone_mode,
+                refresh_seconds=self.mirror_refresh_seconds,
+                exclude=self.is_excluded_path
+            )
+        return self.source
+
+    def get_head_sha(self, repo: Dict) -> Optional[str]:
+        """Get the commit SHA the repository's branch currently points to"""
+        try:
+            if self.listing_mode == "mirror":
+                return self._open_mirror(repo).head_sha()
+            api_url = f"{self.api_url}/repos/{repo['owner']}/{repo['name']}/commits/{quote(repo['default_branch'])}"
+            headers = dict(self.headers, Accept="application/vnd.github.sha")
+            response = github_request("GET", api_url, priority=PRIORITY_INTERACTIVE, headers=headers)
+            response.raise_for_status()
+            return response.text.strip()
         except Exception as e:
-            print(f"Error getting random repository: {str(e)}")
+            print(f"Error getting head commit: {str(e)}")
             return None
-            
-    def get_repo_structure(self, repo: Dict) -> List[Dict]:
-        """Get repository structure with metadata"""
+
+    def get_changed_files(self, repo: Dict, base_sha: str, head_sha: str) -> Optional[Dict[str, Optional[str]]]:
+        """
+        Get the files added or modified between two commits
+
+        Returns:
+            Optional[Dict[str, Optional[str]]]: Path to new blob SHA (None when unknown),
+                or None if the comparison failed (e.g. after a force-push) or its file
+                list may be incomplete, so the caller lists the whole repository instead
+        """
+        try:
+            if self.listing_mode == "mirror":
+                paths = self._open_mirror(repo).changed_paths(base_sha, head_sha)
+                return None if paths is None else {path: None for path in paths}
+
+            changed = {}
+            listed = 0
+            api_url = f"{self.api_url}/repos/{repo['owner']}/{repo['name']}/compare/{base_sha}...{head_sha}"
+            params = {"per_page": 100}
+            while api_url:
+                response = github_request("GET", api_url, priority=PRIORITY_BULK, headers=self.headers, params=params)
+                response.raise_for_status()
+                files = response.json().get("files")
+                if files is None:
+                    print("Comparison returned no file list, listing the whole repository")
+                    return None
+                listed += len(files)
+                for file in files:
+                    if file["status"] != "removed":
+                        changed[file["filename"]] = file.get("sha")
+                # The next link already carries the query string
+                api_url = response.links.get("next", {}).get("url")
+                params = None
+            if listed >= COMPARE_FILES_LIMIT:
+                print(f"Comparison lists {listed} files, the API's maximum; listing the whole repository")
+                return None
+            return changed
+        except Exception as e:
+            print(f"Error comparing commits: {str(e)}")
+            return None
+
+    def get_churn(self, repo: Dict, days: Optional[float] = None) -> Dict[str, int]:
+        """
+        Lines changed per file over the last `days` days (CHURN_DAYS, default 90)
+
+        Over the API this is one commits request and one comparison, so the
+        window is cut short at the 100th commit on very active repositories.
+        """
+        days = days if days is not None else float(os.getenv("CHURN_DAYS", "90"))
+        try:
+            if self.listing_mode == "mirror":
+                return self._open_mirror(repo).churn(days)
+
+            since = (datetime.utcnow() - timedelta(days=days)).strftime("%Y-%m-%dT%H:%M:%SZ")
+            response = github_request(
+                "GET", f"{self.api_url}/repos/{repo['owner']}/{repo['name']}/commits",
+                priority=PRIORITY_BULK, headers=self.headers,
+                params={"sha": repo["default_branch"], "since": since, "per_page": 100}
+            )
+            response.raise_for_status()
+            commits = response.json()
+            if not commits or not commits[-1].get("parents"):
+                return {}
+
+            churn = {}
+            base_sha, head_sha = commits[-1]["parents"][0]["sha"], commits[0]["sha"]
+            api_url = f"{self.api_url}/repos/{repo['owner']}/{repo['name']}/compare/{base_sha}...{head_sha}"
+            params = {"per_page": 100}
+            while api_url:
+                response = github_request("GET", api_url, priority=PRIORITY_BULK, headers=self.headers, params=params)
+                response.raise_for_status()
+                for file in response.json().get("files", []):
+                    churn[file["filename"]] = file.get("changes", 0)
+                api_url = response.links.get("next", {}).get("url")
+                params = None
+            return churn
+        except Exception as e:
+            print(f"Error getting file churn: {str(e)}")
+            return {}
+
+    def record_analyzed(self, repo_info: Dict) -> None:
+        """Record the commit that was just analyzed so the next run only looks at newer changes"""
+        if repo_info.get("head_sha"):
+            self.scan_state.record(repo_info["repository"], repo_info["head_sha"])
+
+    @staticmethod
+    def is_excluded_path(path: str) -> bool:
+        """Check whether a file lives under a test directory"""
+        return "test" in os.path.dirname(path).lower()
+
+    def _tree_cache_file(self, repo: Dict) -> Path:
+        """Path of the cached tree listing for a repository ref"""
+        return self.cache_dir / "trees" / f"{repo['owner']}__{repo['name']}__{repo['default_branch'].replace('/', '_')}.json"
+
+    def _load_tree_cache(self, repo: Dict) -> Optional[Dict]:
+        """Load the cached ETag and structure for a repository ref"""
+        cache_file = self._tree_cache_file(repo)
+        try:
+            with open(cache_file, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_tree_cache(self, repo: Dict, etag: Optional[str], structure: List[Dict]) -> None:
+        """Store the ETag and structure so the next listing can be a conditional request"""
+        if not etag:
+            return
+        cache_file = self._tree_cache_file(repo)
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = cache_file.with_suffix(".tmp")
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump({"etag": etag, "structure": structure}, f)
+            os.replace(tmp_file, cache_file)
+        except OSError as e:
+            print(f"Warning: could not cache tree listing: {str(e)}")
+
+    def _tree_entry_to_file(self, repo: Dict, path: str, entry: Dict) -> Dict:
+        """Build a structure entry from a git tree blob"""
+        return {
+            "name": path,
+            "url": f"{self.raw_url}/{repo['owner']}/{repo['name']}/{quote(repo['default_branch'])}/{quote(path)}",
+            "size": entry.get("size", 0),
+            "sha": entry["sha"],
+            "type": "file",
+            "language": "Python"
+        }
+
+    def _get_tree_structure(self, repo: Dict) -> List[Dict]:
+        """Get all Python files with the git trees API, using one recursive request when possible"""
+        trees_url = f"{self.api_url}/repos/{repo['owner']}/{repo['name']}/git/trees"
+
+        def fetch_tree(tree_ish: str, recursive: bool, etag: Optional[str] = None) -> requests.Response:
+            headers = dict(self.headers)
+            if etag:
+                headers["If-None-Match"] = etag
+            params = {"recursive": "1"} if recursive else None
+            response = github_request(
+                "GET", f"{trees_url}/{quote(tree_ish)}", priority=PRIORITY_BULK, headers=headers, params=params
+            )
+            if response.status_code != 304:
+                response.raise_for_status()
+            return response
+
+        def collect(tree: List[Dict], prefix: str) -> List[Dict]:
+            structure = []
+            for entry in tree:
+                path = prefix + entry["path"]
+                if entry["type"] == "blob" and path.endswith(".py") and not self.is_excluded_path(path):
+                    structure.append(self._tree_entry_to_file(repo, path, entry))
+            return structure
+
+        def list_subtree(tree_sha: str, prefix: str) -> List[Dict]:
+            """List a subtree recursively, paging level by level if it is truncated too"""
+            data = fetch_tree(tree_sha, recursive=True).json()
+            if data.get("truncated"):
+                return walk_truncated(tree_sha, prefix)
+            return collect(data["tree"], prefix)
+
+        def walk_truncated(tree_sha: str, prefix: str) -> List[Dict]:
+            """Page through a truncated tree one level at a time"""
+            data = fetch_tree(tree_sha, recursive=False).json()
+            structure = collect(data["tree"], prefix)
+            for entry in data["tree"]:
+                path = prefix + entry["path"]
+                # Skip test directories
+                if entry["type"] == "tree" and "test" not in path.lower():
+                    structure.extend(list_subtree(entry["sha"], path + "/"))
+            return structure
+
+        cached = self._load_tree_cache(repo)
+        response = fetch_tree(repo["default_branch"], recursive=True, etag=cached["etag"] if cached else None)
+        if response.status_code == 304 and cached:
+            print("Repository tree unchanged since last listing (304), using cached structure")
+            return cached["structure"]
+
+        data = response.json()
+        if data.get("truncated"):
+            print("Repository tree truncated, listing subtrees individually")
+            structure = walk_truncated(data["sha"], "")
+        else:
+            structure = collect(data["tree"], "")
+
+        self._save_tree_cache(repo, response.headers.get("ETag"), structure)
+        return structure
+
+    def get_repo_structure(self, repo: Dict, changed_files: Optional[Dict[str, Optional[str]]] = None) -> List[Dict]:
+        """Get repository structure with metadata
+
+        When changed_files is given, only those files are listed. Without a local
+        source their sizes are unknown and reported as 0.
+        """
         def traverse_directory(path: str) -> List[Dict]:
             """Recursively traverse directory and get all Python files"""
             try:
-                api_url = f"https://api.github.com/repos/{repo['owner']}/{repo['name']}/contents/{path}"
-                response = requests.get(api_url, headers=self.headers)
+                api_url = f"{self.api_url}/repos/{repo['owner']}/{repo['name']}/contents/{path}"
+                response = github_request("GET", api_url, priority=PRIORITY_BULK, headers=self.headers)
                 response.raise_for_status()
                 
                 items = response.json()
@@ -78,6 +338,7 @@ class RepoSelector:
                             "name": item["path"],
                             "url": item["download_url"],
                             "size": item["size"],
+                            "sha": item["sha"],
                             "type": "file",
                             "language": "Python"
                         })
@@ -94,12 +355,36 @@ class RepoSelector:
                 return []
 
         try:
-            # Start traversal from root
-            structure = traverse_directory("")
-            
-            if not structure:
-                # If root is empty, try src directory
-                structure = traverse_directory("src")
+            if changed_files is not None and self.listing_mode in ("tree", "contents"):
+                structure = [
+                    self._tree_entry_to_file(repo, path, {"sha": sha, "size": 0})
+                    for path, sha in changed_files.items()
+                    if path.endswith(".py") and not self.is_excluded_path(path)
+                ]
+            elif self.listing_mode == "tree":
+                structure = self._get_tree_structure(repo)
+            elif self.listing_mode == "archive":
+                self.source = ArchiveStore.download(
+                    repo["owner"], repo["name"], repo["default_branch"],
+                    headers=self.headers,
+                    api_url=self.api_url,
+                    raw_url=self.raw_url,
+                    exclude=self.is_excluded_path,
+                    archive_format=self.archive_format
+                )
+                structure = self.source.list_files()
+            elif self.listing_mode == "mirror":
+                structure = self._open_mirror(repo).list_files()
+            else:
+                # Start traversal from root
+                structure = traverse_directory("")
+
+                if not structure:
+                    # If root is empty, try src directory
+                    structure = traverse_directory("src")
+
+            if changed_files is not None and self.listing_mode in ("archive", "mirror"):
+                structure = [file for file in structure if file["name"] in changed_files]
             
             print(f"\nFound Python files in directories:")
             # Print unique directories to help debug
@@ -117,19 +402,36 @@ class RepoSelector:
             print(f"Error getting repository structure: {str(e)}")
             return []
             
-    def analyze_repository(self, n_files: int = 5) -> Optional[Dict]:
-        """Analyze a random repository and return top N files"""
+    def analyze_repository(self, n_files: int = 5, repo: Optional[Dict] = None) -> Optional[Dict]:
+        """Analyze a repository (a random one unless given) and return top N files"""
         # Get random repository
-        repo = self.get_random_repo()
+        repo = repo or self.get_random_repo()
         if not repo:
             return None
+        self.resolve_default_branch(repo)
             
         print(f"\n📦 Selected repository: {repo['name']} (branch: {repo['default_branch']})")
         
+        # Only look at what changed since the last analyzed commit
+        head_sha = self.get_head_sha(repo) if self.incremental else None
+        last_sha = self.scan_state.get_last_sha(repo) if head_sha else None
+        changed_files = None
+        if last_sha and last_sha == head_sha:
+            print(f"✅ No new commits since last analysis ({head_sha[:7]}), skipping")
+            return None
+        if last_sha:
+            changed_files = self.get_changed_files(repo, last_sha, head_sha)
+            if changed_files is not None:
+                print(f"🔁 Incremental scan: {len(changed_files)} files changed since {last_sha[:7]}")
+        
         # Get repository structure
-        structure = self.get_repo_structure(repo)
+        structure = self.get_repo_structure(repo, changed_files)
         if not structure:
-            print("No Python files found in repository")
+            if changed_files is not None:
+                print("No changed Python files since last analysis")
+                self.scan_state.record(repo, head_sha)
+            else:
+                print("No Python files found in repository")
             return None
             
         print(f"Found {len(structure)} Python files")
@@ -138,7 +440,9 @@ class RepoSelector:
         return {
             "repository": repo,
             "structure": structure,
-            "n_files": n_files
+            "n_files": n_files,
+            "source": self.source,
+            "head_sha": head_sha
         }
 
 if __name__ == "__main__":
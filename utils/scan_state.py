@@ -0,0 +1,41 @@
+import os
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+from utils.blob_cache import atomic_write
+
+
+class ScanState:
+    """Last analyzed commit of each repository, used for incremental re-scans"""
+
+    def __init__(self, state_file: Optional[str] = None):
+        self.state_file = Path(state_file or os.getenv("SCAN_STATE_FILE", "data/scan_state.json"))
+
+    def _load(self) -> Dict[str, Dict]:
+        try:
+            with open(self.state_file, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _key(repo: Dict) -> str:
+        return f"{repo['owner']}/{repo['name']}"
+
+    def get_last_sha(self, repo: Dict) -> Optional[str]:
+        """Commit SHA last analyzed on the repository's branch, if any"""
+        entry = self._load().get(self._key(repo))
+        if not entry or entry.get("ref") != repo["default_branch"]:
+            return None
+        return entry.get("sha")
+
+    def record(self, repo: Dict, sha: str) -> None:
+        """Remember that the repository was analyzed at this commit"""
+        state = self._load()
+        state[self._key(repo)] = {
+            "sha": sha,
+            "ref": repo["default_branch"],
+            "analyzed_at": datetime.now().isoformat(timespec="seconds")
+        }
+        atomic_write(self.state_file, json.dumps(state, indent=2).encode("utf-8"))
@@ -0,0 +1,153 @@
+import os
+import json
+import math
+from typing import Dict, List, Optional, Tuple
+from utils.file_ranker import is_test_file
+from utils.text_utils import estimate_tokens
+
+
+def format_size(size: int) -> str:
+    """Short file size, e.g. 812, 12k, 1.4M"""
+    if size < 1000:
+        return str(size)
+    if size < 1000 * 1000:
+        return f"{size / 1000:.0f}k" if size >= 10 * 1000 else f"{size / 1000:.1f}k"
+    return f"{size / 1000 / 1000:.1f}M"
+
+
+def importance(entry: Dict) -> float:
+    """How much a file deserves a place in a truncated listing"""
+    path = entry["name"]
+    name = path.rsplit("/", 1)[-1]
+    score = math.log1p(entry.get("size") or 0) + 3 * (entry.get("hotspot_score") or 0)
+    # Deeply nested files, package markers and test helpers are the first to go
+    score -= 0.5 * path.count("/")
+    if name == "__init__.py" and (entry.get("size") or 0) < 200:
+        score -= 5
+    if is_test_file(path) or any(part in ("test", "tests") for part in path.split("/")[:-1]):
+        score -= 5
+    return score
+
+
+def _build_trie(entries: List[Dict]) -> Dict:
+    root: Dict = {}
+    for entry in entries:
+        node = root
+        parts = entry["name"].split("/")
+        for part in parts[:-1]:
+            node = node.setdefault(part + "/", {})
+        node[parts[-1]] = entry
+    return root
+
+
+def _render(node: Dict, omitted: Dict[str, Tuple[int, int]], prefix: str = "", depth: int = 0) -> List[str]:
+    lines = []
+    indent = "  " * depth
+    directories = sorted(k for k in node if k.endswith("/"))
+    files = sorted(k for k in node if not k.endswith("/"))
+    for name in directories:
+        child = node[name]
+        # Collapse chains of single-directory levels: src/pkg/
+        while len(child) == 1 and next(iter(child)).endswith("/"):
+            only = next(iter(child))
+            if (prefix + name) in omitted:
+                break
+            name, child = name + only, child[only]
+        lines.append(f"{indent}{name}")
+        lines.extend(_render(child, omitted, prefix + name, depth + 1))
+    for name in files:
+        entry = node[name]
+        line = f"{indent}{name} {format_size(entry.get('size') or 0)}"
+        if entry.get("hotspot_score"):
+            line += f" hot:{entry['hotspot_score']}"
+        lines.append(line)
+    if prefix in omitted:
+        count, size = omitted[prefix]
+        lines.append(f"{indent}... {count} more file{'s' if count != 1 else ''} ({format_size(size)})")
+    return lines
+
+
+def _encode(entries: List[Dict], dropped: List[Dict]) -> str:
+    omitted: Dict[str, Tuple[int, int]] = {}
+    for entry in dropped:
+        directory = entry["name"].rsplit("/", 1)[0] + "/" if "/" in entry["name"] else ""
+        count, size = omitted.get(directory, (0, 0))
+        omitted[directory] = (count + 1, size + (entry.get("size") or 0))
+    # Keep directories that lost every file so their summary line has somewhere to go
+    trie = _build_trie(entries)
+    for directory in omitted:
+        node = trie
+        for part in filter(None, directory.rstrip("/").split("/")):
+            node = node.setdefault(part + "/", {})
+    return "\n".join(_render(trie, omitted))
+
+
+def encode_structure(structure: List[Dict], budget_tokens: Optional[int] = None) -> Tuple[str, Dict[str, int]]:
+    """
+    Encode a repository structure as an indented path tree with file sizes
+
+    Directories end with "/" and files show their size, plus their hotspot
+    score when known. URLs and SHAs are left out; callers resolve selected
+    paths against the structure afterwards. If the tree is over the budget,
+    the least important files are replaced by a "... N more files" line in
+    their directory.
+
+    Args:
+        structure (List[Dict]): Repository structure entries
+        budget_tokens (int, optional): Token budget, defaults to STRUCTURE_TOKEN_BUDGET (0 for no limit)
+
+    Returns:
+        Tuple[str, Dict[str, int]]: The encoded tree and its stats (json_tokens, tokens, files, shown)
+    """
+    if budget_tokens is None:
+        budget_tokens = int(os.getenv("STRUCTURE_TOKEN_BUDGET", "6000"))
+    text = _encode(structure, [])
+    shown = len(structure)
+
+    if budget_tokens and estimate_tokens(text) > budget_tokens:
+        ranked = sorted(structure, key=importance, reverse=True)
+        # Largest number of top files whose tree still fits
+        low, high = 0, len(ranked) - 1
+        best, shown = _encode([], ranked), 0
+        while low <= high:
+            middle = (low + high) // 2
+            candidate = _encode(ranked[:middle], ranked[middle:])
+            if estimate_tokens(candidate) <= budget_tokens:
+                best, shown, low = candidate, middle, middle + 1
+            else:
+                high = middle - 1
+        text = best
+
+    stats = {
+        "json_tokens": estimate_tokens(json.dumps(structure, indent=2)),
+        "tokens": estimate_tokens(text),
+        "files": len(structure),
+        "shown": shown
+    }
+    return text, stats
+
+
+def resolve_paths(selected: List[Dict], structure: List[Dict]) -> List[Dict]:
+    """
+    Attach the download URL and blob SHA of each selected path from the structure
+
+    Paths the model shortened are matched by unique suffix; paths that match
+    nothing are dropped.
+    """
+    by_name = {entry["name"]: entry for entry in structure}
+    resolved = []
+    for file in selected:
+        name = str(file.get("name", "")).strip()
+        name = name[2:] if name.startswith("./") else name.lstrip("/")
+        entry = by_name.get(name)
+        if entry is None:
+            matches = [e for path, e in by_name.items() if path.endswith("/" + name)]
+            entry = matches[0] if len(matches) == 1 else None
+        if entry is None:
+            print(f"Skipping unknown file selected by the model: {name}")
+            continue
+        file = dict(file, name=entry["name"], url=entry["url"])
+        if entry.get("sha"):
+            file["sha"] = entry["sha"]
+        resolved.append(file)
+    return resolved
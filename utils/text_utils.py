@@ -1,5 +1,9 @@
 import json
-from typing import Optional
+from typing import List, Optional, Set
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate, about four characters per token for code"""
+    return (len(text) + 3) // 4
 
 def clean_json_string(text: str) -> str:
     """Clean JSON string by removing markdown code block markers and whitespace."""
@@ -57,4 +61,79 @@ def extract_json_from_text(text: str) -> Optional[dict]:
         return json.loads(cleaned_content)
         
     except json.JSONDecodeError:
-        return None 
\ No newline at end of file
+        return None 
+
+
+class IncrementalJSONParser:
+    """
+    Parse JSON objects out of text that arrives in pieces, such as a streamed model response
+
+    Every object that closes is decoded as soon as its closing brace arrives;
+    those containing `required_key` are returned by feed(). Braces inside
+    strings are ignored, and text outside the JSON (prose, markdown fences)
+    is skipped. String state is only tracked inside an object; when a brace in
+    the prose turns out not to start one (its text doesn't decode, or a string
+    in it isn't followed by `:`, `,`, `}` or `]`), scanning resumes right after it.
+    """
+
+    def __init__(self, required_key: Optional[str] = None):
+        self.required_key = required_key
+        self.buffer = ""
+        self._pos = 0
+        self._starts: List[int] = []
+        self._in_string = False
+        self._escaped = False
+        self._after_string = False
+        self._emitted: Set[int] = set()
+
+    def _resync(self) -> None:
+        """Give up on the outermost open brace and rescan the text after it"""
+        self._pos = self._starts[0] + 1
+        self._starts = []
+        self._in_string = self._escaped = self._after_string = False
+
+    def feed(self, text: str) -> List[dict]:
+        """Add the next piece of text and return the objects it completed"""
+        completed = []
+        self.buffer += text
+        while self._pos < len(self.buffer):
+            i, char = self._pos, self.buffer[self._pos]
+            self._pos += 1
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    self._after_string = True
+                continue
+            if not self._starts:
+                # Outside any object: quotes are prose, only an opening brace matters
+                if char == "{":
+                    self._starts.append(i)
+                continue
+            if self._after_string and not char.isspace():
+                self._after_string = False
+                if char not in ":,}]":
+                    self._resync()
+                    continue
+            if char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._starts.append(i)
+            elif char == "}":
+                start = self._starts.pop()
+                try:
+                    obj = json.loads(self.buffer[start:i + 1])
+                except json.JSONDecodeError:
+                    if not self._starts:
+                        self._starts = [start]
+                        self._resync()
+                    continue
+                if start in self._emitted:
+                    continue
+                self._emitted.add(start)
+                if self.required_key is None or self.required_key in obj:
+                    completed.append(obj)
+        return completed